@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import pandas as pd
+
+# Training processes; each keeps its own LRU of loaded models
+WORKERS = int(os.getenv('FORECAST_WORKERS', '2'))
+REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', 'data/models')
+# Models kept on disk / loaded in memory per worker, least recently used evicted first
+REGISTRY_MAX_MODELS = int(os.getenv('MODEL_REGISTRY_MAX_MODELS', '500'))
+CACHE_MAX_MODELS = int(os.getenv('MODEL_CACHE_MAX_MODELS', '32'))
+# Models older than this are retrained on the next forecast
+MODEL_MAX_AGE = float(os.getenv('MODEL_MAX_AGE', str(24 * 3600)))
+# Finished jobs are forgotten after this many seconds
+JOB_TTL = float(os.getenv('FORECAST_JOB_TTL', '3600'))
+MIN_HISTORY_DAYS = 14
+
+# Models served by the API (LSTM has no inference over future dates yet)
+MODEL_TYPES = ('prophet', 'holt_winters', 'xgboost')
+FINISHED = ('succeeded', 'failed', 'cancelled')
+
+ModelKey = Tuple[str, str, str]
+
+
+class UnsupportedModel(ValueError):
+    pass
+
+
+class ModelRegistry:
+    """Trained models on disk, one entry per (product_id, store_id, model_type)
+
+    Each entry is a directory with the serialized model and a meta.json
+    (key, trained_at, last_used); when there are more than max_models entries
+    the least recently used are removed. Loaded models are also kept in an
+    in-memory LRU of max_loaded entries.
+    """
+
+    def __init__(self, directory: str = REGISTRY_DIR, max_models: int = REGISTRY_MAX_MODELS,
+                 max_loaded: int = CACHE_MAX_MODELS):
+        self.directory = directory
+        self.max_models = max_models
+        self.max_loaded = max_loaded
+        self._loaded: 'OrderedDict[ModelKey, Tuple[float, Any]]' = OrderedDict()
+
+    def _path(self, key: ModelKey) -> str:
+        name = hashlib.sha1(json.dumps(key).encode()).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def _meta(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(path, 'meta.json')) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, path: str, meta: Dict[str, Any]) -> None:
+        temporary = os.path.join(path, 'meta.json.tmp')
+        with open(temporary, 'w') as file:
+            json.dump(meta, file)
+        os.replace(temporary, os.path.join(path, 'meta.json'))
+
+    def is_fresh(self, key: ModelKey, max_age: float = MODEL_MAX_AGE) -> bool:
+        """Whether a model trained less than max_age seconds ago is stored"""
+        meta = self._meta(self._path(key))
+        return meta is not None and time.time() - meta['trained_at'] < max_age
+
+    def get(self, key: ModelKey, max_age: float = MODEL_MAX_AGE) -> Optional[Any]:
+        """The stored model, from memory or disk, unless missing or stale"""
+        path = self._path(key)
+        meta = self._meta(path)
+        if meta is None or time.time() - meta['trained_at'] >= max_age:
+            self._loaded.pop(key, None)
+            return None
+
+        loaded = self._loaded.get(key)
+        if loaded is not None and loaded[0] == meta['trained_at']:
+            self._loaded.move_to_end(key)
+            model = loaded[1]
+        else:
+            model = _load_model(key[2], path)
+            self._remember(key, meta['trained_at'], model)
+
+        meta['last_used'] = time.time()
+        self._write_meta(path, meta)
+        return model
+
+    def put(self, key: ModelKey, model: Any) -> None:
+        path = self._path(key)
+        # Written next to the entry and swapped in, so readers never see a partial model
+        staging = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        _dump_model(key[2], model, staging)
+        now = time.time()
+        self._write_meta(staging, {'key': list(key), 'trained_at': now, 'last_used': now})
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(staging, path)
+
+        self._remember(key, now, model)
+        self._evict()
+
+    def _remember(self, key: ModelKey, trained_at: float, model: Any) -> None:
+        self._loaded[key] = (trained_at, model)
+        self._loaded.move_to_end(key)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            meta = self._meta(os.path.join(self.directory, name))
+            if meta is not None:
+                entries.append((meta['last_used'], name))
+        for _, name in sorted(entries)[:max(len(entries) - self.max_models, 0)]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+
+def _dump_model(model_type: str, model: Any, path: str) -> None:
+    import joblib
+    joblib.dump(model, os.path.join(path, 'model.joblib'))
+
+
+def _load_model(model_type: str, path: str) -> Any:
+    import joblib
+    return joblib.load(os.path.join(path, 'model.joblib'))
+
+
+# Registry of the worker process, created on its first job
+_registry: Optional[ModelRegistry] = None
+
+
+def run_forecast(key: ModelKey, days_ahead: int, history: Optional[pd.DataFrame],
+                 retrain: bool, registry_dir: str) -> List[Dict[str, Any]]:
+    """
+    Forecast job body, run in a worker process
+    Trains only when there is no fresh model for the key (or retrain is set)
+    """
+    global _registry
+    # Heavy imports (Prophet, TensorFlow) stay out of the API process
+    from models.forecasting.demand_forecast import DemandForecaster
+
+    if _registry is None or _registry.directory != registry_dir:
+        os.makedirs(registry_dir, exist_ok=True)
+        _registry = ModelRegistry(registry_dir)
+
+    model_type = key[2]
+    forecaster = DemandForecaster()
+    # The registry keeps model_state(): XGBoost is stored with its training features
+    state = None if retrain else _registry.get(key)
+    if state is None:
+        if history is None:
+            raise ValueError("Model expired before the forecast ran; submit again")
+        if model_type == 'prophet':
+            forecaster.train_prophet(history, 'quantity', 'date')
+        elif model_type == 'holt_winters':
+            forecaster.train_holt_winters(history, 'quantity', 'date')
+        else:
+            forecaster.train_xgboost(history, 'quantity', 'date')
+        _registry.put(key, forecaster.model_state(model_type))
+    else:
+        forecaster.load_model_state(model_type, state)
+
+    forecast = forecaster.forecast(model_type, days_ahead)
+    if model_type == 'prophet':
+        forecast = forecast.rename(columns={'ds': 'date', 'yhat': 'forecast'}).tail(days_ahead)
+    return json.loads(forecast.to_json(orient='records', date_format='iso'))
+
+
+class ForecastJob:
+    def __init__(self, product_id: str, store_id: str, model: str, days_ahead: int, retrain: bool):
+        self.id = uuid.uuid4().hex
+        self.key: ModelKey = (product_id, store_id, model)
+        self.days_ahead = days_ahead
+        self.retrain = retrain
+        self.status = 'pending'
+        self.cached_model: Optional[bool] = None
+        self.result: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # Replaced on every status change; stream readers wait on it
+        self.changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        if self.done:
+            self.finished_at = time.time()
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        product_id, store_id, model = self.key
+        state = {
+            'job_id': self.id,
+            'status': self.status,
+            'product_id': product_id,
+            'store_id': store_id,
+            'model': model,
+            'days_ahead': self.days_ahead,
+            'cached_model': self.cached_model,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == 'succeeded':
+            state['forecast'] = self.result
+        if self.error is not None:
+            state['error'] = self.error
+        return state
+
+
+class ForecastJobs:
+    """Forecast jobs run in a process pool, tracked in memory for polling and streaming"""
+
+    def __init__(self, load_history, registry_dir: str = REGISTRY_DIR, workers: int = WORKERS):
+        # (product_id, store_id) -> daily frame with date and quantity columns
+        self.load_history = load_history
+        self.registry = ModelRegistry(registry_dir)
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, ForecastJob] = {}
+        # Unfinished job per request, so identical submissions share one job
+        self._active: Dict[Tuple[ModelKey, int, bool], str] = {}
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, not forked: workers load TensorFlow themselves
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def submit(self, product_id: str, store_id: str, model: str, days_ahead: int,
+               retrain: bool = False) -> ForecastJob:
+        if model not in MODEL_TYPES:
+            raise UnsupportedModel(f"Unsupported model {model}; use one of {', '.join(MODEL_TYPES)}")
+        if days_ahead <= 0:
+            raise ValueError("days_ahead must be positive")
+        self._expire()
+
+        request = ((product_id, store_id, model), days_ahead, retrain)
+        active = self._active.get(request)
+        if active is not None and not self._jobs[active].done:
+            return self._jobs[active]
+
+        job = ForecastJob(product_id, store_id, model, days_ahead, retrain)
+        self._jobs[job.id] = job
+        self._active[request] = job.id
+        job.task = asyncio.ensure_future(self._run(job, request))
+        return job
+
+    def get(self, job_id: str) -> Optional[ForecastJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[ForecastJob]:
+        """
+        Cancel a job; one already training finishes in its worker
+        (the model is still stored) but its result is discarded
+        """
+        job = self._jobs.get(job_id)
+        if job is not None and not job.done:
+            job.task.cancel()
+            job.set_status('cancelled')
+        return job
+
+    async def _run(self, job: ForecastJob, request) -> None:
+        loop = asyncio.get_event_loop()
+        try:
+            history = None
+            job.cached_model = not job.retrain and self.registry.is_fresh(job.key)
+            if not job.cached_model:
+                history = await loop.run_in_executor(None, self.load_history, job.key[0], job.key[1])
+                if len(history) < MIN_HISTORY_DAYS:
+                    raise ValueError(f"Not enough sales history ({len(history)} days)")
+
+            job.set_status('running')
+            job.result = await loop.run_in_executor(
+                self._executor(), run_forecast, job.key, job.days_ahead, history, job.retrain,
+                self.registry.directory
+            )
+            job.set_status('succeeded')
+        except asyncio.CancelledError:
+            if not job.done:
+                job.set_status('cancelled')
+        except Exception as e:
+            job.error = str(e)
+            job.set_status('failed')
+        finally:
+            if self._active.get(request) == job.id:
+                del self._active[request]
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Job state on every change, ending with the finished state"""
+        job = self._jobs[job_id]
+        while True:
+            changed = job.changed
+            yield job.to_dict()
+            if job.done:
+                return
+            await changed.wait()
+
+    def _expire(self) -> None:
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.done and now - job.finished_at > JOB_TTL]:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        for job in self._jobs.values():
+            if not job.done:
+                job.task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,228 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from starlette.concurrency import run_in_threadpool
+
+from api.storage import SALES_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Rows held in memory (queued + being flushed) before writers have to wait
+BUFFER_MAX_ROWS = int(os.getenv('INGEST_BUFFER_MAX_ROWS', '100000'))
+# A flush starts once this many rows are queued, or after FLUSH_INTERVAL seconds
+FLUSH_ROWS = int(os.getenv('INGEST_FLUSH_ROWS', '10000'))
+FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', '1.0'))
+# How long a request waits for buffer space before being rejected
+PUT_TIMEOUT = float(os.getenv('INGEST_PUT_TIMEOUT', '5.0'))
+# Invalid rows reported back per request
+MAX_REPORTED_ERRORS = 100
+
+
+class BufferFull(Exception):
+    pass
+
+
+def parse_sales_body(body: bytes, content_type: str) -> pd.DataFrame:
+    """
+    Build a frame straight from the request body
+    JSON (list of records or {column: [values]}), NDJSON or an Arrow IPC stream
+    """
+    content_type = (content_type or 'application/json').split(';')[0].strip()
+    if content_type == 'application/vnd.apache.arrow.stream':
+        return pa.ipc.open_stream(body).read_all().to_pandas()
+    if content_type in ('application/x-ndjson', 'application/ndjson'):
+        if not body.strip():
+            return pd.DataFrame(columns=SALES_COLUMNS)
+        return pd.read_json(io.BytesIO(body), lines=True, dtype=False, convert_dates=False)
+    if content_type == 'application/json':
+        payload = json.loads(body)
+        if isinstance(payload, dict) and 'records' in payload:
+            payload = payload['records']
+        if not isinstance(payload, (list, dict)):
+            raise ValueError("Expected a list of records or an object of columns")
+        return pd.DataFrame(payload)
+    raise ValueError(f"Unsupported content type {content_type}")
+
+
+def validate_sales(frame: pd.DataFrame) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Validate every column at once (no per-row objects)
+    Returns the valid rows, typed for storage, and the errors of the invalid ones
+    """
+    missing = [column for column in SALES_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    date = pd.to_datetime(frame['date'], errors='coerce', utc=True).dt.tz_localize(None)
+    quantity = pd.to_numeric(frame['quantity'], errors='coerce')
+    price = pd.to_numeric(frame['price'], errors='coerce')
+    product_id = frame['product_id'].astype('string').str.strip()
+    store_id = frame['store_id'].astype('string').str.strip()
+
+    checks = {
+        'invalid date': date.isna().to_numpy(),
+        'quantity must be an integer': (quantity.isna() | (quantity != np.floor(quantity))).to_numpy(),
+        'price must be a non-negative number': (~np.isfinite(price) | (price < 0)).to_numpy(),
+        'missing product_id': (product_id.isna() | (product_id == '')).fillna(True).to_numpy(dtype=bool),
+        'missing store_id': (store_id.isna() | (store_id == '')).fillna(True).to_numpy(dtype=bool)
+    }
+    invalid = np.zeros(len(frame), dtype=bool)
+    for failed in checks.values():
+        invalid |= failed
+
+    errors = []
+    for row in np.flatnonzero(invalid)[:MAX_REPORTED_ERRORS]:
+        errors.append({
+            'row': int(row),
+            'errors': [message for message, failed in checks.items() if failed[row]]
+        })
+
+    valid = ~invalid
+    sales = pd.DataFrame({
+        'date': date[valid].to_numpy(),
+        'product_id': product_id[valid].to_numpy(dtype=object),
+        'store_id': store_id[valid].to_numpy(dtype=object),
+        'quantity': quantity[valid].to_numpy(dtype=np.int64),
+        'price': price[valid].to_numpy(dtype=np.float64)
+    })
+    return sales, errors
+
+
+class WriteBuffer:
+    """
+    In-process buffer between the ingestion endpoints and storage
+    Batches are flushed by a background task when FLUSH_ROWS rows are queued
+    or every FLUSH_INTERVAL seconds; when BUFFER_MAX_ROWS rows are pending
+    writers wait (backpressure) and give up after PUT_TIMEOUT seconds
+    Each batch goes through the sinks in order; when one fails, the retry
+    resumes the same batch at that sink, so earlier sinks never see it twice
+    """
+
+    def __init__(self, sinks: Union[Callable[[pd.DataFrame], Any], Sequence[Callable[[pd.DataFrame], Any]]],
+                 max_rows: int = BUFFER_MAX_ROWS, flush_rows: int = FLUSH_ROWS,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self._sinks = list(sinks) if isinstance(sinks, (list, tuple)) else [sinks]
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        self._frames: List[pd.DataFrame] = []
+        self._queued = 0
+        # Batch that failed part way: (batch, index of the first sink it still has to go through)
+        self._failed: Optional[Tuple[pd.DataFrame, int]] = None
+        # Queued rows plus rows of the flush in progress
+        self._pending = 0
+        # Created in start(), on the server's event loop
+        self._space: Optional[asyncio.Condition] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._closed = False
+        self._task = None
+
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.last_flush = None
+
+    @property
+    def pending_rows(self) -> int:
+        return self._pending
+
+    def start(self) -> None:
+        self._space = asyncio.Condition()
+        self._wake = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def put(self, sales: pd.DataFrame, timeout: float = PUT_TIMEOUT) -> None:
+        """Queue validated sales, waiting for space when the buffer is full"""
+        rows = len(sales)
+        if rows == 0:
+            return
+        if rows > self.max_rows:
+            raise ValueError(f"Batch of {rows} rows exceeds the buffer size ({self.max_rows})")
+
+        async with self._space:
+            try:
+                await asyncio.wait_for(
+                    self._space.wait_for(lambda: self._pending + rows <= self.max_rows or self._closed),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                raise BufferFull(f"Write buffer full ({self._pending} rows pending)")
+            if self._closed:
+                raise BufferFull("Write buffer closed")
+
+            self._frames.append(sales)
+            self._queued += rows
+            self._pending += rows
+
+        if self._queued >= self.flush_rows:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Write everything queued; a batch that fails is kept, with the sink it
+        failed at, and retried from there before any newer rows
+        """
+        if self._failed is not None:
+            batch, start = self._failed
+            self._failed = None
+            if not await self._write(batch, start):
+                return
+        if not self._frames:
+            return
+        frames, self._frames = self._frames, []
+        self._queued = 0
+        batch = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        await self._write(batch, 0)
+
+    async def _write(self, batch: pd.DataFrame, start: int) -> bool:
+        rows = len(batch)
+        for index in range(start, len(self._sinks)):
+            try:
+                await run_in_threadpool(self._sinks[index], batch)
+            except Exception as e:
+                sink = getattr(self._sinks[index], '__qualname__', repr(self._sinks[index]))
+                logger.error(f"Error flushing {rows} sales rows to {sink}: {e}")
+                self.failed_flushes += 1
+                self._failed = (batch, index)
+                return False
+
+        self.flushed_rows += rows
+        self.last_flush = time.time()
+        async with self._space:
+            self._pending -= rows
+            self._space.notify_all()
+        return True
+
+    async def close(self) -> None:
+        """Stop the background task and flush what is left"""
+        self._closed = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+        await self.flush()
+        async with self._space:
+            self._space.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pending_rows': self._pending,
+            'flushed_rows': self.flushed_rows,
+            'failed_flushes': self.failed_flushes,
+            'last_flush': self.last_flush
+        }
@@ -1,11 +1,20 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Iterator, List, Optional
 import uvicorn
 import os
+import json
+import pandas as pd
 from datetime import datetime
 
+from api.olap_service import OLAPService, CubeNotLoaded, MEDIA_TYPES
+from api.storage import SalesRepository, sales_table, encode_cursor, decode_cursor
+from api.ingest import WriteBuffer, BufferFull, parse_sales_body, validate_sales
+from api.forecast_jobs import ForecastJobs, UnsupportedModel
+
 app = FastAPI(
     title="Retail Analytics API",
     description="API para análise de vendas e previsão de demanda para varejo",
@@ -33,66 +42,251 @@ class ForecastRequest(BaseModel):
     product_id: str
     store_id: str
     days_ahead: int
+    # prophet, holt_winters or xgboost (lstm is not served)
+    model: str = 'prophet'
+    # Train a new model even when a recent one is in the registry
+    retrain: bool = False
 
 class OLAPQuery(BaseModel):
     dimensions: List[str]
     metrics: List[str]
     filters: Optional[dict] = None
+    # Dimensions spread as columns (dimensions stay as rows)
+    pivot: Optional[List[str]] = None
+    # json, ndjson or arrow
+    format: str = 'json'
+
+# OLAP cube shared across requests, loaded at startup
+olap_service = OLAPService()
+sales_repository = SalesRepository()
+
+# Sales accepted by the API are written in batches by a background task: stored,
+# then added to the cube; a failed step is retried alone
+write_buffer = WriteBuffer([sales_repository.insert, olap_service.append])
+
+# Forecasts are trained in worker processes, from the stored sales history
+forecast_jobs = ForecastJobs(sales_repository.daily_quantity)
+
+@app.on_event("startup")
+async def load_olap_cube():
+    await run_in_threadpool(olap_service.load)
+    olap_service.start()
+
+@app.on_event("startup")
+async def start_write_buffer():
+    await run_in_threadpool(sales_repository.create_schema)
+    write_buffer.start()
+
+@app.on_event("shutdown")
+async def flush_write_buffer():
+    await write_buffer.close()
+
+@app.on_event("shutdown")
+async def stop_olap_rebuilds():
+    await run_in_threadpool(olap_service.stop)
+
+@app.on_event("shutdown")
+async def stop_forecast_jobs():
+    forecast_jobs.shutdown()
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now(),
+        "olap": {"rows": olap_service.n_rows, "cache": olap_service.cache.stats()},
+        "ingest": write_buffer.stats()
+    }
 
 # Sales endpoints
 @app.post("/sales")
 async def create_sales(sales_data: SalesData):
+    sales, errors = validate_sales(pd.DataFrame([sales_data.dict()]))
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
     try:
-        # TODO: Implement sales data storage
-        return {"message": "Sales data created successfully", "data": sales_data}
+        await write_buffer.put(sales)
+    except BufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {"message": "Sales data created successfully", "data": sales_data}
+
+@app.post("/sales/bulk", status_code=202)
+async def create_sales_bulk(request: Request):
+    """
+    Accept a batch of sales as a JSON array, NDJSON or an Arrow IPC stream
+    Valid rows are queued for storage; invalid ones are reported back
+    """
+    body = await request.body()
+    try:
+        # Parsing and validation are vectorized and run off the event loop
+        frame = await run_in_threadpool(parse_sales_body, body, request.headers.get("content-type"))
+        sales, errors = await run_in_threadpool(validate_sales, frame)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid body: {e}")
+
+    try:
+        await write_buffer.put(sales)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except BufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    return JSONResponse(status_code=202, content={
+        "message": "Sales data accepted",
+        "accepted": len(sales),
+        "rejected": len(frame) - len(sales),
+        "errors": errors
+    })
+
+def _sales_frame(rows: List[Any]) -> pd.DataFrame:
+    return pd.DataFrame.from_records(rows, columns=sales_table.columns.keys())
+
+def _stream_sales(pages: Iterator[List[Any]], fmt: str, limit: Optional[int]) -> Iterator[bytes]:
+    """Encode keyset pages as they are read, one chunk per page"""
+    if fmt == 'ndjson':
+        for rows in pages:
+            lines = _sales_frame(rows).to_json(orient='records', lines=True, date_format='iso')
+            yield (lines if lines.endswith('\n') else lines + '\n').encode()
+        return
+
+    yield b'{"message": "Sales data retrieved successfully", "data": ['
+    separator = ''
+    returned = 0
+    last = None
+    for rows in pages:
+        records = _sales_frame(rows).to_json(orient='records', date_format='iso')[1:-1]
+        yield (separator + records).encode()
+        separator = ','
+        returned += len(rows)
+        last = rows[-1]
+    # A full page of limit rows may have more after it
+    next_cursor = encode_cursor(last) if limit is not None and returned == limit else None
+    yield ('], "next_cursor": ' + json.dumps(next_cursor) + '}').encode()
 
 @app.get("/sales")
 async def get_sales(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     product_id: Optional[str] = None,
-    store_id: Optional[str] = None
+    store_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    format: str = 'json'
 ):
+    """
+    Sales in (store_id, product_id, date) order, streamed page by page
+    With limit, the JSON response carries next_cursor to continue from
+    """
+    if format not in ('json', 'ndjson'):
+        raise HTTPException(status_code=400, detail=f"Unsupported format {format}")
+    if limit is not None and limit <= 0:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        # TODO: Implement sales data retrieval
-        return {"message": "Sales data retrieved successfully", "data": []}
+        pages = sales_repository.iter_pages(start_date, end_date, product_id, store_id, after, limit)
+        # Read the first page here so database errors still return a 500
+        first = await run_in_threadpool(next, pages, None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    def all_pages() -> Iterator[List[Any]]:
+        if first is not None:
+            yield first
+            yield from pages
+
+    media_type = 'application/x-ndjson' if format == 'ndjson' else 'application/json'
+    return StreamingResponse(_stream_sales(all_pages(), format, limit), media_type=media_type)
+
 # Forecasting endpoints
-@app.post("/forecast")
+@app.post("/forecast", status_code=202)
 async def create_forecast(request: ForecastRequest):
+    """
+    Queue a forecast job and return its id at once
+    Poll GET /forecast/{job_id} or follow GET /forecast/{job_id}/stream for the result
+    """
     try:
-        # TODO: Implement demand forecasting
-        return {
-            "message": "Forecast created successfully",
-            "product_id": request.product_id,
-            "store_id": request.store_id,
-            "forecast": []
-        }
+        job = forecast_jobs.submit(
+            request.product_id,
+            request.store_id,
+            request.model,
+            request.days_ahead,
+            request.retrain
+        )
+    except UnsupportedModel as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(status_code=202, content={
+        "message": "Forecast job submitted",
+        "job_id": job.id,
+        "status": job.status
+    })
+
+@app.get("/forecast/{job_id}")
+async def get_forecast(job_id: str):
+    job = forecast_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Forecast job not found")
+    return job.to_dict()
+
+@app.get("/forecast/{job_id}/stream")
+async def stream_forecast(job_id: str):
+    """NDJSON line with the job state on every change, the last one with the forecast"""
+    if forecast_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Forecast job not found")
+
+    async def lines():
+        async for state in forecast_jobs.events(job_id):
+            yield (json.dumps(state) + "\n").encode()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.delete("/forecast/{job_id}")
+async def cancel_forecast(job_id: str):
+    job = forecast_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Forecast job not found")
+    return job.to_dict()
 
 # OLAP endpoints
 @app.post("/olap/query")
 async def execute_olap_query(query: OLAPQuery):
+    if query.format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format {query.format}")
+    
     try:
-        # TODO: Implement OLAP query execution
-        return {
-            "message": "OLAP query executed successfully",
-            "dimensions": query.dimensions,
-            "metrics": query.metrics,
-            "results": []
-        }
+        # Runs off the event loop; repeated queries are served from the result cache
+        content = await run_in_threadpool(
+            olap_service.execute,
+            query.dimensions,
+            query.metrics,
+            query.filters,
+            query.pivot,
+            query.format
+        )
+    except CubeNotLoaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    media_type = MEDIA_TYPES[query.format]
+    if isinstance(content, bytes):
+        return Response(content=content, media_type=media_type)
+    return StreamingResponse(content, media_type=media_type)
 
 # Analytics endpoints
 @app.get("/analytics/summary")
@@ -101,10 +295,10 @@ async def get_analytics_summary(
     end_date: Optional[datetime] = None
 ):
     try:
-        # TODO: Implement analytics summary
+        # Answered from the day-level summary tiles, without scanning the facts
         return {
             "message": "Analytics summary retrieved successfully",
-            "summary": {}
+            "summary": olap_service.summary.query(start_date, end_date)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,256 @@
+import io
+import json
+import logging
+import os
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Iterator, List, Optional, Union
+import pandas as pd
+import pyarrow as pa
+
+from api.cache import TTLCache
+from models.olap.cube import OLAPCube
+from models.olap.summary import SummaryTiles
+
+logger = logging.getLogger(__name__)
+
+# Warehouse extract the cube is built from (Parquet file or directory)
+FACTS_PATH = os.getenv('OLAP_FACTS_PATH', 'data/warehouse/sales.parquet')
+CACHE_SIZE = int(os.getenv('OLAP_CACHE_SIZE', '256'))
+CACHE_TTL = float(os.getenv('OLAP_CACHE_TTL', '300'))
+# Larger results are streamed without being cached
+CACHE_MAX_ROWS = int(os.getenv('OLAP_CACHE_MAX_ROWS', '100000'))
+# Appended sales are added to the cube in one background batch every REFRESH_INTERVAL seconds
+REFRESH_INTERVAL = float(os.getenv('OLAP_REFRESH_INTERVAL', '10'))
+STREAM_BATCH_ROWS = 50_000
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Sales record columns (API, ETL) -> cube fact columns
+FACT_COLUMNS = {
+    'product_id': 'product',
+    'store_id': 'store',
+    'customer_id': 'customer'
+}
+
+
+class CubeNotLoaded(RuntimeError):
+    pass
+
+
+def to_facts(sales: pd.DataFrame) -> pd.DataFrame:
+    """Rename sales columns to the cube schema and derive the sales amount"""
+    facts = sales.rename(columns=FACT_COLUMNS)
+    if 'sales' not in facts.columns:
+        if 'total_amount' in facts.columns:
+            facts['sales'] = facts['total_amount']
+        elif 'quantity' in facts.columns and 'price' in facts.columns:
+            facts['sales'] = facts['quantity'] * facts['price']
+    return facts
+
+
+def _batches(frame: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(frame), STREAM_BATCH_ROWS):
+        yield frame.iloc[start:start + STREAM_BATCH_ROWS]
+
+
+def encode_json(frame: pd.DataFrame, envelope: Dict[str, Any]) -> Iterator[bytes]:
+    """{...envelope, "results": [records]} written batch by batch"""
+    yield (json.dumps(envelope, default=str)[:-1] + ', "results": [').encode()
+    separator = ''
+    for batch in _batches(frame):
+        records = batch.to_json(orient='records', date_format='iso')[1:-1]
+        if records:
+            yield (separator + records).encode()
+            separator = ','
+    yield b']}'
+
+
+def encode_ndjson(frame: pd.DataFrame) -> Iterator[bytes]:
+    for batch in _batches(frame):
+        lines = batch.to_json(orient='records', lines=True, date_format='iso')
+        if lines:
+            yield (lines if lines.endswith('\n') else lines + '\n').encode()
+
+
+def encode_arrow(frame: pd.DataFrame) -> Iterator[bytes]:
+    """Arrow IPC stream, one record batch per slice of the result"""
+    sink = io.BytesIO()
+    writer = None
+    schema = None
+    for batch in _batches(frame) if len(frame) else [frame]:
+        record_batch = pa.RecordBatch.from_pandas(batch, schema=schema, preserve_index=False)
+        if writer is None:
+            schema = record_batch.schema
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(record_batch)
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+
+class OLAPService:
+    """Cube shared by all requests, with a result cache invalidated by the new sales it covers"""
+
+    def __init__(self, facts_path: str = FACTS_PATH, cache: Optional[TTLCache] = None):
+        self.facts_path = facts_path
+        self.cache = cache if cache is not None else TTLCache(CACHE_SIZE, CACHE_TTL)
+        self.cube: Optional[OLAPCube] = None
+        # Date-range totals for the dashboard, updated on every append
+        self.summary = SummaryTiles()
+        # Bumped on every swap; results computed on a replaced cube are not cached
+        self.version = 0
+        self._lock = Lock()
+        # Held for a whole refresh (or load), so two never extend the same cube
+        self._rebuild_lock = Lock()
+        # Sales appended since the last rebuild
+        self._pending: List[pd.DataFrame] = []
+        self._stop = Event()
+        self._worker: Optional[Thread] = None
+
+    @property
+    def n_rows(self) -> int:
+        cube = self.cube
+        return len(cube.facts) if cube is not None else 0
+
+    def load(self) -> None:
+        """Build the cube from the warehouse extract, if there is one"""
+        if not os.path.exists(self.facts_path):
+            return
+        facts = to_facts(pd.read_parquet(self.facts_path))
+        summary = SummaryTiles()
+        summary.add(facts)
+        with self._rebuild_lock:
+            cube = OLAPCube(facts)
+            with self._lock:
+                self.summary = summary
+                self._swap(cube)
+
+    def start(self) -> None:
+        """Start the background worker that applies appended sales to the cube"""
+        self._stop.clear()
+        self._worker = Thread(target=self._run, name='olap-rebuild', daemon=True)
+        self._worker.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def _run(self) -> None:
+        delay = REFRESH_INTERVAL
+        while not self._stop.wait(delay):
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception:
+                # The sales stay pending and are retried on the next cycle
+                logger.exception("Error refreshing the OLAP cube")
+            # A refresh slower than the interval spaces out the next one
+            delay = max(REFRESH_INTERVAL, time.monotonic() - started)
+
+    @property
+    def pending_rows(self) -> int:
+        return sum(len(sales) for sales in self._pending)
+
+    def append(self, sales: pd.DataFrame) -> None:
+        """Add newly loaded sales; they reach the cube on the next background refresh"""
+        if sales.empty:
+            return
+        facts = to_facts(sales)
+        self.summary.add(facts)
+        with self._lock:
+            self._pending.append(facts)
+
+    def refresh(self) -> None:
+        """
+        Add the pending sales to the cube (OLAPCube.append: encoded and merged
+        into the aggregates incrementally) and swap the new cube in
+        This runs outside _lock: queries keep using the current cube and
+        appends keep queueing until the new one replaces it
+        """
+        with self._rebuild_lock:
+            with self._lock:
+                pending, cube = list(self._pending), self.cube
+            if not pending:
+                return
+            sales = pd.concat(pending, ignore_index=True)
+            if cube is None:
+                extended, start = OLAPCube(sales), None
+            else:
+                extended, start = cube.append(sales), len(cube.facts)
+            with self._lock:
+                # Sales appended meanwhile stay pending for the next refresh
+                del self._pending[:len(pending)]
+                self._swap(extended, start)
+
+    def _swap(self, cube: OLAPCube, start: Optional[int] = None) -> None:
+        """
+        Replace the cube; with start (first appended fact row) only cached
+        results whose filters match some appended row are dropped
+        """
+        self.cube = cube
+        self.version += 1
+        if start is None:
+            self.cache.clear()
+        else:
+            self.cache.discard(lambda key: self._affected(cube, key, start))
+
+    @staticmethod
+    def _affected(cube: OLAPCube, key: Any, start: int) -> bool:
+        try:
+            return cube.matches(json.loads(key[1])['filters'], start)
+        except (KeyError, ValueError):
+            return True
+
+    def execute(self, dimensions: List[str], metrics: List[str], filters: Optional[Dict[str, Any]] = None,
+                pivot: Optional[List[str]] = None, fmt: str = 'json') -> Union[bytes, Iterator[bytes]]:
+        """
+        Run a query and return the encoded response
+        Small results are cached as bytes; large ones are streamed in batches
+        """
+        with self._lock:
+            cube, version = self.cube, self.version
+        if cube is None:
+            raise CubeNotLoaded("OLAP cube not loaded")
+
+        query = cube.normalize_query(dimensions, metrics, filters)
+        query['pivot'] = cube.normalize_query(pivot or [], [])['dimensions']
+        key = (fmt, json.dumps(query, sort_keys=True, default=str))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        if query['pivot']:
+            frame = cube.pivot(None, query['dimensions'], query['pivot'], query['measures'], query['filters'])
+            frame.columns = ['|'.join(str(part) for part in column) for column in frame.columns]
+            frame = frame.reset_index()
+        else:
+            frame = cube.get_aggregated_data(None, query['dimensions'], query['measures'], query['filters'])
+
+        if fmt == 'json':
+            chunks = encode_json(frame, {
+                'message': "OLAP query executed successfully",
+                'dimensions': dimensions,
+                'metrics': metrics
+            })
+        elif fmt == 'ndjson':
+            chunks = encode_ndjson(frame)
+        else:
+            chunks = encode_arrow(frame)
+
+        if len(frame) > CACHE_MAX_ROWS:
+            return chunks
+        payload = b''.join(chunks)
+        with self._lock:
+            # A result of a cube swapped out meanwhile would escape its invalidation
+            if self.version == version:
+                self.cache.set(key, payload)
+        return payload
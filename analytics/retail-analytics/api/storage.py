@@ -0,0 +1,138 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, Iterator, List, Optional, Sequence
+import pandas as pd
+from sqlalchemy import (
+    create_engine, MetaData, Table, Column, Index, BigInteger, Integer, Float, String, DateTime,
+    and_, select, tuple_
+)
+from sqlalchemy.engine import Engine
+
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///data/retail.db')
+# Rows fetched per keyset query when reading sales
+PAGE_SIZE = int(os.getenv('SALES_PAGE_SIZE', '10000'))
+
+SALES_COLUMNS = ['date', 'product_id', 'store_id', 'quantity', 'price']
+
+metadata = MetaData()
+
+sales_table = Table(
+    'sales',
+    metadata,
+    Column('id', BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True),
+    Column('date', DateTime, nullable=False),
+    Column('product_id', String(64), nullable=False),
+    Column('store_id', String(64), nullable=False),
+    Column('quantity', Integer, nullable=False),
+    Column('price', Float, nullable=False),
+    # Read order of GET /sales; id breaks ties so the keyset is unique
+    Index('ix_sales_store_product_date', 'store_id', 'product_id', 'date', 'id')
+)
+
+# Keyset of a sales row, in index order
+KEY_COLUMNS = [sales_table.c.store_id, sales_table.c.product_id, sales_table.c.date, sales_table.c.id]
+
+
+def encode_cursor(row: Any) -> str:
+    """Opaque cursor pointing after row"""
+    key = [row.store_id, row.product_id, row.date.isoformat(), row.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        store_id, product_id, date, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return [store_id, product_id, datetime.fromisoformat(date), int(row_id)]
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class SalesRepository:
+    """Sales table in the API database"""
+
+    def __init__(self, engine: Optional[Engine] = None):
+        self.engine = engine if engine is not None else create_engine(DATABASE_URL, pool_pre_ping=True)
+
+    def create_schema(self) -> None:
+        database = self.engine.url.database
+        if self.engine.url.get_backend_name() == 'sqlite' and database:
+            os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        metadata.create_all(self.engine)
+
+    def insert(self, sales: pd.DataFrame) -> int:
+        """Insert validated sales in one transaction (executemany); returns the row count"""
+        if sales.empty:
+            return 0
+        records = sales[SALES_COLUMNS].to_dict('records')
+        with self.engine.begin() as connection:
+            connection.execute(sales_table.insert(), records)
+        return len(records)
+
+    def _query(self, start_date: Optional[datetime], end_date: Optional[datetime],
+               product_id: Optional[str], store_id: Optional[str], after: Optional[Sequence[Any]], limit: int):
+        conditions = []
+        # Leading key columns pinned by equality are left out of the seek
+        pinned = 0
+        if store_id is not None:
+            conditions.append(sales_table.c.store_id == store_id)
+            pinned = 1
+            if product_id is not None:
+                pinned = 2
+        if product_id is not None:
+            conditions.append(sales_table.c.product_id == product_id)
+        if start_date is not None:
+            conditions.append(sales_table.c.date >= start_date)
+        if end_date is not None:
+            conditions.append(sales_table.c.date <= end_date)
+        if after is not None:
+            # Seek past the last row returned instead of counting an OFFSET
+            conditions.append(tuple_(*KEY_COLUMNS[pinned:]) > tuple_(*after[pinned:]))
+
+        query = select(sales_table)
+        if conditions:
+            query = query.where(and_(*conditions))
+        return query.order_by(*KEY_COLUMNS).limit(limit)
+
+    def fetch_page(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                   product_id: Optional[str] = None, store_id: Optional[str] = None,
+                   after: Optional[Sequence[Any]] = None, limit: int = PAGE_SIZE) -> List[Any]:
+        """Up to limit sales rows following the key after, in index order"""
+        query = self._query(start_date, end_date, product_id, store_id, after, limit)
+        with self.engine.connect() as connection:
+            return connection.execute(query).fetchall()
+
+    def iter_pages(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                   product_id: Optional[str] = None, store_id: Optional[str] = None,
+                   after: Optional[Sequence[Any]] = None, limit: Optional[int] = None,
+                   page_size: int = PAGE_SIZE) -> Iterator[List[Any]]:
+        """
+        Pages of matching sales (at most limit rows in total)
+        Each page is a separate keyset query, so only one page is held in memory
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            rows = self.fetch_page(start_date, end_date, product_id, store_id, after, size)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < size:
+                return
+            if remaining is not None:
+                remaining -= len(rows)
+            last = rows[-1]
+            after = [last.store_id, last.product_id, last.date, last.id]
+
+    def daily_quantity(self, product_id: str, store_id: str) -> pd.DataFrame:
+        """Units sold per day for one product in one store, with zero for days without sales"""
+        frames = [
+            pd.DataFrame({'date': [row.date for row in rows], 'quantity': [row.quantity for row in rows]})
+            for rows in self.iter_pages(product_id=product_id, store_id=store_id)
+        ]
+        if not frames:
+            return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'quantity': pd.Series(dtype='float64')})
+        sales = pd.concat(frames, ignore_index=True)
+        daily = sales.set_index('date')['quantity'].resample('D').sum().astype('float64')
+        return daily.rename_axis('date').reset_index()
@@ -0,0 +1,82 @@
+"""
+Dice benchmark: bitmap indexes vs. a pandas boolean mask
+
+Usage: python benchmarks/bitmap_dice.py [n_rows]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.olap.cube import OLAPCube
+
+CONDITIONS = {
+    'region': ['South', 'Southeast'],
+    'category': ['Electronics', 'Toys', 'Books'],
+    'segment': 'Retail'
+}
+
+
+def make_facts(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Sales facts with low-cardinality store, product and customer levels"""
+    rng = np.random.default_rng(seed)
+    regions = ['North', 'Northeast', 'Midwest', 'South', 'Southeast']
+    categories = ['Electronics', 'Toys', 'Books', 'Home', 'Garden', 'Sports', 'Food', 'Clothing']
+    segments = ['Retail', 'Wholesale', 'Online']
+    return pd.DataFrame({
+        'date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, n_rows), unit='D'),
+        'region': pd.Categorical.from_codes(rng.integers(0, len(regions), n_rows), regions),
+        'category': pd.Categorical.from_codes(rng.integers(0, len(categories), n_rows), categories),
+        'segment': pd.Categorical.from_codes(rng.integers(0, len(segments), n_rows), segments),
+        'sales': rng.gamma(2.0, 50.0, n_rows)
+    })
+
+
+def pandas_mask(facts: pd.DataFrame) -> np.ndarray:
+    mask = np.ones(len(facts), dtype=bool)
+    for column, value in CONDITIONS.items():
+        values = value if isinstance(value, list) else [value]
+        mask &= facts[column].isin(values).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def measure(func, repeat: int = 5) -> float:
+    """Best wall time (ms) over repeat runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(n_rows: int = 10_000_000) -> pd.DataFrame:
+    facts = make_facts(n_rows)
+    cube = OLAPCube().load(facts, materialize=False)
+    codes_only = OLAPCube().load(facts, materialize=False, bitmap_max_cardinality=0)
+
+    expected = pandas_mask(facts)
+    assert np.array_equal(cube._bitmaps.select(CONDITIONS), expected)
+
+    results = [
+        ('pandas boolean mask', measure(lambda: pandas_mask(facts))),
+        ('level codes mask', measure(lambda: codes_only._select_rows(codes_only._facts, CONDITIONS))),
+        ('bitmap index (row ids)', measure(lambda: cube._bitmaps.select(CONDITIONS))),
+        ('bitmap index (count only)', measure(lambda: cube._bitmaps.count(CONDITIONS))),
+        ('dice + sum by month, pandas', measure(
+            lambda: facts.iloc[pandas_mask(facts)].groupby(facts['date'].dt.to_period('M')).sales.sum(), repeat=3
+        )),
+        ('dice + sum by month, cube', measure(
+            lambda: cube.get_aggregated_data(None, ['month'], ['sales'], CONDITIONS), repeat=3
+        ))
+    ]
+    print(f"{n_rows} rows, {len(expected)} selected, bitmaps: {cube._bitmaps.nbytes / 2 ** 20:.1f} MB")
+    return pd.DataFrame(results, columns=['method', 'time_ms'])
+
+
+if __name__ == "__main__":
+    n_rows = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10_000_000
+    print(run(n_rows).to_string(index=False))
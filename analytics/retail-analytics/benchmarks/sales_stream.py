@@ -0,0 +1,120 @@
+"""
+Load test: stream every sale through GET /sales and watch the server memory
+
+Fills a SQLite database, starts the API with uvicorn and reads the whole
+table in one streamed response, sampling the server RSS while it runs.
+With keyset pages the RSS stays flat however many rows are returned.
+
+Usage: python benchmarks/sales_stream.py [n_rows] [json|ndjson]
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import httpx
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from api.storage import SalesRepository
+
+PORT = 8765
+INSERT_BATCH_ROWS = 200_000
+
+
+def fill(repository: SalesRepository, n_rows: int, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, INSERT_BATCH_ROWS):
+        size = min(INSERT_BATCH_ROWS, n_rows - start)
+        repository.insert(pd.DataFrame({
+            'date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730 * 24, size), unit='h'),
+            'product_id': np.char.add('P', rng.integers(0, 500, size).astype(str)).astype(object),
+            'store_id': np.char.add('S', rng.integers(0, 50, size).astype(str)).astype(object),
+            'quantity': rng.integers(1, 10, size),
+            'price': rng.gamma(2.0, 20.0, size).round(2)
+        }))
+
+
+def rss_mb(pid: int) -> float:
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def wait_ready(client: httpx.Client, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if client.get('/health').status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("API did not start")
+
+
+def run(n_rows: int = 10_000_000, fmt: str = 'ndjson') -> None:
+    workdir = tempfile.mkdtemp()
+    database_url = f"sqlite:///{os.path.join(workdir, 'sales.db')}"
+    repository = SalesRepository(create_engine(database_url))
+    repository.create_schema()
+
+    start = time.perf_counter()
+    fill(repository, n_rows)
+    print(f"Inserted {n_rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+    env = dict(os.environ, DATABASE_URL=database_url, OLAP_FACTS_PATH=os.path.join(workdir, 'none.parquet'))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api.main:app', '--port', str(PORT), '--log-level', 'warning'],
+        cwd=ROOT, env=env
+    )
+    samples = []
+    done = threading.Event()
+
+    def sample() -> None:
+        while not done.is_set():
+            samples.append(rss_mb(server.pid))
+            time.sleep(0.25)
+
+    try:
+        with httpx.Client(base_url=f'http://127.0.0.1:{PORT}', timeout=None) as client:
+            wait_ready(client)
+            baseline = rss_mb(server.pid)
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+
+            received = 0
+            lines = 0
+            start = time.perf_counter()
+            with client.stream('GET', '/sales', params={'format': fmt}) as response:
+                response.raise_for_status()
+                for chunk in response.iter_raw():
+                    received += len(chunk)
+                    lines += chunk.count(b'\n')
+            elapsed = time.perf_counter() - start
+            done.set()
+            sampler.join()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Streamed {received / 2 ** 20:,.0f} MiB in {elapsed:.1f}s"
+          + (f" ({lines:,} rows, {lines / elapsed:,.0f} rows/s)" if fmt == 'ndjson' else ''))
+    print(f"Server RSS: {baseline:.0f} MiB before, {min(samples):.0f}-{max(samples):.0f} MiB while streaming "
+          f"(peak growth {max(samples) - baseline:.0f} MiB)")
+
+
+if __name__ == '__main__':
+    run(
+        int(float(sys.argv[1])) if len(sys.argv) > 1 else 10_000_000,
+        sys.argv[2] if len(sys.argv) > 2 else 'ndjson'
+    )
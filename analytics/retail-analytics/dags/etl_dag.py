@@ -1,11 +1,33 @@
 from airflow import DAG
+from airflow.models.xcom_arg import XComArg
 from airflow.operators.python import PythonOperator
-from airflow.operators.postgres_operator import PostgresOperator
+from airflow.providers.postgres.operators.postgres import PostgresOperator
 from airflow.providers.postgres.hooks.postgres import PostgresHook
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import fs
+import hashlib
+import io
 import os
+import re
+
+# Staging area shared by the tasks: local path or object store URI (e.g. s3://bucket/staging)
+STAGING_URI = os.getenv('RETAIL_STAGING_URI', '/opt/airflow/staging')
+# Staged files of failed runs are kept for inspection, then removed after this many days
+STAGING_RETENTION_DAYS = int(os.getenv('RETAIL_STAGING_RETENTION_DAYS', '3'))
+# Rows per Parquet record batch read/written by the tasks
+BATCH_ROWS = 100_000
+# Store shards processed by every run, one mapped extract/transform/load per store
+STORES = [store.strip() for store in os.getenv('RETAIL_STORES', 'S001,S002,S003').split(',') if store.strip()]
+# Bounded parallelism, mostly for backfills: concurrent date partitions and concurrent tasks
+MAX_ACTIVE_RUNS = int(os.getenv('RETAIL_ETL_MAX_ACTIVE_RUNS', '4'))
+MAX_ACTIVE_TASKS = int(os.getenv('RETAIL_ETL_MAX_ACTIVE_TASKS', '16'))
+
+SALES_TABLE = 'sales_fact'
+SALES_COLUMNS = ['date', 'product_id', 'store_id', 'quantity', 'price', 'total_amount', 'day_of_week', 'month']
 
 # Default arguments
 default_args = {
@@ -25,73 +47,205 @@ dag = DAG(
     description='ETL process for retail analytics',
     schedule_interval='@daily',
     catchup=False,
+    max_active_runs=MAX_ACTIVE_RUNS,
+    max_active_tasks=MAX_ACTIVE_TASKS,
     tags=['retail', 'etl'],
 )
 
+# Staging helpers
+def run_staging_uri(context):
+    """Staging directory of the DAG run"""
+    run_id = re.sub(r'[^A-Za-z0-9_.-]', '_', context['run_id'])
+    return f"{STAGING_URI.rstrip('/')}/{context['dag'].dag_id}/{run_id}"
+
+def shard_staging_uri(context, store_id, name):
+    """Staged file of one store shard of the run"""
+    return f"{run_staging_uri(context)}/store_id={store_id}/{name}.parquet"
+
+def open_uri(uri):
+    """(filesystem, path) for a local path or object store URI"""
+    return fs.FileSystem.from_uri(uri)
+
+def staged_batches(staged):
+    """Record batches of a staged file (dict with path and rows from XCom)"""
+    filesystem, path = open_uri(staged['path'])
+    with filesystem.open_input_file(path) as source:
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=BATCH_ROWS):
+            yield batch
+
+def stage_batches(uri, batches):
+    """Write record batches to a staged Parquet file; returns the XCom handoff"""
+    filesystem, path = open_uri(uri)
+    filesystem.create_dir(path.rsplit('/', 1)[0], recursive=True)
+    writer = None
+    rows = 0
+    for batch in batches:
+        if writer is None:
+            writer = pq.ParquetWriter(path, batch.schema, filesystem=filesystem)
+        writer.write_table(pa.Table.from_batches([batch]))
+        rows += batch.num_rows
+    if writer is None:
+        raise ValueError(f"Nothing to stage at {uri}")
+    writer.close()
+    return {'path': uri, 'rows': rows}
+
 # Task functions
-def extract_sales_data(**context):
-    """Extract sales data from source"""
+def list_store_shards(**context):
+    """
+    Store shards of the run's date partition; each one maps to its own extract task
+    The shard list is the configured RETAIL_STORES: adding a store is a config
+    change, and a backfill maps the same shards for every partition
+    """
+    return [{'store_id': store_id} for store_id in STORES]
+
+def extract_sales_data(store_id, **context):
+    """Extract one store's sales for the run's date partition"""
+    start, end = context['data_interval_start'], context['data_interval_end']
+
     # TODO: Implement actual data extraction
-    # This is a placeholder that generates sample data
-    dates = pd.date_range(start='2024-01-01', end='2024-01-31', freq='D')
+    # This is a placeholder that generates sample data, seeded by the partition
+    # so that re-running it extracts the same rows
+    seed = int(hashlib.sha1(f"{context['ds']}/{store_id}".encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    n_rows = int(rng.integers(50, 200))
+    offsets = np.sort(rng.uniform(0, (end - start).total_seconds(), n_rows))
     data = {
-        'date': dates,
-        'product_id': np.random.choice(['P001', 'P002', 'P003'], len(dates)),
-        'store_id': np.random.choice(['S001', 'S002', 'S003'], len(dates)),
-        'quantity': np.random.randint(1, 100, len(dates)),
-        'price': np.random.uniform(10, 1000, len(dates))
+        'date': pd.Timestamp(start.isoformat()).tz_convert(None) + pd.to_timedelta(offsets, unit='s'),
+        'product_id': rng.choice(['P001', 'P002', 'P003'], n_rows),
+        'store_id': store_id,
+        'quantity': rng.integers(1, 100, n_rows),
+        'price': rng.uniform(10, 1000, n_rows)
     }
     df = pd.DataFrame(data)
-    return df
-
-def transform_sales_data(**context):
-    """Transform sales data"""
-    # Get data from previous task
-    ti = context['task_instance']
-    df = ti.xcom_pull(task_ids='extract_sales_data')
-    
-    # Add calculated columns
-    df['total_amount'] = df['quantity'] * df['price']
-    df['day_of_week'] = df['date'].dt.dayofweek
-    df['month'] = df['date'].dt.month
-    
-    return df
-
-def load_sales_data(**context):
-    """Load transformed data into warehouse"""
-    # Get data from previous task
-    ti = context['task_instance']
-    df = ti.xcom_pull(task_ids='transform_sales_data')
-    
+
+    # Only the file location and row count go through XCom
+    batch = pa.RecordBatch.from_pandas(df, preserve_index=False)
+    staged = stage_batches(shard_staging_uri(context, store_id, 'extract'), [batch])
+    return {**staged, 'store_id': store_id}
+
+def transform_sales_data(path, rows, store_id, **context):
+    """Transform one store's staged sales"""
+    staged = {'path': path, 'rows': rows}
+
+    def transform(batches):
+        for batch in batches:
+            df = batch.to_pandas()
+            # Add calculated columns
+            df['total_amount'] = df['quantity'] * df['price']
+            df['day_of_week'] = df['date'].dt.dayofweek
+            df['month'] = df['date'].dt.month
+            yield pa.RecordBatch.from_pandas(df[SALES_COLUMNS], preserve_index=False)
+
+    transformed = stage_batches(shard_staging_uri(context, store_id, 'transform'), transform(staged_batches(staged)))
+    if transformed['rows'] != staged['rows']:
+        raise ValueError(f"Transform produced {transformed['rows']} rows from {staged['rows']}")
+    return {**transformed, 'store_id': store_id}
+
+def load_sales_data(path, rows, store_id, **context):
+    """Load one store's transformed sales into the warehouse, replacing its partition"""
+    staged = {'path': path, 'rows': rows}
+    start, end = context['data_interval_start'], context['data_interval_end']
+
     # Connect to PostgreSQL
     pg_hook = PostgresHook(postgres_conn_id='postgres_default')
-    
-    # Load data into warehouse
-    # TODO: Implement actual data loading
-    print("Loading data into warehouse...")
-    print(df.head())
+    conn = pg_hook.get_conn()
+    copy_sql = f"COPY {SALES_TABLE} ({', '.join(SALES_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+    # Delete the (store, date) partition and bulk load it with COPY in one
+    # transaction, so re-runs and backfills replace rows instead of duplicating them
+    loaded = 0
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SALES_TABLE} WHERE store_id = %s AND date >= %s AND date < %s",
+                (store_id, start.naive(), end.naive())
+            )
+            for batch in staged_batches(staged):
+                buffer = io.StringIO()
+                batch.to_pandas().to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+                loaded += batch.num_rows
+        if loaded != staged['rows']:
+            raise ValueError(f"Loaded {loaded} rows, {staged['rows']} were staged")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print(f"Loaded {loaded} rows of store {store_id} into {SALES_TABLE}")
+    return {'table': SALES_TABLE, 'store_id': store_id, 'rows': loaded}
+
+def cleanup_staging(**context):
+    """Remove this run's staged files, and those of older runs past the retention period"""
+    filesystem, path = open_uri(run_staging_uri(context))
+    filesystem.delete_dir(path)
+
+    dag_dir = path.rsplit('/', 1)[0]
+    cutoff = datetime.utcnow().timestamp() - STAGING_RETENTION_DAYS * 86400
+    for run_dir in filesystem.get_file_info(fs.FileSelector(dag_dir, allow_not_found=True)):
+        if run_dir.type != fs.FileType.Directory:
+            continue
+        files = filesystem.get_file_info(fs.FileSelector(run_dir.path, recursive=True))
+        modified = [info.mtime.timestamp() for info in files if info.mtime is not None]
+        if modified and all(mtime < cutoff for mtime in modified):
+            filesystem.delete_dir(run_dir.path)
 
 # Task definitions
-extract_task = PythonOperator(
+create_table_task = PostgresOperator(
+    task_id='create_sales_table',
+    postgres_conn_id='postgres_default',
+    sql=f"""
+        CREATE TABLE IF NOT EXISTS {SALES_TABLE} (
+            date TIMESTAMP NOT NULL,
+            product_id VARCHAR(64) NOT NULL,
+            store_id VARCHAR(64) NOT NULL,
+            quantity INTEGER NOT NULL,
+            price DOUBLE PRECISION NOT NULL,
+            total_amount DOUBLE PRECISION NOT NULL,
+            day_of_week SMALLINT NOT NULL,
+            month SMALLINT NOT NULL
+        );
+        -- Partition replaced by each load
+        CREATE INDEX IF NOT EXISTS ix_{SALES_TABLE}_store_date ON {SALES_TABLE} (store_id, date);
+    """,
+    dag=dag,
+)
+
+list_stores_task = PythonOperator(
+    task_id='list_store_shards',
+    python_callable=list_store_shards,
+    dag=dag,
+)
+
+# One mapped task instance per store shard; each stage expands over the previous one's output
+extract_task = PythonOperator.partial(
     task_id='extract_sales_data',
     python_callable=extract_sales_data,
-    provide_context=True,
     dag=dag,
-)
+).expand(op_kwargs=XComArg(list_stores_task))
 
-transform_task = PythonOperator(
+transform_task = PythonOperator.partial(
     task_id='transform_sales_data',
     python_callable=transform_sales_data,
-    provide_context=True,
     dag=dag,
-)
+).expand(op_kwargs=XComArg(extract_task))
 
-load_task = PythonOperator(
+load_task = PythonOperator.partial(
     task_id='load_sales_data',
     python_callable=load_sales_data,
-    provide_context=True,
+    dag=dag,
+).expand(op_kwargs=XComArg(transform_task))
+
+# Runs only after every shard is loaded; failed runs keep their files until the retention sweep
+cleanup_task = PythonOperator(
+    task_id='cleanup_staging',
+    python_callable=cleanup_staging,
     dag=dag,
 )
 
 # Task dependencies
-extract_task >> transform_task >> load_task 
\ No newline at end of file
+create_table_task >> list_stores_task
+extract_task >> transform_task >> load_task >> cleanup_task
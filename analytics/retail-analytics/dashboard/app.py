@@ -7,6 +7,9 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
+import requests
+
+API_URL = os.getenv('API_URL', 'http://localhost:8000')
 
 # Initialize the Dash app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -176,6 +179,14 @@ app.layout = dbc.Container(
     fluid=True,
 )
 
+# Number formatting (pt-BR)
+def format_number(value):
+    return f"{value:,.0f}".replace(",", ".")
+
+def format_currency(value):
+    # R$ 1.234,56
+    return "R$ " + f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
 # Callbacks
 @app.callback(
     [Output("total-sales", "children"),
@@ -188,8 +199,23 @@ app.layout = dbc.Container(
      Input("product-dropdown", "value")]
 )
 def update_summary_cards(start_date, end_date, store, product):
-    # TODO: Implement API calls to get real data
-    return "R$ 150.000,00", "R$ 150,00", "1.000", "1.000"
+    # Date-range totals come from the API summary tiles (not filtered by store/product yet)
+    try:
+        response = requests.get(
+            f"{API_URL}/analytics/summary",
+            params={'start_date': start_date, 'end_date': end_date},
+            timeout=5
+        )
+        response.raise_for_status()
+        summary = response.json()['summary']
+    except (requests.RequestException, KeyError, ValueError):
+        return "-", "-", "-", "-"
+    return (
+        format_currency(summary['revenue']),
+        format_currency(summary['average_ticket']),
+        format_number(summary['quantity']),
+        format_number(summary['customers'])
+    )
 
 @app.callback(
     Output("sales-trend", "figure"),
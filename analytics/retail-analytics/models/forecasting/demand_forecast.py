@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 from sklearn.preprocessing import StandardScaler
 from prophet import Prophet
 from statsmodels.tsa.holtwinters import ExponentialSmoothing
@@ -10,8 +11,11 @@ from tensorflow.keras.optimizers import Adam
 import xgboost as xgb
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 
+from models.forecasting.features import DesignMatrix, build_design_matrix, content_key
+from models.forecasting.sequences import sliding_windows, window_dataset
+
 class DemandForecaster:
-    def __init__(self):
+    def __init__(self, feature_cache_size: int = 8):
         self.models = {
             'prophet': None,
             'holt_winters': None,
@@ -19,27 +23,38 @@ class DemandForecaster:
             'xgboost': None
         }
         self.scaler = StandardScaler()
-        
-    def prepare_data(self, data: pd.DataFrame, target_col: str, date_col: str) -> Tuple[np.ndarray, np.ndarray]:
-        """Prepare data for forecasting"""
-        # Sort data by date
-        data = data.sort_values(date_col)
-        
-        # Create features
-        data['year'] = data[date_col].dt.year
-        data['month'] = data[date_col].dt.month
-        data['day_of_week'] = data[date_col].dt.dayofweek
-        data['is_holiday'] = data[date_col].dt.dayofweek.isin([5, 6]).astype(int)
+        # Design matrices by content hash of the series, least recently used evicted first
+        self.feature_cache_size = feature_cache_size
+        self._features: 'OrderedDict[str, DesignMatrix]' = OrderedDict()
+        # Features the XGBoost model was trained on; its forecasts continue this series
+        self._xgboost_features: Optional[DesignMatrix] = None
+
+    def design_matrix(self, data: pd.DataFrame, target_col: str, date_col: str) -> DesignMatrix:
+        """Features of the series, built once and shared by all trainers"""
+        key = content_key(data, target_col, date_col)
+        features = self._features.get(key)
+        if features is None:
+            features = build_design_matrix(data, target_col, date_col, key=key)
+            self._features[key] = features
+            while len(self._features) > self.feature_cache_size:
+                self._features.popitem(last=False)
+        self._features.move_to_end(key)
+        return features
+        
+    def prepare_data(self, data: pd.DataFrame, target_col: str, date_col: str) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Prepare data for forecasting; the input frame is left unchanged"""
+        features = self.design_matrix(data, target_col, date_col)
         
         # Scale target variable
-        scaled_target = self.scaler.fit_transform(data[[target_col]])
+        scaled_target = self.scaler.fit_transform(features.target.reshape(-1, 1))
         
-        return data, scaled_target
+        return features.frame(date_col, target_col), scaled_target
     
     def train_prophet(self, data: pd.DataFrame, target_col: str, date_col: str) -> None:
         """Train Prophet model"""
         # Prepare data for Prophet
-        prophet_data = data.rename(columns={date_col: 'ds', target_col: 'y'})
+        features = self.design_matrix(data, target_col, date_col)
+        prophet_data = pd.DataFrame({'ds': features.dates, 'y': features.target.astype(np.float64)})
         
         # Initialize and train model
         self.models['prophet'] = Prophet(
@@ -50,11 +65,20 @@ class DemandForecaster:
         )
         self.models['prophet'].fit(prophet_data)
     
-    def train_holt_winters(self, data: pd.DataFrame, target_col: str) -> None:
-        """Train Holt-Winters model"""
+    def train_holt_winters(self, data: pd.DataFrame, target_col: str, date_col: Optional[str] = None) -> None:
+        """Train Holt-Winters model
+
+        Without date_col (or when data has no such column) the target column is
+        used as is, indexed by data's own (date) index.
+        """
+        if date_col is None or date_col not in data.columns:
+            series = data[target_col]
+        else:
+            series = self.design_matrix(data, target_col, date_col).series()
+        
         # Initialize and train model
         self.models['holt_winters'] = ExponentialSmoothing(
-            data[target_col],
+            series,
             seasonal_periods=7,
             trend='add',
             seasonal='add'
@@ -78,19 +102,27 @@ class DemandForecaster:
         
         return model
     
-    def train_lstm(self, data: pd.DataFrame, target_col: str, sequence_length: int = 10) -> None:
-        """Train LSTM model"""
-        # Prepare sequences
-        X, y = [], []
-        for i in range(len(data) - sequence_length):
-            X.append(data[target_col].values[i:(i + sequence_length)])
-            y.append(data[target_col].values[i + sequence_length])
-        
-        X = np.array(X)
-        y = np.array(y)
+    def train_lstm(self, data: pd.DataFrame, target_col: str, sequence_length: int = 10,
+                   date_col: Optional[str] = None, streaming: bool = False) -> None:
+        """Train LSTM model; with streaming, batches are built on the fly (no validation split)
+
+        With date_col the series is sorted by that column; without it (or when
+        data has no such column) the target column is used in data's own order.
+        """
+        # Prepare sequences: the target is copied once into a contiguous float32
+        # array and the windows are views over that copy
+        if date_col is None or date_col not in data.columns:
+            target = data[target_col].to_numpy(dtype=np.float32)
+        else:
+            target = self.design_matrix(data, target_col, date_col).target
         
         # Build and train model
         self.models['lstm'] = self.build_lstm_model((sequence_length, 1))
+        if streaming:
+            self.models['lstm'].fit(window_dataset(target, sequence_length, batch_size=32), epochs=50, verbose=0)
+            return
+        
+        X, y = sliding_windows(target, sequence_length)
         self.models['lstm'].fit(
             X, y,
             epochs=50,
@@ -99,12 +131,12 @@ class DemandForecaster:
             verbose=0
         )
     
-    def train_xgboost(self, data: pd.DataFrame, target_col: str) -> None:
+    def train_xgboost(self, data: pd.DataFrame, target_col: str, date_col: str = 'date') -> None:
         """Train XGBoost model"""
-        # Prepare features
-        features = ['year', 'month', 'day_of_week', 'is_holiday']
-        X = data[features]
-        y = data[target_col]
+        # Prepare features: calendar, lags and rolling windows (missing history is NaN)
+        features = self.design_matrix(data, target_col, date_col)
+        X = features.X
+        y = features.target
         
         # Initialize and train model
         self.models['xgboost'] = xgb.XGBRegressor(
@@ -114,6 +146,21 @@ class DemandForecaster:
             max_depth=6
         )
         self.models['xgboost'].fit(X, y)
+        self._xgboost_features = features
+    
+    def model_state(self, model_type: str) -> Any:
+        """What forecast() needs from a trained model, e.g. to keep it in a registry"""
+        if model_type == 'xgboost':
+            # Recursive forecasts continue the training series
+            return self.models['xgboost'], self._xgboost_features
+        return self.models[model_type]
+    
+    def load_model_state(self, model_type: str, state: Any) -> None:
+        """Restore a model saved with model_state()"""
+        if model_type == 'xgboost':
+            self.models['xgboost'], self._xgboost_features = state
+        else:
+            self.models[model_type] = state
     
     def forecast(self, model_type: str, periods: int) -> pd.DataFrame:
         """Generate forecasts using specified model"""
@@ -137,12 +184,28 @@ class DemandForecaster:
             return pd.DataFrame()
         
         elif model_type == 'xgboost':
-            # TODO: Implement XGBoost forecasting
-            return pd.DataFrame()
+            return self._forecast_xgboost(periods)
         
         else:
             raise ValueError(f"Unsupported model type: {model_type}")
     
+    def _forecast_xgboost(self, periods: int) -> pd.DataFrame:
+        """Recursive forecast: each prediction feeds the lags and rolling windows of the next date"""
+        features = self._xgboost_features
+        if features is None:
+            raise ValueError("Model xgboost has no training series to forecast from")
+        
+        freq = features.series().index.freq or pd.Timedelta(days=1)
+        dates = pd.date_range(start=features.dates[-1] + freq, periods=periods, freq=freq)
+        history = features.target.astype(np.float64)
+        predictions = np.empty(periods)
+        for step, date in enumerate(dates):
+            row = features.features_at(date, history)
+            predictions[step] = self.models['xgboost'].predict(row.reshape(1, -1))[0]
+            history = np.append(history, predictions[step])
+        
+        return pd.DataFrame({'date': dates, 'forecast': predictions})
+    
     def evaluate_model(self, model_type: str, actual: pd.Series, predicted: pd.Series) -> Dict[str, float]:
         """Evaluate model performance"""
         metrics = {
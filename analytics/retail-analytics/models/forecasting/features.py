@@ -0,0 +1,116 @@
+import hashlib
+from typing import List, Sequence
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+CALENDAR_FEATURES = ['year', 'month', 'day_of_week', 'is_holiday']
+DEFAULT_LAGS = (1, 7, 14, 28)
+DEFAULT_WINDOWS = (7, 28)
+
+
+class DesignMatrix:
+    """Features of one series: a contiguous float32 matrix, one row per date
+
+    Columns are the calendar features, the lagged target and rolling means and
+    standard deviations over the previous days (NaN where the history is
+    shorter than the lag or window).
+    """
+
+    def __init__(self, key: str, dates: pd.DatetimeIndex, target: np.ndarray,
+                 X: np.ndarray, columns: List[str],
+                 lags: Sequence[int] = DEFAULT_LAGS, windows: Sequence[int] = DEFAULT_WINDOWS):
+        self.key = key
+        self.dates = dates
+        self.target = target
+        self.X = X
+        self.columns = columns
+        self.lags = tuple(lags)
+        self.windows = tuple(windows)
+
+    def __len__(self) -> int:
+        return len(self.target)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.X[:, self.columns.index(name)]
+
+    def series(self) -> pd.Series:
+        """Target indexed by date, with the date frequency when it is regular"""
+        freq = pd.infer_freq(self.dates) if len(self.dates) >= 3 else None
+        return pd.Series(self.target.astype(np.float64), index=pd.DatetimeIndex(self.dates, freq=freq))
+
+    def features_at(self, date: pd.Timestamp, history: np.ndarray) -> np.ndarray:
+        """Feature row of date, given the target of every earlier date (as in X)
+
+        Used to forecast recursively: history is the series followed by the
+        predictions of the dates before this one.
+        """
+        row = np.empty(len(self.columns), dtype=np.float32)
+        row[:len(CALENDAR_FEATURES)] = _calendar(pd.DatetimeIndex([date]))[0]
+        position = len(CALENDAR_FEATURES)
+        for lag in self.lags:
+            row[position] = history[-lag] if len(history) >= lag else np.nan
+            position += 1
+        for window in self.windows:
+            previous = history[-window:] if len(history) >= window else np.full(window, np.nan)
+            row[position] = previous.mean()
+            row[position + 1] = previous.std()
+            position += 2
+        return row
+
+    def frame(self, date_col: str, target_col: str) -> pd.DataFrame:
+        frame = pd.DataFrame(self.X, columns=self.columns)
+        frame.insert(0, date_col, self.dates)
+        frame.insert(1, target_col, self.target)
+        return frame
+
+
+def _calendar(dates: pd.DatetimeIndex) -> np.ndarray:
+    """CALENDAR_FEATURES of each date"""
+    return np.column_stack([dates.year, dates.month, dates.dayofweek, dates.dayofweek >= 5])
+
+
+def content_key(data: pd.DataFrame, target_col: str, date_col: str,
+                lags: Sequence[int] = DEFAULT_LAGS, windows: Sequence[int] = DEFAULT_WINDOWS) -> str:
+    """Hash of the series values and the feature parameters"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((target_col, date_col, tuple(lags), tuple(windows))).encode())
+    digest.update(np.ascontiguousarray(data[date_col].to_numpy(dtype='datetime64[ns]')).view(np.int64).tobytes())
+    digest.update(np.ascontiguousarray(data[target_col].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def build_design_matrix(data: pd.DataFrame, target_col: str, date_col: str,
+                        lags: Sequence[int] = DEFAULT_LAGS, windows: Sequence[int] = DEFAULT_WINDOWS,
+                        key: str = None) -> DesignMatrix:
+    """Design matrix of the series, sorted by date; data is not modified"""
+    order = np.argsort(data[date_col].to_numpy(), kind='stable')
+    dates = pd.DatetimeIndex(data[date_col].to_numpy()[order])
+    target = data[target_col].to_numpy(dtype=np.float64)[order]
+    n_rows = len(target)
+
+    columns = CALENDAR_FEATURES + [f'lag_{lag}' for lag in lags]
+    for window in windows:
+        columns += [f'rolling_mean_{window}', f'rolling_std_{window}']
+    X = np.empty((n_rows, len(columns)), dtype=np.float32)
+
+    X[:, :len(CALENDAR_FEATURES)] = _calendar(dates)
+
+    # Row t of the window view holds target[t - depth .. t] (NaN before the start),
+    # so every lag and rolling window is a column slice of the same strided view
+    depth = max(list(lags) + list(windows) + [0])
+    padded = np.concatenate([np.full(depth, np.nan), target])
+    history = sliding_window_view(padded, depth + 1)
+    position = len(CALENDAR_FEATURES)
+    for lag in lags:
+        X[:, position] = history[:, depth - lag]
+        position += 1
+    for window in windows:
+        previous = history[:, depth - window:depth]
+        X[:, position] = previous.mean(axis=1)
+        X[:, position + 1] = previous.std(axis=1)
+        position += 2
+
+    if key is None:
+        key = content_key(data, target_col, date_col, lags, windows)
+    return DesignMatrix(key, dates, target.astype(np.float32), X, columns, lags, windows)
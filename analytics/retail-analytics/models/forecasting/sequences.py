@@ -0,0 +1,59 @@
+from typing import Callable, Iterable, Iterator, Tuple, Union
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Values per chunk when an in-memory (or memory-mapped) series is streamed
+CHUNK_SIZE = 1_000_000
+
+SeriesSource = Union[np.ndarray, Callable[[], Iterable[np.ndarray]]]
+
+
+def sliding_windows(values: np.ndarray, sequence_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Training sequences of a series as views, without copying it
+
+    X[i] is values[i:i + sequence_length] with shape (sequence_length, 1),
+    the input shape of the LSTM models, and y[i] is the value that follows.
+    """
+    values = np.asarray(values)
+    if len(values) <= sequence_length:
+        raise ValueError(f"Series of {len(values)} values is too short for sequences of {sequence_length}")
+    windows = sliding_window_view(values, sequence_length + 1)
+    return windows[:, :sequence_length, np.newaxis], windows[:, sequence_length]
+
+
+def _chunks(source: SeriesSource) -> Iterable[np.ndarray]:
+    if callable(source):
+        return source()
+    return (source[start:start + CHUNK_SIZE] for start in range(0, len(source), CHUNK_SIZE))
+
+
+def window_batches(source: SeriesSource, sequence_length: int, batch_size: int = 32,
+                   dtype=np.float32) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """(X, y) batches of sliding windows, holding one chunk of the series at a time
+
+    source is an array (np.memmap included) or a function returning an
+    iterable of consecutive chunks, e.g. read from Parquet batches. The last
+    sequence_length values of each chunk are carried over to the next one;
+    the last batch of a chunk may be smaller than batch_size.
+    """
+    carry = np.empty(0, dtype=dtype)
+    for chunk in _chunks(source):
+        series = np.concatenate([carry, np.asarray(chunk, dtype=dtype)])
+        if len(series) > sequence_length:
+            X, y = sliding_windows(series, sequence_length)
+            for start in range(0, len(y), batch_size):
+                yield np.ascontiguousarray(X[start:start + batch_size]), y[start:start + batch_size].copy()
+        carry = series[-sequence_length:]
+
+
+def window_dataset(source: SeriesSource, sequence_length: int, batch_size: int = 32):
+    """tf.data.Dataset streaming window_batches, re-read on every epoch"""
+    import tensorflow as tf
+
+    return tf.data.Dataset.from_generator(
+        lambda: window_batches(source, sequence_length, batch_size),
+        output_signature=(
+            tf.TensorSpec(shape=(None, sequence_length, 1), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32)
+        )
+    ).prefetch(tf.data.AUTOTUNE)
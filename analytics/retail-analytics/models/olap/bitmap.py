@@ -0,0 +1,115 @@
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+from models.olap.encoding import EncodedFacts
+
+# Set bits per byte value, for counting rows without unpacking
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.int64)
+
+
+class BitmapIndex:
+    """Packed bitmaps (one bit per fact row) for each member of the indexed levels
+
+    Levels with at most max_cardinality members are indexed when the cube is
+    loaded; a dice becomes an OR of member bitmaps per condition and an AND
+    across conditions, on arrays 8x smaller than a boolean mask. Conditions on
+    other levels are turned into packed masks from the level codes.
+    """
+
+    def __init__(self, facts: EncodedFacts, levels: Sequence[str], max_cardinality: int = 64):
+        self.facts = facts
+        self.n_rows = facts.n_rows
+        self.max_cardinality = max_cardinality
+        self._bitmaps: Dict[str, np.ndarray] = {}
+        # Levels without null members, whose bitmaps can be complemented
+        self._complete: Dict[str, bool] = {}
+        for level in levels:
+            if facts.has_level(level) and facts.level(level).cardinality <= max_cardinality:
+                self._bitmaps[level] = self._build(level)
+                self._complete[level] = not (facts.level(level).codes < 0).any()
+
+    def extend(self, facts: EncodedFacts) -> 'BitmapIndex':
+        """
+        Index of facts, whose first n_rows rows are the ones indexed here
+        Only the bytes of the appended rows are packed; levels that grew past
+        max_cardinality are no longer indexed
+        """
+        extended = BitmapIndex(facts, [], self.max_cardinality)
+        # The last byte may hold rows from both sides, so it is packed again
+        start = self.n_rows // 8
+        for level, bitmaps in self._bitmaps.items():
+            encoded = facts.level(level)
+            if encoded.cardinality > self.max_cardinality:
+                continue
+            tail = encoded.codes[start * 8:]
+            grown = np.zeros((encoded.cardinality, (facts.n_rows + 7) // 8), dtype=np.uint8)
+            grown[:len(bitmaps), :start] = bitmaps[:, :start]
+            for member in range(encoded.cardinality):
+                grown[member, start:] = np.packbits(tail == member)
+            extended._bitmaps[level] = grown
+            extended._complete[level] = self._complete[level] and not (encoded.codes[self.n_rows:] < 0).any()
+        return extended
+
+    @property
+    def levels(self) -> List[str]:
+        return list(self._bitmaps)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(bitmap.nbytes for bitmap in self._bitmaps.values())
+
+    def _build(self, level: str) -> np.ndarray:
+        """(cardinality, ceil(n_rows / 8)) matrix of packed member bitmaps"""
+        encoded = self.facts.level(level)
+        bitmaps = np.empty((encoded.cardinality, (self.n_rows + 7) // 8), dtype=np.uint8)
+        for member in range(encoded.cardinality):
+            bitmaps[member] = np.packbits(encoded.codes == member)
+        return bitmaps
+
+    def bitmap(self, level: str, values: Any) -> np.ndarray:
+        """Packed bitmap of the rows whose member of level is in values"""
+        encoded = self.facts.level(level)
+        members = encoded.lookup(values)
+
+        bitmaps = self._bitmaps.get(level)
+        if bitmaps is None:
+            return np.packbits(encoded.mask(values))
+        if len(members) == 0:
+            return np.zeros(bitmaps.shape[1], dtype=np.uint8)
+        if len(members) == 1:
+            return bitmaps[members[0]]
+        if 2 * len(members) > encoded.cardinality and self._complete[level]:
+            # Fewer bitmaps to combine through the complement
+            others = np.setdiff1d(np.arange(encoded.cardinality), members)
+            return self._complement(np.bitwise_or.reduce(bitmaps[others], axis=0))
+        return np.bitwise_or.reduce(bitmaps[members], axis=0)
+
+    def _complement(self, bits: np.ndarray) -> np.ndarray:
+        bits = np.invert(bits)
+        # Clear the padding bits past the last row
+        padding = len(bits) * 8 - self.n_rows
+        if padding:
+            bits[-1] &= np.uint8((0xFF << padding) & 0xFF)
+        return bits
+
+    def match(self, conditions: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Packed bitmap of the rows matching all conditions ({level: value or list})"""
+        result = None
+        for level, values in conditions.items():
+            bits = self.bitmap(level, values)
+            result = bits.copy() if result is None else np.bitwise_and(result, bits, out=result)
+        return result
+
+    def select(self, conditions: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Row ids matching all conditions (None when there is nothing to filter)"""
+        bits = self.match(conditions)
+        if bits is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
+
+    def count(self, conditions: Dict[str, Any]) -> int:
+        """Number of matching rows, without materializing the row ids"""
+        bits = self.match(conditions)
+        if bits is None:
+            return self.n_rows
+        return int(_POPCOUNT[bits].sum())
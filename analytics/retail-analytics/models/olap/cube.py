@@ -1,10 +1,19 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from models.olap.bitmap import BitmapIndex
+from models.olap.encoding import EncodedFacts, group_rows
+from models.olap.formula import compile_formula
+from models.olap.lattice import AggregateLattice
+
+# Suffixes accepted in measure names, e.g. 'sales_avg', 'customer_count_distinct_count'
+AGGREGATIONS = ('distinct_count', 'sum', 'avg', 'count')
+
 class OLAPCube:
-    def __init__(self):
+    def __init__(self, facts: Optional[pd.DataFrame] = None):
         # Define dimensions
         self.dimensions = {
             'time': {
@@ -41,7 +50,8 @@ class OLAPCube:
             },
             'customer_count': {
                 'aggregations': ['count', 'distinct_count'],
-                'type': 'numeric'
+                'type': 'numeric',
+                'column': 'customer'
             }
         }
         
@@ -60,6 +70,114 @@ class OLAPCube:
                 'type': 'numeric'
             }
         }
+        
+        # Dictionary-encoded fact table shared by all queries
+        self._facts: Optional[EncodedFacts] = None
+        # Pre-aggregated cuboids queries are routed to
+        self._lattice: Optional[AggregateLattice] = None
+        # Member bitmaps used by slice/dice and query filters
+        self._bitmaps: Optional[BitmapIndex] = None
+        # Options of the last load(), reused by append()
+        self._load_options: Dict[str, Any] = {}
+        if facts is not None:
+            self.load(facts)
+
+    def load(self, facts: pd.DataFrame, materialize: bool = True, max_cuboids: int = 8,
+             max_cells: Optional[int] = None, bitmap_max_cardinality: int = 64) -> 'OLAPCube':
+        """Encode the fact table once; later queries run on the integer codes
+
+        materialize: pre-aggregate up to max_cuboids cuboids (max_cells cells in
+            total, default a quarter of the fact rows) chosen by their benefit
+        bitmap_max_cardinality: levels with up to this many members get bitmap indexes
+        """
+        encoded = EncodedFacts(facts, self.dimensions)
+        levels = [
+            level
+            for spec in self.dimensions.values()
+            for level in spec['hierarchy'] + spec['attributes']
+        ]
+        columns = [self._measure_column(measure) for measure in self.measures]
+        encoded.encode_all(levels, columns)
+        
+        lattice = None
+        if materialize:
+            lattice = AggregateLattice(
+                encoded, self.dimensions, columns, max_cuboids=max_cuboids, max_cells=max_cells
+            ).build()
+        
+        bitmaps = BitmapIndex(encoded, levels, max_cardinality=bitmap_max_cardinality)
+        
+        self._facts = encoded
+        self._lattice = lattice
+        self._bitmaps = bitmaps
+        self._load_options = {
+            'materialize': materialize, 'max_cuboids': max_cuboids, 'max_cells': max_cells,
+            'bitmap_max_cardinality': bitmap_max_cardinality
+        }
+        return self
+
+    def append(self, facts: pd.DataFrame) -> 'OLAPCube':
+        """New cube with the loaded facts followed by facts; this cube is left unchanged
+
+        The new rows are encoded against the existing dictionaries, added to
+        the bitmaps and merged into the materialized cuboids as aggregates, so
+        the cost follows the number of new rows (plus copying the arrays)
+        rather than a full load(). Members first seen here come after the
+        existing ones in query results. Rows dated before the first loaded day
+        (or missing fact columns) fall back to loading everything again.
+        """
+        cube = OLAPCube()
+        cube.dimensions = self.dimensions
+        cube.measures = self.measures
+        cube.calculated_measures = self.calculated_measures
+        if self._facts is None:
+            return cube.load(facts, **self._load_options)
+        
+        encoded = self._facts.append(facts)
+        if encoded is None:
+            return cube.load(pd.concat([self._facts.frame, facts], ignore_index=True), **self._load_options)
+        
+        lattice = None
+        if self._lattice is not None:
+            lattice = self._lattice.extend(encoded)
+            if lattice is None:
+                columns = [self._measure_column(measure) for measure in self.measures]
+                options = self._load_options
+                lattice = AggregateLattice(
+                    encoded, self.dimensions, columns,
+                    max_cuboids=options['max_cuboids'], max_cells=options['max_cells']
+                ).build()
+        
+        cube._facts = encoded
+        cube._lattice = lattice
+        cube._bitmaps = self._bitmaps.extend(encoded) if self._bitmaps is not None else None
+        cube._load_options = self._load_options
+        return cube
+
+    def matches(self, filters: Optional[Dict[str, Any]], start: int = 0) -> bool:
+        """Whether any loaded fact row from position start on matches filters
+
+        E.g. to tell which cached results rows appended at start change.
+        """
+        if self._facts is None or start >= self._facts.n_rows:
+            return False
+        mask = np.ones(self._facts.n_rows - start, dtype=bool)
+        for name, value in (filters or {}).items():
+            encoded = self._facts.level(self._resolve_level(name)[1])
+            lut = np.zeros(encoded.cardinality + 1, dtype=bool)
+            lut[encoded.lookup(value)] = True
+            mask &= lut[encoded.codes[start:]]
+        return bool(mask.any())
+
+    @property
+    def lattice(self) -> Optional[AggregateLattice]:
+        """Materialized aggregates of the loaded facts"""
+        return self._lattice
+
+    @property
+    def facts(self) -> Optional[pd.DataFrame]:
+        """Fact table currently loaded"""
+        return self._facts.frame if self._facts is not None else None
 
     def get_dimension_hierarchy(self, dimension: str) -> List[str]:
         """Get the hierarchy levels for a dimension"""
@@ -73,46 +191,457 @@ class OLAPCube:
         """Get the available aggregations for a measure"""
         return self.measures[measure]['aggregations']
 
-    def calculate_measure(self, measure: str, data: pd.DataFrame) -> pd.Series:
-        """Calculate a measure based on the formula"""
+    def calculate_measure(self, measure: str, data: pd.DataFrame,
+                          facts: Optional[pd.DataFrame] = None) -> pd.Series:
+        """Calculate a measure based on the formula
+
+        data: aggregated result of this cube (one value per row, also after the
+        caller sorted or filtered it) or raw facts (one grand-total value).
+        Formulas are always evaluated over aggregated operands: profit / sales
+        is sum(profit) / sum(sales), not a sum of ratios.
+        facts: fact table data was aggregated from, when it was not the loaded one
+        """
+        query = self._query_of(data)
+        if query is None:
+            return self.get_aggregated_data(data, [], [measure])[measure]
+        
         if measure in self.calculated_measures:
-            formula = self.calculated_measures[measure]['formula']
-            # TODO: Implement formula evaluation
-            return pd.Series()
-        return pd.Series()
+            compiled = compile_formula(self.calculated_measures[measure]['formula'])
+            if all(name in data.columns for name in compiled.names):
+                columns = {name: data[name].to_numpy(dtype=np.float64) for name in compiled.names}
+                return pd.Series(compiled.evaluate(columns), index=data.index, name=measure)
+        elif measure in data.columns:
+            return data[measure]
+        
+        # Operands not in data: re-run its query and join on the member labels,
+        # so rows the caller dropped or reordered still get their own values
+        result = self.get_aggregated_data(
+            self._source(query, facts), query['dimensions'], [measure], query['filters']
+        )
+        labels = [column for column in result.columns if column != measure]
+        missing = [column for column in labels if column not in data.columns]
+        if missing:
+            raise ValueError(f"Cannot match rows to the query result: columns {missing} are missing")
+        joined = data[labels].merge(result, on=labels, how='left')
+        return pd.Series(joined[measure].to_numpy(), index=data.index, name=measure)
+
+    def rollup(self, data: pd.DataFrame, dimension: str, level: str,
+               facts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Roll up data to a specific dimension level
 
-    def rollup(self, data: pd.DataFrame, dimension: str, level: str) -> pd.DataFrame:
-        """Roll up data to a specific dimension level"""
+        facts: fact table data was aggregated from, when it was not the loaded one
+        """
         if level not in self.dimensions[dimension]['hierarchy']:
             raise ValueError(f"Invalid level {level} for dimension {dimension}")
         
-        # TODO: Implement rollup logic
-        return data
+        return self._navigate(data, dimension, level, drilldown=False, facts=facts)
 
-    def drilldown(self, data: pd.DataFrame, dimension: str, level: str) -> pd.DataFrame:
-        """Drill down data to a specific dimension level"""
+    def drilldown(self, data: pd.DataFrame, dimension: str, level: str,
+                  facts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Drill down data to a specific dimension level
+
+        facts: fact table data was aggregated from, when it was not the loaded one
+        """
         if level not in self.dimensions[dimension]['hierarchy']:
             raise ValueError(f"Invalid level {level} for dimension {dimension}")
         
-        # TODO: Implement drilldown logic
-        return data
+        return self._navigate(data, dimension, level, drilldown=True, facts=facts)
 
-    def slice(self, data: pd.DataFrame, dimension: str, value: Any) -> pd.DataFrame:
+    def slice(self, data: pd.DataFrame, dimension: str, value: Any,
+              facts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """Slice data for a specific dimension value"""
-        # TODO: Implement slice logic
-        return data
-
-    def dice(self, data: pd.DataFrame, conditions: Dict[str, Any]) -> pd.DataFrame:
-        """Dice data based on multiple conditions"""
-        # TODO: Implement dice logic
-        return data
-
-    def pivot(self, data: pd.DataFrame, rows: List[str], columns: List[str], values: List[str]) -> pd.DataFrame:
-        """Pivot data based on specified dimensions and measures"""
-        # TODO: Implement pivot logic
-        return data
-
-    def get_aggregated_data(self, data: pd.DataFrame, dimensions: List[str], measures: List[str]) -> pd.DataFrame:
-        """Get aggregated data based on specified dimensions and measures"""
-        # TODO: Implement aggregation logic
-        return data 
\ No newline at end of file
+        return self.dice(data, {dimension: value}, facts=facts)
+
+    def dice(self, data: pd.DataFrame, conditions: Dict[str, Any],
+             facts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Dice data based on multiple conditions
+
+        Aggregated results are filtered on their member labels, keeping any
+        change the caller made; conditions on levels not in the result re-run
+        its query, which requires data to be unmodified.
+        facts: fact table data was aggregated from, when it was not the loaded one
+        """
+        query = self._query_of(data)
+        if query is None:
+            rows = self._select_rows(self._encoded(data), conditions)
+            return data if rows is None else data.iloc[rows]
+        
+        filters = self._merge_filters(query['filters'], conditions)
+        levels = {self._resolve_level(name)[1]: value for name, value in conditions.items()}
+        if not all(level in data.columns for level in levels):
+            return self._replay(data, facts, query['dimensions'], query['measures'], filters)
+        
+        mask = np.ones(len(data), dtype=bool)
+        for level, value in levels.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= data[level].isin(list(values)).to_numpy()
+        diced = data[mask]
+        # Rows picked from an unmodified result are the result of the diced query
+        unmodified = self._unmodified(data, query)
+        diced.attrs['olap_query'] = {
+            **query,
+            'filters': filters,
+            'fingerprint': self._fingerprint(diced, query['columns']) if unmodified else None
+        }
+        return diced
+
+    def pivot(self, data: pd.DataFrame, rows: List[str], columns: List[str], values: List[str],
+              filters: Optional[Dict[str, Any]] = None, facts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Pivot data based on specified dimensions and measures
+
+        data: fact table, None for the loaded one, or an unmodified aggregated
+        result whose query (and filters) the pivot starts from
+        facts: fact table an aggregated data came from, when it was not the loaded one
+        """
+        row_levels = self._normalize_dimensions(rows)
+        column_levels = self._normalize_dimensions(columns)
+        
+        query = self._query_of(data)
+        if query is not None:
+            filters = self._merge_filters(query['filters'], filters or {})
+            aggregated = self._replay(data, facts, row_levels + column_levels, values, filters)
+            source = self._source(query, facts)
+        else:
+            source = data
+            aggregated = self.get_aggregated_data(source, row_levels + column_levels, values, filters)
+        facts = self._encoded(source)
+        
+        index = [name for level in row_levels for name in facts.path(level)]
+        header = [name for level in column_levels for name in facts.path(level)]
+        table = aggregated.set_index(index + header)[list(values)]
+        return table.unstack(header) if header else table
+
+    def get_aggregated_data(self, data: pd.DataFrame, dimensions: List[str], measures: List[str],
+                            filters: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """Get aggregated data based on specified dimensions and measures
+
+        data: fact table, or None for the facts passed to load()
+        dimensions: levels or attributes ('month', 'time.month', 'store.region');
+            each level comes with its ancestors, e.g. 'city' -> region, city
+        measures: 'sales' (first declared aggregation), 'sales_avg', 'customer_count_distinct_count'...
+            or a calculated measure ('profit_margin'), evaluated after aggregation
+        filters: {level: value or list of values}
+        """
+        facts = self._encoded(data)
+        levels = self._normalize_dimensions(dimensions)
+        filters = {self._resolve_level(name)[1]: value for name, value in (filters or {}).items()}
+        
+        # Base aggregations: requested measures plus the operands of the formulas
+        specs: Dict[str, Tuple[str, str]] = {}
+        formulas = {}
+        for name in measures:
+            if name in self.calculated_measures:
+                formulas[name] = compile_formula(self.calculated_measures[name]['formula'])
+                for operand in formulas[name].names:
+                    if operand not in specs:
+                        specs[operand] = self._operand_spec(facts, operand)
+            elif name not in specs:
+                measure, aggregation = self._parse_measure(name)
+                specs[name] = (self._measure_column(measure), aggregation)
+        specs_list = [(name, column, aggregation) for name, (column, aggregation) in specs.items()]
+        
+        answer = None
+        if self._lattice is not None and facts is self._facts:
+            # Smallest materialized cuboid that covers the query, if any
+            answer = self._lattice.aggregate(levels, specs_list, filters)
+        if answer is None:
+            answer = self._aggregate_facts(facts, levels, specs_list, filters)
+        members, values = answer
+        
+        # Ratios are taken over the aggregated operands
+        for name, compiled in formulas.items():
+            values[name] = compiled.evaluate(values)
+        
+        result = {}
+        for level, level_members in zip(levels, members):
+            result.update(self._path_labels(facts, level, level_members))
+        for name in measures:
+            result[name] = values[name]
+        
+        aggregated = pd.DataFrame(result, columns=list(result))
+        aggregated.attrs['olap_query'] = {
+            'dimensions': levels,
+            'measures': list(measures),
+            'filters': filters,
+            # Replays of the query read the loaded facts, or need the caller's table
+            'source': 'loaded' if facts is self._facts else 'data',
+            # Tells later navigation whether the caller changed the result
+            'columns': list(result),
+            'fingerprint': self._fingerprint(aggregated, list(result))
+        }
+        return aggregated
+
+    def _aggregate_facts(self, facts: EncodedFacts, levels: List[str], specs: List[Tuple[str, str, str]],
+                         filters: Dict[str, Any]) -> Tuple[List[np.ndarray], Dict[str, np.ndarray]]:
+        """Aggregate straight from the fact rows"""
+        rows = self._select_rows(facts, filters)
+        codes = [self._take(facts.level(level).codes, rows) for level in levels]
+        
+        # Rows with a null member in a grouping level are left out (as in groupby)
+        valid = None
+        for level_codes in codes:
+            if (level_codes < 0).any():
+                valid = level_codes >= 0 if valid is None else valid & (level_codes >= 0)
+        if valid is not None:
+            keep = np.flatnonzero(valid)
+            rows = keep if rows is None else rows[keep]
+            codes = [level_codes[keep] for level_codes in codes]
+        
+        n_rows = facts.n_rows if rows is None else len(rows)
+        cardinalities = [facts.level(level).cardinality for level in levels]
+        group, members, n_groups = group_rows(codes, cardinalities, n_rows)
+        
+        values = {
+            name: self._aggregate(facts, column, aggregation, rows, group, n_groups)
+            for name, column, aggregation in specs
+        }
+        
+        if rows is None and self._lattice is not None and facts is self._facts:
+            # Aggregate over every row: kept so that rollups from it skip the facts
+            self._lattice.remember(levels, group, members, n_groups)
+        return members, values
+
+    def normalize_query(self, dimensions: List[str], measures: List[str],
+                        filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Canonical form of a query (resolved levels, sorted filters), e.g. for cache keys"""
+        normalized = {}
+        for name, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            normalized[self._resolve_level(name)[1]] = sorted(values, key=str)
+        return {
+            'dimensions': self._normalize_dimensions(dimensions),
+            'measures': list(measures),
+            'filters': dict(sorted(normalized.items()))
+        }
+
+    def _encoded(self, data: Optional[pd.DataFrame]) -> EncodedFacts:
+        """Encoded facts for data (the loaded table is encoded only once)"""
+        if data is None:
+            if self._facts is None:
+                raise ValueError("No fact table loaded; call load() first")
+            return self._facts
+        if self._facts is not None and data is self._facts.frame:
+            return self._facts
+        return EncodedFacts(data, self.dimensions)
+
+    @staticmethod
+    def _query_of(data: Optional[pd.DataFrame]) -> Optional[Dict[str, Any]]:
+        """Query that produced data, if it is an aggregated result of this cube"""
+        if data is None:
+            return None
+        return data.attrs.get('olap_query')
+
+    def _source(self, query: Dict[str, Any], facts: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        """Fact table a query result was aggregated from (None: the loaded one)"""
+        if query.get('source', 'loaded') == 'loaded':
+            return None
+        if facts is None:
+            raise ValueError("data was aggregated from a fact table other than the loaded one; pass it as facts")
+        return facts
+
+    def _replay(self, data: pd.DataFrame, facts: Optional[pd.DataFrame], dimensions: List[str],
+                measures: List[str], filters: Dict[str, Any]) -> pd.DataFrame:
+        """Run a variant of the query that produced data (other levels, measures or filters)
+
+        The variant starts from the facts, not from data, so data must still be
+        the query's result: rows the caller dropped, reordered or edited would
+        otherwise be silently ignored. That is checked against the fingerprint
+        taken when the result was built, without running the query again.
+        """
+        query = self._query_of(data)
+        source = self._source(query, facts)
+        if not self._unmodified(data, query):
+            raise ValueError(
+                "data was modified after the query that produced it; "
+                "run the query again (get_aggregated_data) before navigating"
+            )
+        return self.get_aggregated_data(source, dimensions, measures, filters)
+
+    @staticmethod
+    def _fingerprint(data: pd.DataFrame, columns: List[str]) -> str:
+        """Hash of the values of columns, row by row and in order"""
+        hashes = pd.util.hash_pandas_object(data[columns], index=False).to_numpy()
+        return hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+
+    def _unmodified(self, data: pd.DataFrame, query: Dict[str, Any]) -> bool:
+        """Whether data still holds the rows of its query result, in the same order"""
+        columns = query.get('columns')
+        if query.get('fingerprint') is None or not columns or not all(column in data.columns for column in columns):
+            return False
+        return self._fingerprint(data, columns) == query['fingerprint']
+
+    def _resolve_level(self, name: str) -> Tuple[str, str]:
+        """(dimension, level) of 'level', 'dimension.level' or a dimension name (top level)"""
+        if '.' in name:
+            dimension, level = name.split('.', 1)
+            spec = self.dimensions.get(dimension)
+            if spec is None or level not in spec['hierarchy'] + spec['attributes']:
+                raise ValueError(f"Invalid level {level} for dimension {dimension}")
+            return dimension, level
+        
+        for dimension, spec in self.dimensions.items():
+            if name in spec['hierarchy'] or name in spec['attributes']:
+                return dimension, name
+        if name in self.dimensions:
+            return name, self.dimensions[name]['hierarchy'][0]
+        raise ValueError(f"Unknown dimension level {name}")
+
+    def _normalize_dimensions(self, dimensions: List[str]) -> List[str]:
+        """Resolve level names, keeping only the deepest requested level of each hierarchy"""
+        levels: List[str] = []
+        deepest: Dict[str, int] = {}
+        for name in dimensions:
+            dimension, level = self._resolve_level(name)
+            hierarchy = self.dimensions[dimension]['hierarchy']
+            if level not in hierarchy:
+                if level not in levels:
+                    levels.append(level)
+                continue
+            
+            if dimension not in deepest:
+                deepest[dimension] = len(levels)
+                levels.append(level)
+            elif hierarchy.index(level) > hierarchy.index(levels[deepest[dimension]]):
+                levels[deepest[dimension]] = level
+        return levels
+
+    def _measure_column(self, measure: str) -> str:
+        return self.measures[measure].get('column', measure)
+
+    def _parse_measure(self, name: str) -> Tuple[str, str]:
+        """(measure, aggregation) of a measure name such as 'sales' or 'sales_avg'"""
+        if name in self.measures:
+            return name, self.measures[name]['aggregations'][0]
+        
+        for aggregation in AGGREGATIONS:
+            suffix = f"_{aggregation}"
+            measure = name[:-len(suffix)]
+            if name.endswith(suffix) and measure in self.measures:
+                if aggregation not in self.get_measure_aggregations(measure):
+                    raise ValueError(f"Aggregation {aggregation} not available for measure {measure}")
+                return measure, aggregation
+        raise ValueError(f"Unknown measure {name}")
+
+    def _operand_spec(self, facts: EncodedFacts, name: str) -> Tuple[str, str]:
+        """(column, aggregation) of a formula operand
+
+        Measures use their declared (or suffixed) aggregation; other numeric
+        fact columns, such as the product attribute stock_level, their average
+        """
+        try:
+            measure, aggregation = self._parse_measure(name)
+            return self._measure_column(measure), aggregation
+        except ValueError:
+            pass
+        if name in facts.frame.columns and pd.api.types.is_numeric_dtype(facts.frame[name]):
+            return name, 'avg'
+        raise ValueError(f"Unknown operand {name} in formula")
+
+    @staticmethod
+    def _take(values: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        return values if rows is None else values[rows]
+
+    def _select_rows(self, facts: EncodedFacts, conditions: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Row ids matching all conditions (None when there is nothing to filter)"""
+        if not conditions:
+            return None
+        
+        if self._bitmaps is not None and facts is self._facts:
+            return self._bitmaps.select({self._resolve_level(name)[1]: value for name, value in conditions.items()})
+        
+        mask = None
+        for name, value in conditions.items():
+            _, level = self._resolve_level(name)
+            level_mask = facts.level(level).mask(value)
+            mask = level_mask if mask is None else mask & level_mask
+        return np.flatnonzero(mask)
+
+    def _merge_filters(self, filters: Dict[str, Any], conditions: Dict[str, Any]) -> Dict[str, Any]:
+        """AND new conditions into existing filters (same level: intersection)"""
+        merged = {self._resolve_level(name)[1]: value for name, value in filters.items()}
+        for name, value in conditions.items():
+            _, level = self._resolve_level(name)
+            if level in merged:
+                current = merged[level] if isinstance(merged[level], (list, tuple, set)) else [merged[level]]
+                new = value if isinstance(value, (list, tuple, set)) else [value]
+                value = [item for item in current if item in new]
+            merged[level] = value
+        return merged
+
+    @staticmethod
+    def _path_labels(facts: EncodedFacts, level: str, members: np.ndarray) -> Dict[str, Any]:
+        """Labels of the group members for level and each of its ancestors"""
+        labels = {}
+        encoded = facts.level(level)
+        while True:
+            labels[encoded.name] = encoded.labels.take(members)
+            if encoded.parent is None:
+                break
+            members = encoded.parent_codes[members]
+            encoded = facts.level(encoded.parent)
+        return dict(reversed(list(labels.items())))
+
+    def _aggregate(self, facts: EncodedFacts, column: str, aggregation: str,
+                   rows: Optional[np.ndarray], group: np.ndarray, n_groups: int) -> np.ndarray:
+        """Aggregate one fact column per group with bincount over the group ids"""
+        if aggregation == 'distinct_count':
+            codes, cardinality = facts.distinct_codes(column)
+            codes = self._take(codes, rows)
+            valid = codes >= 0
+            # Distinct (group, value) pairs, counted per group
+            width = max(cardinality, 1)
+            pairs = pd.unique(group[valid] * width + codes[valid])
+            return np.bincount(pairs // width, minlength=n_groups)
+        
+        if aggregation == 'count' and not pd.api.types.is_numeric_dtype(facts.frame[column]):
+            codes = self._take(facts.distinct_codes(column)[0], rows)
+            return np.bincount(group[codes >= 0], minlength=n_groups)
+        
+        values = self._take(facts.values(column), rows)
+        valid = ~np.isnan(values)
+        if not valid.all():
+            values, group = values[valid], group[valid]
+        
+        counts = np.bincount(group, minlength=n_groups)
+        if aggregation == 'count':
+            return counts
+        sums = np.bincount(group, weights=values, minlength=n_groups)
+        if aggregation == 'sum':
+            return sums
+        # avg
+        return np.divide(sums, counts, out=np.full(n_groups, np.nan), where=counts > 0)
+
+    def _default_measures(self, facts: EncodedFacts) -> List[str]:
+        """Measures whose source column exists in the fact table"""
+        return [
+            measure for measure in self.measures
+            if self._measure_column(measure) in facts.frame.columns
+        ]
+
+    def _navigate(self, data: pd.DataFrame, dimension: str, level: str, drilldown: bool,
+                  facts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Move the level of one dimension up (rollup) or down (drilldown)"""
+        query = self._query_of(data)
+        if query is None:
+            # Raw facts: aggregate straight to the requested level
+            facts = self._encoded(data)
+            return self.get_aggregated_data(data, [f"{dimension}.{level}"], self._default_measures(facts))
+        
+        hierarchy = self.dimensions[dimension]['hierarchy']
+        levels = list(query['dimensions'])
+        current = [name for name in levels if name in hierarchy]
+        
+        if not current:
+            if not drilldown:
+                raise ValueError(f"Dimension {dimension} is not in the query; use drilldown")
+            levels.append(level)
+        else:
+            position = hierarchy.index(current[0])
+            target = hierarchy.index(level)
+            if drilldown and target < position:
+                raise ValueError(f"Level {level} is above {current[0]}; use rollup")
+            if not drilldown and target > position:
+                raise ValueError(f"Level {level} is below {current[0]}; use drilldown")
+            levels[levels.index(current[0])] = level
+        
+        return self._replay(data, facts, levels, query['measures'], query['filters'])
@@ -0,0 +1,348 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+# Fact column the time hierarchy is derived from
+DATE_COLUMN = 'date'
+TIME_LEVELS = ('year', 'quarter', 'month', 'day')
+
+# Mixed-radix group keys are compressed before they can overflow int64
+_MAX_KEY = 1 << 62
+
+
+class EncodedLevel:
+    """Integer codes of one dimension level (-1 for nulls), its labels and parent mapping"""
+
+    def __init__(self, name: str, codes: np.ndarray, labels: pd.Index,
+                 parent: Optional[str] = None, parent_codes: Optional[np.ndarray] = None):
+        self.name = name
+        self.codes = codes
+        self.labels = labels
+        # Code of the parent member for each member of this level
+        self.parent = parent
+        self.parent_codes = parent_codes
+
+    @property
+    def cardinality(self) -> int:
+        return len(self.labels)
+
+    def lookup(self, values: Any) -> np.ndarray:
+        """Codes of the members whose label is in values"""
+        if not isinstance(values, (list, tuple, set, np.ndarray, pd.Index)):
+            values = [values]
+        values = list(values)
+        if isinstance(self.labels, pd.DatetimeIndex):
+            values = pd.to_datetime(values)
+        return np.flatnonzero(self.labels.isin(values))
+
+    def mask(self, values: Any) -> np.ndarray:
+        """Boolean row mask for the members whose label is in values"""
+        # One extra slot so that null rows (code -1) map to False
+        lut = np.zeros(self.cardinality + 1, dtype=bool)
+        lut[self.lookup(values)] = True
+        return lut[self.codes]
+
+
+def _encode_column(name: str, column: pd.Series, parent: Optional[EncodedLevel]) -> EncodedLevel:
+    """Dictionary-encode a column; child levels are encoded on the (parent, value) path"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        local = column.cat.codes.to_numpy()
+        uniques = pd.Index(column.cat.categories)
+    else:
+        local, uniques = pd.factorize(column, sort=True)
+        uniques = pd.Index(uniques)
+
+    if parent is None:
+        return EncodedLevel(name, local.astype(np.int32), uniques)
+
+    # The same value under two parents (e.g. two cities with the same name in
+    # different regions) becomes two members, so the hierarchy stays a tree
+    width = max(len(uniques), 1)
+    valid = (local >= 0) & (parent.codes >= 0)
+    combined = parent.codes[valid].astype(np.int64) * width + local[valid]
+    path_codes, path_keys = pd.factorize(combined, sort=True)
+    path_keys = np.asarray(path_keys, dtype=np.int64)
+
+    codes = np.full(len(column), -1, dtype=np.int32)
+    codes[valid] = path_codes
+    return EncodedLevel(name, codes, uniques.take(path_keys % width), parent.name, path_keys // width)
+
+
+def _extend_level(level: EncodedLevel, column: pd.Series, parent: Optional[EncodedLevel]) -> EncodedLevel:
+    """
+    Level of the existing rows plus the appended values in column
+    Existing members keep their codes; members first seen here are added
+    after them. parent is the already extended parent level
+    """
+    start = len(level.codes)
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype(object)
+    values = pd.Index(column)
+
+    # Distinct values, before the hierarchy path is taken into account
+    uniques = pd.Index(pd.unique(level.labels)) if parent is not None else level.labels
+    value_ids = uniques.get_indexer(values)
+    unseen = (value_ids < 0) & values.notna()
+    if unseen.any():
+        uniques = uniques.append(pd.Index(pd.unique(values[unseen])))
+        value_ids = uniques.get_indexer(values)
+
+    if parent is None:
+        codes = np.concatenate([level.codes, value_ids.astype(np.int32)])
+        return EncodedLevel(level.name, codes, uniques)
+
+    # Members are (parent member, value) pairs, as in _encode_column
+    width = max(len(uniques), 1)
+    parent_codes = parent.codes[start:]
+    member_keys = level.parent_codes.astype(np.int64) * width + uniques.get_indexer(level.labels)
+    valid = (value_ids >= 0) & (parent_codes >= 0)
+    keys = parent_codes[valid].astype(np.int64) * width + value_ids[valid]
+    found = pd.Index(member_keys).get_indexer(keys)
+    labels, member_parents = level.labels, level.parent_codes
+    if (found < 0).any():
+        added = np.unique(keys[found < 0])
+        member_keys = np.concatenate([member_keys, added])
+        labels = labels.append(uniques.take(added % width))
+        member_parents = np.concatenate([member_parents, added // width])
+        found = pd.Index(member_keys).get_indexer(keys)
+
+    codes = np.full(len(values), -1, dtype=np.int32)
+    codes[valid] = found
+    return EncodedLevel(level.name, np.concatenate([level.codes, codes]), labels, level.parent, member_parents)
+
+
+def _encode_time(dates: pd.Series) -> Dict[str, EncodedLevel]:
+    """
+    Encode year/quarter/month/day from a date column with integer arithmetic
+    Codes are offsets from the first period, so labels are contiguous and ordered
+    """
+    days = pd.to_datetime(dates).to_numpy(dtype='datetime64[D]')
+    valid = ~np.isnat(days)
+    day_units = days.view(np.int64)
+    month_units = days.astype('datetime64[M]').view(np.int64)
+
+    units = {
+        'day': day_units,
+        'month': month_units,
+        # Periods counted from 1970-01, so floor division keeps the calendar boundaries
+        'quarter': month_units // 3,
+        'year': month_units // 12
+    }
+
+    members = {}
+    codes = {}
+    for level, values in units.items():
+        if valid.any():
+            base, last = values[valid].min(), values[valid].max()
+        else:
+            base, last = 0, -1
+        members[level] = np.arange(base, last + 1, dtype=np.int64)
+        codes[level] = np.where(valid, values - base, -1).astype(np.int32)
+
+    labels = {
+        'year': pd.Index(members['year'] + 1970),
+        'quarter': pd.Index([f"{q // 4 + 1970}Q{q % 4 + 1}" for q in members['quarter']]),
+        'month': pd.Index(members['month'].astype('datetime64[M]').astype(str)),
+        'day': pd.DatetimeIndex(members['day'].astype('datetime64[D]'))
+    }
+
+    def offset(values: np.ndarray, level: str) -> np.ndarray:
+        return values - members[level][0] if len(members[level]) else values
+
+    parents = {
+        'year': (None, None),
+        'quarter': ('year', offset(members['quarter'] // 4, 'year')),
+        'month': ('quarter', offset(members['month'] // 3, 'quarter')),
+        'day': ('month', offset(members['day'].astype('datetime64[D]').astype('datetime64[M]').view(np.int64), 'month'))
+    }
+
+    return {
+        level: EncodedLevel(level, codes[level], labels[level], *parents[level])
+        for level in TIME_LEVELS
+    }
+
+
+def _extend_time(levels: Dict[str, EncodedLevel], dates: pd.Series) -> Optional[Dict[str, EncodedLevel]]:
+    """
+    Time levels of the existing rows plus the appended dates, or None when a
+    date falls before the first encoded day (every code would shift)
+    """
+    days = levels['day'].labels
+    dates = pd.Series(pd.to_datetime(dates).to_numpy(dtype='datetime64[ns]'))
+    if len(days) == 0 or (dates.notna() & (dates < days[0])).any():
+        return None
+
+    # The first and last encoded days keep the base of each level, so the
+    # codes of the existing rows stay valid and labels only grow at the end
+    bounds = pd.Series(pd.DatetimeIndex([days[0], days[-1]]))
+    encoded = _encode_time(pd.concat([bounds, dates], ignore_index=True))
+    return {
+        level: EncodedLevel(
+            level, np.concatenate([levels[level].codes, encoded[level].codes[2:]]),
+            encoded[level].labels, encoded[level].parent, encoded[level].parent_codes
+        )
+        for level in TIME_LEVELS
+    }
+
+
+class EncodedFacts:
+    """Fact table with dimension columns encoded as integer codes
+
+    Levels are encoded on first use and kept; call encode_all() to pay the
+    whole cost up front (e.g. when the cube is loaded at startup).
+    """
+
+    def __init__(self, facts: pd.DataFrame, dimensions: Dict[str, Dict[str, List[str]]]):
+        self.frame = facts
+        self.n_rows = len(facts)
+        self.dimensions = dimensions
+        self._parents: Dict[str, Optional[str]] = {}
+        for spec in dimensions.values():
+            parent = None
+            for level in spec['hierarchy']:
+                self._parents[level] = parent
+                parent = level
+            for attribute in spec['attributes']:
+                self._parents[attribute] = None
+        self._levels: Dict[str, EncodedLevel] = {}
+        self._values: Dict[str, np.ndarray] = {}
+        # Codes and distinct values of columns counted without their hierarchy path
+        self._distinct: Dict[str, Tuple[np.ndarray, pd.Index]] = {}
+
+    def has_level(self, name: str) -> bool:
+        if name in TIME_LEVELS and DATE_COLUMN in self.frame.columns:
+            return True
+        return name in self.frame.columns
+
+    def level(self, name: str) -> EncodedLevel:
+        """Encoded level, encoding it (and its ancestors) on first use"""
+        if name not in self._levels:
+            if name in TIME_LEVELS and DATE_COLUMN in self.frame.columns:
+                self._levels.update(_encode_time(self.frame[DATE_COLUMN]))
+            elif name in self.frame.columns:
+                parent = self._parents.get(name)
+                parent_level = self.level(parent) if parent and self.has_level(parent) else None
+                self._levels[name] = _encode_column(name, self.frame[name], parent_level)
+            else:
+                raise KeyError(f"Level {name} not found in fact table")
+        return self._levels[name]
+
+    def path(self, name: str) -> List[str]:
+        """Levels from the root of the hierarchy down to name"""
+        path = [name]
+        while self.level(path[0]).parent is not None:
+            path.insert(0, self.level(path[0]).parent)
+        return path
+
+    def distinct_codes(self, column: str) -> Tuple[np.ndarray, int]:
+        """Codes identifying each distinct value of column, ignoring the hierarchy path"""
+        if self.has_level(column) and self.level(column).parent is None:
+            level = self.level(column)
+            return level.codes, level.cardinality
+        if column not in self._distinct:
+            codes, uniques = pd.factorize(self.frame[column])
+            self._distinct[column] = (codes, pd.Index(uniques))
+        codes, uniques = self._distinct[column]
+        return codes, len(uniques)
+
+    def values(self, column: str) -> np.ndarray:
+        """Numeric fact column as float64 (NaN for nulls)"""
+        if column not in self._values:
+            self._values[column] = pd.to_numeric(self.frame[column], errors='coerce').to_numpy(
+                dtype=np.float64, na_value=np.nan
+            )
+        return self._values[column]
+
+    def append(self, facts: pd.DataFrame) -> Optional['EncodedFacts']:
+        """
+        Encoded facts of these rows followed by the rows of facts, without
+        re-encoding the existing ones: levels, values and distinct codes
+        encoded so far are extended with the new rows (rows n_rows onwards)
+        Returns None when that is not possible (new dates before the first
+        encoded day, columns missing from facts)
+        """
+        if not set(self.frame.columns) <= set(facts.columns):
+            return None
+        extended = EncodedFacts(pd.concat([self.frame, facts], ignore_index=True), self.dimensions)
+
+        if 'day' in self._levels:
+            time_levels = _extend_time(self._levels, facts[DATE_COLUMN])
+            if time_levels is None:
+                return None
+            extended._levels.update(time_levels)
+        for name in self._levels:
+            if name not in TIME_LEVELS:
+                extended._extend(self, name, facts)
+
+        for column, values in self._values.items():
+            appended = pd.to_numeric(facts[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            extended._values[column] = np.concatenate([values, appended])
+        for column, (codes, uniques) in self._distinct.items():
+            level = _extend_level(EncodedLevel(column, codes, uniques), facts[column], None)
+            extended._distinct[column] = (level.codes, level.labels)
+        return extended
+
+    def _extend(self, previous: 'EncodedFacts', name: str, facts: pd.DataFrame) -> EncodedLevel:
+        """Extend level name (and its ancestors first) of previous with the rows of facts"""
+        if name not in self._levels:
+            level = previous._levels[name]
+            parent = self._extend(previous, level.parent, facts) if level.parent is not None else None
+            self._levels[name] = _extend_level(level, facts[name], parent)
+        return self._levels[name]
+
+    def encode_all(self, levels: Sequence[str], columns: Sequence[str]) -> None:
+        for name in levels:
+            if self.has_level(name):
+                self.level(name)
+        for column in columns:
+            if column in self.frame.columns and pd.api.types.is_numeric_dtype(self.frame[column]):
+                self.values(column)
+
+
+def group_rows(codes: Sequence[np.ndarray], cardinalities: Sequence[int],
+               n_rows: int) -> Tuple[np.ndarray, List[np.ndarray], int]:
+    """
+    Assign a dense group id to each row from its member codes (all >= 0)
+    Returns the group id per row, the member codes of each group (one array
+    per level, groups in ascending key order) and the number of groups
+    """
+    if n_rows == 0:
+        return np.zeros(0, dtype=np.int64), [np.zeros(0, dtype=np.int64) for _ in codes], 0
+    if not codes:
+        # Grand total
+        return np.zeros(n_rows, dtype=np.int64), [], 1
+
+    key = codes[0].astype(np.int64)
+    size = int(cardinalities[0])
+    compressed = False
+    for level_codes, cardinality in zip(codes[1:], cardinalities[1:]):
+        if size * cardinality > _MAX_KEY:
+            key, uniques = pd.factorize(key, sort=True)
+            size = len(uniques)
+            compressed = True
+        key = key * cardinality + level_codes
+        size *= int(cardinality)
+
+    if not compressed and size <= max(4 * n_rows, 1 << 16):
+        # Small key space: dense bincount, then drop the empty cells
+        present = np.flatnonzero(np.bincount(key, minlength=size))
+        if len(present) == size:
+            group = key
+        else:
+            remap = np.full(size, -1, dtype=np.int64)
+            remap[present] = np.arange(len(present))
+            group = remap[key]
+        keys = present
+    else:
+        group, keys = pd.factorize(key, sort=True)
+        keys = np.asarray(keys, dtype=np.int64)
+
+    n_groups = len(keys)
+    if compressed:
+        # Codes are constant inside a group, so any row of the group decodes it
+        rows = np.empty(n_groups, dtype=np.int64)
+        rows[group] = np.arange(n_rows)
+        members = [level_codes[rows] for level_codes in codes]
+    else:
+        members = list(np.unravel_index(keys, tuple(int(c) for c in cardinalities)))
+    return group, members, n_groups
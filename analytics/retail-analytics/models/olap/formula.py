@@ -0,0 +1,106 @@
+import ast
+from functools import lru_cache
+from typing import Callable, FrozenSet, Mapping
+import numpy as np
+
+
+def safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise division that yields NaN where the denominator is zero"""
+    numerator, denominator = np.broadcast_arrays(
+        np.asarray(numerator, dtype=np.float64), np.asarray(denominator, dtype=np.float64)
+    )
+    result = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=result, where=denominator != 0)
+    return result
+
+
+_BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: safe_divide,
+    ast.Pow: np.power
+}
+
+_UNARY_OPERATORS = {
+    ast.USub: np.negative,
+    ast.UAdd: np.positive
+}
+
+_FUNCTIONS = {
+    'abs': np.abs,
+    'sqrt': np.sqrt,
+    'log': np.log,
+    'min': np.minimum,
+    'max': np.maximum
+}
+
+Evaluator = Callable[[Mapping[str, np.ndarray]], np.ndarray]
+
+
+class CompiledFormula:
+    """Arithmetic formula over measure columns, evaluated with NumPy"""
+
+    def __init__(self, formula: str, evaluator: Evaluator, names: FrozenSet[str]):
+        self.formula = formula
+        self.names = names
+        self._evaluator = evaluator
+
+    def evaluate(self, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Evaluate over aggregated columns; invalid results (0/0, log(-1)...) become NaN"""
+        with np.errstate(all='ignore'):
+            result = np.asarray(self._evaluator(columns), dtype=np.float64)
+        if not self.names:
+            return result
+        length = len(next(iter(columns[name] for name in self.names)))
+        result = np.broadcast_to(result, (length,)).copy()
+        result[~np.isfinite(result)] = np.nan
+        return result
+
+
+def _compile(node: ast.AST, names: set) -> Evaluator:
+    """Turn the AST into nested closures; anything but arithmetic is rejected"""
+    if isinstance(node, ast.Expression):
+        return _compile(node.body, names)
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+            and not isinstance(node.value, bool):
+        value = float(node.value)
+        return lambda columns: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        names.add(name)
+        return lambda columns: columns[name]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        operator = _BINARY_OPERATORS[type(node.op)]
+        left = _compile(node.left, names)
+        right = _compile(node.right, names)
+        return lambda columns: operator(left(columns), right(columns))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        operator = _UNARY_OPERATORS[type(node.op)]
+        operand = _compile(node.operand, names)
+        return lambda columns: operator(operand(columns))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+            and node.func.id in _FUNCTIONS and not node.keywords:
+        function = _FUNCTIONS[node.func.id]
+        arguments = [_compile(argument, names) for argument in node.args]
+        return lambda columns: function(*[argument(columns) for argument in arguments])
+
+    raise ValueError(f"Unsupported expression in formula: {ast.dump(node)}")
+
+
+@lru_cache(maxsize=256)
+def compile_formula(formula: str) -> CompiledFormula:
+    """Parse a formula once; the compiled form is cached per formula string"""
+    try:
+        tree = ast.parse(formula, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid formula {formula!r}: {e}")
+
+    names: set = set()
+    evaluator = _compile(tree, names)
+    return CompiledFormula(formula, evaluator, frozenset(names))
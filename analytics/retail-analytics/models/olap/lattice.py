@@ -0,0 +1,317 @@
+from collections import OrderedDict
+from itertools import product
+from threading import Lock
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from models.olap.encoding import EncodedFacts, group_rows
+
+# Aggregations that can be re-aggregated from partial sums and counts
+ADDITIVE_AGGREGATIONS = ('sum', 'count', 'avg')
+
+
+class Cuboid:
+    """Facts aggregated at one combination of levels: one cell per member combination"""
+
+    def __init__(self, levels: Tuple[str, ...], codes: List[np.ndarray], n_cells: int,
+                 sums: Dict[str, np.ndarray], counts: Dict[str, np.ndarray]):
+        self.levels = levels
+        # Member codes of each level, one entry per cell
+        self.codes = codes
+        self.n_cells = n_cells
+        # Partial aggregates per measure column (sum only for numeric columns)
+        self.sums = sums
+        self.counts = counts
+
+
+class AggregateLattice:
+    """Materialized cuboids of the cube hierarchies with query routing
+
+    The static cuboids are picked with the greedy heuristic of Harinarayan,
+    Rajaraman and Ullman (benefit = rows saved over every cuboid it can answer,
+    sizes estimated from the level cardinalities). Cuboids computed from the raw
+    facts while answering queries are kept in a small LRU cache, so a rollup
+    reuses the aggregate of the query it starts from.
+    """
+
+    def __init__(self, facts: EncodedFacts, dimensions: Dict[str, Dict[str, List[str]]],
+                 columns: Sequence[str], max_cuboids: int = 8, max_cells: Optional[int] = None,
+                 max_cached: int = 16):
+        self.facts = facts
+        self.dimensions = dimensions
+        self.columns = [column for column in columns if column in facts.frame.columns]
+        self.max_cuboids = max_cuboids
+        # Total cells of the static cuboids, and size limit of a cached one
+        self.max_cells = max_cells if max_cells is not None else max(facts.n_rows // 4, 1)
+        self.max_cached = max_cached
+
+        self._numeric = {
+            column: pd.api.types.is_numeric_dtype(facts.frame[column])
+            for column in self.columns
+        }
+        self._cuboids: Dict[FrozenSet[str], Cuboid] = {}
+        self._cache: 'OrderedDict[FrozenSet[str], Cuboid]' = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def cuboids(self) -> List[Tuple[str, ...]]:
+        """Levels of the materialized cuboids (static first, then cached)"""
+        with self._lock:
+            return [cuboid.levels for cuboid in list(self._cuboids.values()) + list(self._cache.values())]
+
+    def _ancestors(self, level: str) -> List[str]:
+        return self.facts.path(level)
+
+    def can_answer(self, levels: Sequence[str], required: Sequence[str]) -> bool:
+        """A cuboid answers a query if each required level is one of its levels or an ancestor"""
+        return all(
+            any(target in self._ancestors(level) for level in levels)
+            for target in required
+        )
+
+    def estimate_size(self, levels: Sequence[str]) -> float:
+        """Expected number of cells: distinct member combinations among n_rows draws"""
+        n_rows = self.facts.n_rows
+        combinations = float(np.prod([self.facts.level(level).cardinality for level in levels]))
+        if combinations <= 1:
+            return min(combinations, n_rows)
+        return min(-combinations * np.expm1(n_rows * np.log1p(-1.0 / combinations)), n_rows)
+
+    def select(self) -> List[Tuple[str, ...]]:
+        """Cuboids to materialize, in order of benefit"""
+        options = [
+            [None] + [level for level in spec['hierarchy'] if self.facts.has_level(level)]
+            for spec in self.dimensions.values()
+        ]
+        candidates = [
+            tuple(level for level in combination if level is not None)
+            for combination in product(*options)
+        ]
+        sizes = np.array([self.estimate_size(levels) for levels in candidates])
+        answers = np.array([
+            [self.can_answer(view, query) for query in candidates]
+            for view in candidates
+        ])
+
+        # Until something is materialized every query scans the facts
+        cost = np.full(len(candidates), float(self.facts.n_rows))
+        chosen: List[int] = []
+        used = 0.0
+        while len(chosen) < self.max_cuboids:
+            benefit = (answers * np.maximum(cost[None, :] - sizes[:, None], 0)).sum(axis=1)
+            benefit[chosen] = 0
+            benefit[used + sizes > self.max_cells] = 0
+            best = int(np.argmax(benefit))
+            if benefit[best] <= 0:
+                break
+            chosen.append(best)
+            used += sizes[best]
+            cost = np.where(answers[best], np.minimum(cost, sizes[best]), cost)
+
+        return [candidates[index] for index in chosen]
+
+    def build(self, selected: Optional[List[Tuple[str, ...]]] = None) -> 'AggregateLattice':
+        """Materialize the selected cuboids, each from the smallest one already built"""
+        if selected is None:
+            selected = self.select()
+
+        for levels in sorted(selected, key=self.estimate_size, reverse=True):
+            source = self.route(levels)
+            if source is None:
+                cuboid = self._from_facts(levels)
+            else:
+                cuboid = self._from_cuboid(source, levels)
+            if cuboid is not None:
+                with self._lock:
+                    self._cuboids[frozenset(levels)] = cuboid
+        return self
+
+    def route(self, required: Sequence[str]) -> Optional[Cuboid]:
+        """Smallest materialized cuboid that can answer a query on the required levels"""
+        with self._lock:
+            candidates = list(self._cuboids.values()) + list(self._cache.values())
+
+        best = None
+        for cuboid in candidates:
+            if (best is None or cuboid.n_cells < best.n_cells) and self.can_answer(cuboid.levels, required):
+                best = cuboid
+
+        if best is not None:
+            with self._lock:
+                key = frozenset(best.levels)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+        return best
+
+    def _partials(self, group: np.ndarray, n_groups: int, rows: Optional[np.ndarray] = None,
+                  source: Optional[Cuboid] = None) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """Sums and counts per group, from the facts or from the cells of a cuboid"""
+        sums = {}
+        counts = {}
+        for column in self.columns:
+            if source is not None:
+                if column in source.sums:
+                    sums[column] = np.bincount(group, weights=_take(source.sums[column], rows), minlength=n_groups)
+                counts[column] = np.bincount(
+                    group, weights=_take(source.counts[column], rows), minlength=n_groups
+                ).astype(np.int64)
+            elif self._numeric[column]:
+                values = self.facts.values(column)
+                valid = ~np.isnan(values)
+                sums[column] = np.bincount(group[valid], weights=values[valid], minlength=n_groups)
+                counts[column] = np.bincount(group[valid], minlength=n_groups)
+            else:
+                codes = self.facts.distinct_codes(column)[0]
+                counts[column] = np.bincount(group[codes >= 0], minlength=n_groups)
+        return sums, counts
+
+    def _from_facts(self, levels: Sequence[str]) -> Optional[Cuboid]:
+        codes = [self.facts.level(level).codes for level in levels]
+        # A cuboid that drops rows with null members could not answer coarser queries
+        if any((level_codes < 0).any() for level_codes in codes):
+            return None
+        cardinalities = [self.facts.level(level).cardinality for level in levels]
+        group, members, n_groups = group_rows(codes, cardinalities, self.facts.n_rows)
+        sums, counts = self._partials(group, n_groups)
+        return Cuboid(tuple(levels), members, n_groups, sums, counts)
+
+    def _codes_at(self, source: Cuboid, level: str) -> np.ndarray:
+        """Member codes of level for each cell, walking up from the finer cuboid level"""
+        for source_level, codes in zip(source.levels, source.codes):
+            path = self._ancestors(source_level)
+            if level in path:
+                for name in reversed(path[path.index(level) + 1:]):
+                    codes = self.facts.level(name).parent_codes[codes]
+                return codes
+        raise KeyError(f"Level {level} cannot be derived from cuboid {source.levels}")
+
+    def _select_cells(self, source: Cuboid, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if not filters:
+            return None
+        mask = np.ones(source.n_cells, dtype=bool)
+        for level, value in filters.items():
+            lut = np.zeros(self.facts.level(level).cardinality, dtype=bool)
+            lut[self.facts.level(level).lookup(value)] = True
+            mask &= lut[self._codes_at(source, level)]
+        return np.flatnonzero(mask)
+
+    def _group_cells(self, source: Cuboid, levels: Sequence[str],
+                     cells: Optional[np.ndarray]) -> Tuple[np.ndarray, List[np.ndarray], int]:
+        codes = [_take(self._codes_at(source, level), cells) for level in levels]
+        cardinalities = [self.facts.level(level).cardinality for level in levels]
+        n_cells = source.n_cells if cells is None else len(cells)
+        return group_rows(codes, cardinalities, n_cells)
+
+    def _from_cuboid(self, source: Cuboid, levels: Sequence[str]) -> Cuboid:
+        group, members, n_groups = self._group_cells(source, levels, None)
+        sums, counts = self._partials(group, n_groups, source=source)
+        return Cuboid(tuple(levels), members, n_groups, sums, counts)
+
+    def aggregate(self, levels: Sequence[str], specs: Sequence[Tuple[str, str, str]],
+                  filters: Optional[Dict[str, Any]] = None) -> Optional[Tuple[List[np.ndarray], Dict[str, np.ndarray]]]:
+        """
+        Answer a query from the smallest cuboid that can
+        specs: (output name, fact column, aggregation) of each measure
+        Returns the member codes and measure values of each group, or None
+        when the query needs the raw facts (e.g. distinct counts)
+        """
+        for _, column, aggregation in specs:
+            if aggregation not in ADDITIVE_AGGREGATIONS or column not in self.columns:
+                return None
+            if aggregation != 'count' and not self._numeric[column]:
+                return None
+
+        source = self.route(list(levels) + list(filters or {}))
+        if source is None:
+            return None
+
+        cells = self._select_cells(source, filters)
+        group, members, n_groups = self._group_cells(source, levels, cells)
+        sums, counts = self._partials(group, n_groups, rows=cells, source=source)
+
+        values = {}
+        for name, column, aggregation in specs:
+            if aggregation == 'sum':
+                values[name] = sums[column]
+            elif aggregation == 'count':
+                values[name] = counts[column]
+            else:
+                values[name] = np.divide(
+                    sums[column], counts[column],
+                    out=np.full(n_groups, np.nan), where=counts[column] > 0
+                )
+        return members, values
+
+    def extend(self, facts: EncodedFacts) -> Optional['AggregateLattice']:
+        """
+        Lattice of facts, whose first rows are the ones aggregated here: every
+        cuboid is merged with the aggregates of the appended rows instead of
+        being built again from all the facts
+        Returns None when the measure columns changed (missing or of another type)
+        """
+        lattice = AggregateLattice(
+            facts, self.dimensions, self.columns,
+            max_cuboids=self.max_cuboids, max_cells=self.max_cells, max_cached=self.max_cached
+        )
+        if lattice.columns != self.columns or lattice._numeric != self._numeric:
+            return None
+
+        with self._lock:
+            static, cached = list(self._cuboids.items()), list(self._cache.items())
+        for key, cuboid in static:
+            merged = lattice._merge(cuboid, self.facts.n_rows)
+            # Cuboids whose levels got null members are dropped, as in _from_facts
+            if merged is not None:
+                lattice._cuboids[key] = merged
+        for key, cuboid in cached:
+            merged = lattice._merge(cuboid, self.facts.n_rows)
+            if merged is not None and merged.n_cells <= lattice.max_cells:
+                lattice._cache[key] = merged
+        return lattice
+
+    def _merge(self, cuboid: Cuboid, start: int) -> Optional[Cuboid]:
+        """Cells of cuboid (aggregates of the rows before start) plus the rows from start on"""
+        appended = [self.facts.level(level).codes[start:] for level in cuboid.levels]
+        if any((codes < 0).any() for codes in appended):
+            return None
+        codes = [np.concatenate([cells, rows]) for cells, rows in zip(cuboid.codes, appended)]
+        cardinalities = [self.facts.level(level).cardinality for level in cuboid.levels]
+        group, members, n_groups = group_rows(codes, cardinalities, cuboid.n_cells + self.facts.n_rows - start)
+
+        # Cells and rows are both partial aggregates: a row is a cell of one fact
+        sums = {}
+        counts = {}
+        for column in self.columns:
+            if self._numeric[column]:
+                values = self.facts.values(column)[start:]
+                valid = ~np.isnan(values)
+                sums[column] = np.bincount(
+                    group, weights=np.concatenate([cuboid.sums[column], np.where(valid, values, 0.0)]),
+                    minlength=n_groups
+                )
+            else:
+                valid = self.facts.distinct_codes(column)[0][start:] >= 0
+            counts[column] = np.bincount(
+                group, weights=np.concatenate([cuboid.counts[column], valid]), minlength=n_groups
+            ).astype(np.int64)
+        return Cuboid(cuboid.levels, members, n_groups, sums, counts)
+
+    def remember(self, levels: Sequence[str], group: np.ndarray, members: List[np.ndarray], n_groups: int) -> None:
+        """Keep the aggregate of a query computed over all fact rows for later rollups"""
+        key = frozenset(levels)
+        if n_groups > self.max_cells or self.max_cached <= 0:
+            return
+        with self._lock:
+            if key in self._cuboids or key in self._cache:
+                return
+
+        sums, counts = self._partials(group, n_groups)
+        with self._lock:
+            self._cache[key] = Cuboid(tuple(levels), members, n_groups, sums, counts)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+
+def _take(values: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+    return values if rows is None else values[rows]
@@ -0,0 +1,186 @@
+from threading import Lock
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from models.olap.encoding import DATE_COLUMN
+
+# Additive daily totals, answered from prefix sums
+TOTALS = ('revenue', 'quantity', 'orders')
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Number of significant bits of each uint64 (0 for 0)"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= np.uint64(1 << shift)
+        length += shift * high
+        values[high] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+class SummaryTiles:
+    """Day-level summary tiles answering any date range in O(1)
+
+    Revenue, quantity and orders (fact rows) are kept as prefix sums over the
+    days of the period, so a range total is the difference of two entries.
+    Distinct customers use one HyperLogLog sketch per day; sketches merge with
+    an element-wise max, which is idempotent, so a sparse table of merged
+    sketches (level k covers 2**k days) answers a range with two overlapping
+    blocks. Both structures are updated in place as new sales arrive, only
+    from the first day touched onwards.
+    """
+
+    def __init__(self, precision: int = 10):
+        self.precision = precision
+        self.n_registers = 1 << precision
+        self.origin: Optional[np.datetime64] = None
+        self.n_rows = 0
+        # (days, len(TOTALS)) daily totals and (days + 1, len(TOTALS)) prefix sums
+        self._daily = np.zeros((0, len(TOTALS)))
+        self._prefix = np.zeros((1, len(TOTALS)))
+        # _sketches[k][i]: registers merged over days i .. i + 2**k - 1
+        self._sketches: List[np.ndarray] = []
+        self._lock = Lock()
+
+    @property
+    def n_days(self) -> int:
+        return len(self._daily)
+
+    def add(self, facts: pd.DataFrame) -> None:
+        """Fold new facts (date, sales, quantity, customer) into the tiles"""
+        days = pd.to_datetime(facts[DATE_COLUMN]).to_numpy().astype('datetime64[D]')
+        dated = ~np.isnat(days)
+        facts, days = facts[dated], days[dated]
+        if facts.empty:
+            return
+        totals = np.column_stack([
+            self._column(facts, 'sales'),
+            self._column(facts, 'quantity'),
+            np.ones(len(facts))
+        ])
+
+        with self._lock:
+            first, last = days.min(), days.max()
+            if self.origin is None:
+                self.origin = first
+            if first < self.origin:
+                self._shift(int((self.origin - first).astype(np.int64)))
+                self.origin = first
+            index = (days - self.origin).astype(np.int64)
+            self._grow(int((last - self.origin).astype(np.int64)) + 1)
+
+            for column in range(len(TOTALS)):
+                self._daily[:, column] += np.bincount(index, weights=totals[:, column], minlength=self.n_days)
+            start = int(index.min())
+            self._prefix[start + 1:] = self._prefix[start] + np.cumsum(self._daily[start:], axis=0)
+
+            if 'customer' in facts.columns:
+                self._add_customers(index, facts['customer'])
+            self._merge_levels(start, int(index.max()))
+            self.n_rows += len(facts)
+
+    @staticmethod
+    def _column(facts: pd.DataFrame, column: str) -> np.ndarray:
+        if column not in facts.columns:
+            return np.zeros(len(facts))
+        return pd.to_numeric(facts[column], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    def _grow(self, n_days: int) -> None:
+        """Extend the period to n_days days"""
+        extra = n_days - self.n_days
+        if extra <= 0:
+            return
+        self._daily = np.vstack([self._daily, np.zeros((extra, len(TOTALS)))])
+        self._prefix = np.vstack([self._prefix, np.repeat(self._prefix[-1:], extra, axis=0)])
+        if not self._sketches:
+            self._sketches.append(np.zeros((0, self.n_registers), dtype=np.uint8))
+        self._sketches[0] = np.vstack([
+            self._sketches[0], np.zeros((extra, self.n_registers), dtype=np.uint8)
+        ])
+
+    def _shift(self, extra: int) -> None:
+        """Prepend extra days (sales older than the current origin); levels are rebuilt"""
+        self._daily = np.vstack([np.zeros((extra, len(TOTALS))), self._daily])
+        self._prefix = np.vstack([np.zeros((extra, len(TOTALS))), self._prefix])
+        self._sketches = [np.vstack([
+            np.zeros((extra, self.n_registers), dtype=np.uint8), self._sketches[0]
+        ])]
+        self._merge_levels(0, self.n_days - 1)
+
+    def _add_customers(self, index: np.ndarray, customers: pd.Series) -> None:
+        known = customers.notna().to_numpy()
+        if not known.any():
+            return
+        hashes = pd.util.hash_array(customers[known].astype(str).to_numpy(dtype=object))
+        suffix_bits = 64 - self.precision
+        register = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        # Position of the first set bit in the suffix
+        rank = (suffix_bits - _bit_length(suffix) + 1).astype(np.uint8)
+
+        cell = index[known] * self.n_registers + register
+        best = pd.Series(rank).groupby(cell).max()
+        registers = self._sketches[0].reshape(-1)
+        cells = best.index.to_numpy()
+        registers[cells] = np.maximum(registers[cells], best.to_numpy(dtype=np.uint8))
+
+    def _merge_levels(self, start: int, end: int) -> None:
+        """Recompute the sparse table blocks covering days start .. end"""
+        level = 1
+        while (1 << level) <= self.n_days:
+            width, half = 1 << level, 1 << (level - 1)
+            size = self.n_days - width + 1
+            below = self._sketches[level - 1]
+            if level == len(self._sketches):
+                self._sketches.append(np.zeros((0, self.n_registers), dtype=np.uint8))
+            sketches = self._sketches[level]
+            if len(sketches) < size:
+                sketches = np.vstack([sketches, np.zeros((size - len(sketches), self.n_registers), dtype=np.uint8)])
+                self._sketches[level] = sketches
+            lo, hi = max(start - width + 1, 0), min(end, size - 1)
+            if lo <= hi:
+                np.maximum(below[lo:hi + 1], below[lo + half:hi + half + 1], out=sketches[lo:hi + 1])
+            level += 1
+
+    def _estimate(self, registers: np.ndarray) -> float:
+        """HyperLogLog cardinality estimate, with linear counting for small sets"""
+        m = self.n_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+    def _day(self, date: Any, default: int) -> int:
+        if date is None:
+            return default
+        return int((np.datetime64(pd.Timestamp(date).date()) - self.origin).astype(np.int64))
+
+    def query(self, start_date: Any = None, end_date: Any = None) -> Dict[str, Any]:
+        """Totals, average ticket and distinct customers between two dates (inclusive)"""
+        with self._lock:
+            summary = {name: 0.0 for name in TOTALS}
+            summary.update({'customers': 0, 'average_ticket': 0.0, 'start_date': None, 'end_date': None})
+            if self.origin is None:
+                return summary
+
+            start = max(self._day(start_date, 0), 0)
+            end = min(self._day(end_date, self.n_days - 1), self.n_days - 1)
+            if start > end:
+                return summary
+
+            totals = self._prefix[end + 1] - self._prefix[start]
+            level = int(end - start + 1).bit_length() - 1
+            sketches = self._sketches[level]
+            registers = np.maximum(sketches[start], sketches[end - (1 << level) + 1])
+
+        summary.update({name: float(value) for name, value in zip(TOTALS, totals)})
+        summary['orders'] = int(totals[2])
+        summary['customers'] = int(round(self._estimate(registers)))
+        summary['average_ticket'] = summary['revenue'] / summary['orders'] if summary['orders'] else 0.0
+        summary['start_date'] = str(self.origin + np.timedelta64(start, 'D'))
+        summary['end_date'] = str(self.origin + np.timedelta64(end, 'D'))
+        return summary
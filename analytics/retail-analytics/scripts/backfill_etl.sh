@@ -0,0 +1,23 @@
+#!/usr/bin/env bash
+# Backfill of the retail_etl DAG: one run per day (date partition) between START and END,
+# each with one extract/transform/load per store shard. Re-running a range replaces the
+# partitions already loaded.
+#
+# Usage: scripts/backfill_etl.sh START_DATE END_DATE [MAX_ACTIVE_RUNS] [MAX_ACTIVE_TASKS]
+#   e.g. docker-compose exec airflow /opt/airflow/scripts/backfill_etl.sh 2024-01-01 2024-06-30 8 32
+set -euo pipefail
+
+if [ "$#" -lt 2 ]; then
+    echo "Usage: $0 START_DATE END_DATE [MAX_ACTIVE_RUNS] [MAX_ACTIVE_TASKS]" >&2
+    exit 1
+fi
+
+# Read by the DAG when the backfill parses it
+export RETAIL_ETL_MAX_ACTIVE_RUNS="${3:-${RETAIL_ETL_MAX_ACTIVE_RUNS:-4}}"
+export RETAIL_ETL_MAX_ACTIVE_TASKS="${4:-${RETAIL_ETL_MAX_ACTIVE_TASKS:-16}}"
+
+exec airflow dags backfill retail_etl \
+    --start-date "$1" \
+    --end-date "$2" \
+    --reset-dagruns \
+    --yes
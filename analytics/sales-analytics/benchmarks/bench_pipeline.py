@@ -0,0 +1,60 @@
+"""
+Benchmarks das etapas do pipeline de vendas (tempo e pico de memória)
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+from src.etl.process_data import load_sales_data, iter_sales_data, calculate_metrics, aggregate_daily
+from src.analysis.sales_forecast import SalesForecast
+from src.analysis.kpi_store import DailyKPIStore
+from src.analysis.kpi_monitor import KPIMonitor
+from src.utils.helpers import clean_dataframe
+
+def _consume_chunks(path):
+    """Percorre o arquivo em blocos mantendo só o agregado diário"""
+    daily = None
+    for chunk in iter_sales_data(path, chunksize=100_000):
+        daily = aggregate_daily(chunk, daily)
+    return daily
+
+def _forecast(df):
+    forecast = SalesForecast(df)
+    forecast.train_model()
+    return forecast.predict_next_days(days=90)
+
+def _forecast_by_category(df):
+    forecast = SalesForecast(df, by='categoria')
+    forecast.train_model()
+    return forecast.predict_next_days(days=90)
+
+def _kpi_report(df):
+    monitor = KPIMonitor(df, store=DailyKPIStore.from_dataframe(df))
+    return monitor.calculate_daily_kpis()
+
+def bench_load_sales_data(benchmark, peak_memory, sales_csv):
+    peak_memory(load_sales_data, sales_csv)
+    benchmark.pedantic(load_sales_data, args=(sales_csv,), rounds=3)
+
+def bench_load_sales_data_chunked(benchmark, peak_memory, sales_csv):
+    peak_memory(_consume_chunks, sales_csv)
+    benchmark.pedantic(_consume_chunks, args=(sales_csv,), rounds=3)
+
+def bench_calculate_metrics(benchmark, peak_memory, sales_df):
+    peak_memory(calculate_metrics, sales_df)
+    benchmark(calculate_metrics, sales_df)
+
+def bench_sales_forecast(benchmark, peak_memory, sales_df):
+    peak_memory(_forecast, sales_df)
+    benchmark.pedantic(_forecast, args=(sales_df,), rounds=3)
+
+def bench_sales_forecast_by_category(benchmark, peak_memory, sales_df):
+    peak_memory(_forecast_by_category, sales_df)
+    benchmark.pedantic(_forecast_by_category, args=(sales_df,), rounds=3)
+
+def bench_kpi_report(benchmark, peak_memory, sales_df):
+    peak_memory(_kpi_report, sales_df)
+    benchmark.pedantic(_kpi_report, args=(sales_df,), rounds=3)
+
+def bench_clean_dataframe(benchmark, peak_memory, sales_df):
+    peak_memory(clean_dataframe, sales_df)
+    benchmark.pedantic(clean_dataframe, args=(sales_df,), rounds=3)
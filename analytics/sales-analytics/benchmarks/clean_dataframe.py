@@ -0,0 +1,70 @@
+"""
+Benchmark de tempo e memória do clean_dataframe
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+
+Uso: python benchmarks/clean_dataframe.py [n_linhas]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from src.utils.helpers import clean_dataframe
+
+def make_frame(n_rows, seed=42):
+    """Frame no formato de vendas, com espaços sobrando, nulos e duplicatas"""
+    rng = np.random.default_rng(seed)
+    produtos = np.array([f" Produto {i} " for i in range(500)], dtype=object)
+    categorias = np.array(['Informática', 'Eletrônicos ', ' Periféricos', 'Games'], dtype=object)
+    vendedores = np.array([f"Vendedor {i}" + ' ' * (i % 2) for i in range(50)], dtype=object)
+
+    df = pd.DataFrame({
+        'data_venda': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), unit='D'),
+        'valor_venda': np.round(rng.gamma(2.0, 100.0, n_rows), 2),
+        'produto': produtos[rng.integers(0, len(produtos), n_rows)],
+        'categoria': categorias[rng.integers(0, len(categorias), n_rows)],
+        'vendedor': vendedores[rng.integers(0, len(vendedores), n_rows)]
+    })
+    df.loc[rng.random(n_rows) < 0.01, 'vendedor'] = None
+    # ~5% de linhas repetidas
+    return pd.concat([df, df.sample(frac=0.05, random_state=seed)], ignore_index=True)
+
+def clean_dataframe_naive(df):
+    """Limpeza coluna a coluna (dropna, drop_duplicates e .str.strip() por linha)"""
+    df = df.dropna()
+    df = df.drop_duplicates()
+    for col in df.select_dtypes(include=['object']).columns:
+        df[col] = df[col].str.strip()
+    return df
+
+def measure(func, df):
+    """Tempo (s) e pico de memória alocada (MB) de uma chamada"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(df)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+def run(n_rows=10_000_000):
+    df = make_frame(n_rows)
+    results = []
+    for name, func, frame in [
+        ('coluna a coluna', clean_dataframe_naive, df),
+        ('clean_dataframe', clean_dataframe, df),
+        # A cópia é feita fora da medição
+        ('clean_dataframe (inplace)', lambda frame: clean_dataframe(frame, inplace=True), df.copy())
+    ]:
+        elapsed, peak = measure(func, frame)
+        results.append({'versao': name, 'tempo_s': elapsed, 'pico_memoria_mb': peak})
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    print(run(n_rows).to_string(index=False))
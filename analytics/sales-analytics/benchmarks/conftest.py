@@ -0,0 +1,99 @@
+"""
+Fixtures do benchmark: dados sintéticos e controle de memória
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import os
+import sys
+import json
+import tracemalloc
+import pytest
+from loguru import logger
+
+BENCH_DIR = os.path.dirname(__file__)
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+from generate_data import SalesGenerator
+
+MEMORY_BASELINE_FILE = os.path.join(BENCH_DIR, 'baselines', 'memory.json')
+
+def pytest_addoption(parser):
+    group = parser.getgroup('sales-benchmarks')
+    group.addoption('--rows', type=float, default=1e5,
+                    help='linhas do conjunto sintético (1e3 a 1e8)')
+    group.addoption('--memory-save', action='store_true',
+                    help='grava o pico de memória atual como baseline')
+    group.addoption('--memory-tolerance', type=float, default=0.2,
+                    help='aumento de memória aceito sobre o baseline (0.2 = 20%%)')
+
+@pytest.fixture(scope='session', autouse=True)
+def quiet_logs():
+    """Evita que o log domine o tempo medido"""
+    logger.disable('src')
+    yield
+    logger.enable('src')
+
+@pytest.fixture(scope='session')
+def n_rows(request):
+    return int(request.config.getoption('--rows'))
+
+@pytest.fixture(scope='session')
+def sales_csv(tmp_path_factory, n_rows):
+    """CSV sintético gerado uma vez por sessão"""
+    path = tmp_path_factory.mktemp('dados') / f'vendas_{n_rows}.csv'
+    SalesGenerator().write_csv(path, n_rows)
+    return path
+
+@pytest.fixture(scope='session')
+def sales_df(sales_csv):
+    from src.etl.process_data import load_sales_data
+    return load_sales_data(sales_csv)
+
+def _load_baselines():
+    if not os.path.exists(MEMORY_BASELINE_FILE):
+        return {}
+    with open(MEMORY_BASELINE_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+@pytest.fixture(scope='session')
+def memory_baselines(request):
+    """Baselines de memória; gravados ao final quando --memory-save é usado"""
+    baselines = _load_baselines()
+    yield baselines
+    if request.config.getoption('--memory-save'):
+        os.makedirs(os.path.dirname(MEMORY_BASELINE_FILE), exist_ok=True)
+        with open(MEMORY_BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+
+@pytest.fixture
+def peak_memory(request, benchmark, n_rows, memory_baselines):
+    """
+    Mede o pico de memória alocada (tracemalloc) de uma execução da etapa,
+    registra no relatório do benchmark e falha se passar do baseline + tolerância
+    """
+    def measure(func, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        peak_mb = peak / (1024 * 1024)
+        benchmark.extra_info['pico_memoria_mb'] = round(peak_mb, 2)
+
+        key = f"{request.node.name}[{n_rows}]"
+        if request.config.getoption('--memory-save'):
+            memory_baselines[key] = peak_mb
+            return peak_mb
+
+        baseline = memory_baselines.get(key)
+        if baseline is not None:
+            limit = baseline * (1 + request.config.getoption('--memory-tolerance'))
+            assert peak_mb <= limit, (
+                f"Regressão de memória em {key}: {peak_mb:.1f} MB (baseline {baseline:.1f} MB)"
+            )
+        return peak_mb
+
+    return measure
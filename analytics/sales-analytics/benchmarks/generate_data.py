@@ -0,0 +1,90 @@
+"""
+Gerador de dados sintéticos de vendas (schema da tabela vendas)
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+
+Uso: python benchmarks/generate_data.py <n_linhas> <arquivo.csv>
+Ex.: python benchmarks/generate_data.py 1e7 data/vendas_1e7.csv
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+
+CATEGORIAS = [
+    'Informática', 'Eletrônicos', 'Periféricos', 'Games', 'Celulares', 'Áudio',
+    'Eletrodomésticos', 'Casa', 'Escritório', 'Câmeras', 'Redes', 'Acessórios'
+]
+# Preço mediano por categoria (R$)
+PRECO_BASE = [2500, 1800, 150, 300, 1500, 250, 1200, 120, 90, 2000, 200, 40]
+
+def _zipf_weights(n, s):
+    """Pesos de Zipf: poucos itens concentram a maior parte das vendas"""
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+class SalesGenerator:
+    def __init__(self, n_produtos=1000, n_vendedores=200, start='2022-01-01', days=730,
+                 skew=1.1, seed=42):
+        """
+        Gera vendas com distribuição realista
+        n_produtos / n_vendedores: cardinalidade das dimensões
+        start / days: período das vendas
+        skew: expoente de Zipf para produtos e vendedores (maior = mais concentrado)
+        """
+        self.rng = np.random.default_rng(seed)
+        self.start = np.datetime64(start, 'D')
+        self.days = days
+
+        # Cada produto pertence a uma categoria; categorias também seguem Zipf
+        self.produto_categoria = self.rng.choice(
+            len(CATEGORIAS), size=n_produtos, p=_zipf_weights(len(CATEGORIAS), 0.8)
+        )
+        self.produtos = np.array([f"Produto {i:05d}" for i in range(n_produtos)], dtype=object)
+        self.vendedores = np.array([f"Vendedor {i:04d}" for i in range(n_vendedores)], dtype=object)
+        self.peso_produtos = _zipf_weights(n_produtos, skew)
+        self.peso_vendedores = _zipf_weights(n_vendedores, skew)
+
+        # Mais vendas no fim de semana e tendência leve de crescimento
+        day_index = np.arange(days)
+        weekday = (self.start + day_index).astype('int64') % 7
+        weights = np.where(np.isin(weekday, [2, 3]), 1.4, 1.0) * (1 + day_index / days * 0.3)
+        self.peso_dias = weights / weights.sum()
+
+    def generate(self, n_rows):
+        """Retorna um DataFrame com n_rows vendas"""
+        rng = self.rng
+        produto = rng.choice(len(self.produtos), size=n_rows, p=self.peso_produtos)
+        categoria = self.produto_categoria[produto]
+        preco_base = np.asarray(PRECO_BASE, dtype='float64')[categoria]
+
+        return pd.DataFrame({
+            'data_venda': self.start + rng.choice(self.days, size=n_rows, p=self.peso_dias),
+            'valor_venda': np.round(preco_base * rng.lognormal(0.0, 0.5, n_rows), 2),
+            'produto': self.produtos[produto],
+            'categoria': np.asarray(CATEGORIAS, dtype=object)[categoria],
+            'vendedor': self.vendedores[rng.choice(len(self.vendedores), size=n_rows, p=self.peso_vendedores)]
+        })
+
+    def write_csv(self, path, n_rows, chunk_rows=1_000_000):
+        """Grava n_rows vendas em CSV, em blocos (memória constante até 1e8+ linhas)"""
+        written = 0
+        while written < n_rows:
+            size = min(chunk_rows, n_rows - written)
+            self.generate(size).to_csv(
+                path,
+                mode='w' if written == 0 else 'a',
+                header=written == 0,
+                index=False,
+                date_format='%Y-%m-%d'
+            )
+            written += size
+        return written
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    n_rows = int(float(sys.argv[1]))
+    SalesGenerator().write_csv(sys.argv[2], n_rows)
+    print(f"{n_rows} linhas gravadas em {sys.argv[2]}")
@@ -8,39 +8,48 @@ import pandas as pd
 from datetime import datetime, timedelta
 from loguru import logger
 import os
-from telegram import Bot
 from dotenv import load_dotenv
 
+from src.analysis.kpi_store import DailyKPIStore
+from src.utils.notifier import get_dispatcher
+
 class KPIMonitor:
-    def __init__(self, df):
+    def __init__(self, df=None, store=None, dispatcher=None):
         """
         Inicializa o monitor de KPIs
         df: DataFrame com dados de vendas
+        store: DailyKPIStore já carregado (evita reagregar o histórico a cada relatório)
+        dispatcher: NotificationDispatcher (padrão: o do processo, via Telegram do .env)
         """
         self.df = df
+        self.store = store if store is not None else DailyKPIStore.from_dataframe(df)
         load_dotenv()
         self.telegram_token = os.getenv('TELEGRAM_TOKEN')
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID')
-        self.bot = Bot(token=self.telegram_token) if self.telegram_token else None
+        self.dispatcher = dispatcher if dispatcher is not None else get_dispatcher()
         
+    @classmethod
+    def from_store(cls, store, days=1, dispatcher=None):
+        """
+        Cria o monitor lendo do SalesStore apenas os últimos dias
+        (partições do mês correspondente e as colunas usadas nos KPIs)
+        """
+        today = datetime.now().date()
+        df = store.query(
+            start=today - timedelta(days=days),
+            end=today,
+            columns=['data_venda', 'valor_venda', 'categoria']
+        )
+        return cls(df, dispatcher=dispatcher)
+    
     def calculate_daily_kpis(self):
         """Calcula KPIs diários"""
         try:
             today = datetime.now().date()
             yesterday = today - timedelta(days=1)
             
-            # Filtra dados do dia anterior
-            df_yesterday = self.df[self.df['data_venda'].dt.date == yesterday]
-            
-            kpis = {
-                'data': yesterday,
-                'total_vendas': df_yesterday['valor_venda'].sum(),
-                'ticket_medio': df_yesterday['valor_venda'].mean(),
-                'total_pedidos': len(df_yesterday),
-                'categorias_mais_vendidas': df_yesterday.groupby('categoria')['valor_venda'].sum().nlargest(3).to_dict()
-            }
-            
-            return kpis
+            # Lê o agregado do dia anterior, sem varrer o histórico
+            return self.store.get(yesterday)
             
         except Exception as e:
             logger.error(f"Erro ao calcular KPIs: {e}")
@@ -61,14 +70,14 @@ class KPIMonitor:
         return alerts
     
     def send_telegram_notification(self, message):
-        """Envia notificação via Telegram"""
+        """
+        Envia notificação via Telegram
+        A mensagem vai para a fila do dispatcher; o envio não bloqueia o ETL
+        """
         try:
-            if self.bot and self.telegram_chat_id:
-                self.bot.send_message(
-                    chat_id=self.telegram_chat_id,
-                    text=message
-                )
-                logger.info("Notificação enviada com sucesso")
+            if self.dispatcher:
+                self.dispatcher.submit(message)
+                logger.info("Notificação enfileirada")
             else:
                 logger.warning("Telegram não configurado")
                 
@@ -0,0 +1,153 @@
+"""
+Agregados diários de vendas para consulta rápida de KPIs
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import pandas as pd
+from datetime import timedelta
+from loguru import logger
+
+class DailyKPIStore:
+    def __init__(self, max_days=None):
+        """
+        Guarda, por dia, soma e quantidade de vendas e a soma por categoria
+        max_days: mantém apenas os últimos N dias (None guarda todo o histórico)
+        """
+        self.max_days = max_days
+        self._days = {}
+
+    @classmethod
+    def from_dataframe(cls, df, max_days=None):
+        """Cria o store a partir de um DataFrame de vendas (linhas ou agregado diário)"""
+        store = cls(max_days=max_days)
+        store.update(df)
+        return store
+
+    def __len__(self):
+        return len(self._days)
+
+    def _record(self, day):
+        return self._days.setdefault(day, {'total_vendas': 0.0, 'total_pedidos': 0, 'categorias': {}})
+
+    def update(self, df):
+        """
+        Incorpora novas vendas ao store
+        Aceita linhas de venda ou o agregado diário com a coluna total_pedidos
+        O custo do merge é proporcional aos dias/categorias novos, não ao histórico
+        """
+        if df.empty:
+            return
+
+        new = pd.DataFrame({
+            'dia': df['data_venda'].dt.normalize(),
+            'categoria': df['categoria'].astype(object),
+            'valor_venda': df['valor_venda'].astype('float64'),
+            'total_pedidos': df['total_pedidos'] if 'total_pedidos' in df.columns else 1
+        })
+
+        by_day = new.groupby('dia')[['valor_venda', 'total_pedidos']].sum()
+        for day, total_vendas, total_pedidos in by_day.itertuples():
+            record = self._record(day.date())
+            record['total_vendas'] += total_vendas
+            record['total_pedidos'] += int(total_pedidos)
+
+        by_category = new.groupby(['dia', 'categoria'])['valor_venda'].sum()
+        for (day, categoria), valor in by_category.items():
+            categorias = self._days[day.date()]['categorias']
+            categorias[categoria] = categorias.get(categoria, 0.0) + valor
+
+        self._trim()
+
+    def _trim(self):
+        """Descarta os dias fora da janela max_days"""
+        if not self.max_days or not self._days:
+            return
+        cutoff = max(self._days) - timedelta(days=self.max_days - 1)
+        for day in [day for day in self._days if day < cutoff]:
+            del self._days[day]
+
+    def backfill(self, engine, since=None):
+        """
+        Carrega o histórico a partir das views vendas_diarias e
+        vendas_diarias_categoria (schema.sql), sem ler as vendas linha a linha
+        since: data inicial opcional
+        """
+        try:
+            where = "WHERE data >= :since" if since else ""
+            params = {'since': since} if since else None
+
+            self._days = self._read_views(engine, where, params)
+            self._trim()
+            logger.info(f"Store de KPIs carregado com {len(self._days)} dias")
+
+        except Exception as e:
+            logger.error(f"Erro ao carregar histórico de KPIs: {e}")
+            raise
+
+    def reload(self, engine, start, end):
+        """
+        Relê das views os dias entre start e end (inclusivos), substituindo
+        os registros do store; usado para vendas já gravadas no banco que não
+        passaram por update() (ex.: carga interrompida e retomada)
+        """
+        try:
+            days = self._read_views(
+                engine, "WHERE data >= :start AND data <= :end", {'start': start, 'end': end}
+            )
+            for day in [day for day in self._days if start <= day <= end]:
+                del self._days[day]
+            self._days.update(days)
+            self._trim()
+            logger.info(f"Store de KPIs: {len(days)} dias relidos do banco")
+
+        except Exception as e:
+            logger.error(f"Erro ao reler dias do store de KPIs: {e}")
+            raise
+
+    def _read_views(self, engine, where, params):
+        """Registros por dia lidos de vendas_diarias e vendas_diarias_categoria"""
+        daily = pd.read_sql(
+            f"SELECT data, total_pedidos, total_vendas FROM vendas_diarias {where}",
+            engine, params=params, parse_dates=['data']
+        )
+        by_category = pd.read_sql(
+            f"SELECT data, categoria, total_vendas FROM vendas_diarias_categoria {where}",
+            engine, params=params, parse_dates=['data']
+        )
+
+        days = {}
+        for data, total_pedidos, total_vendas in daily.itertuples(index=False):
+            days[data.date()] = {
+                'total_vendas': float(total_vendas),
+                'total_pedidos': int(total_pedidos),
+                'categorias': {}
+            }
+        for data, categoria, total_vendas in by_category.itertuples(index=False):
+            days[data.date()]['categorias'][categoria] = float(total_vendas)
+        return days
+
+    def get(self, day, top_n=3):
+        """Retorna os KPIs de um dia (consulta O(1))"""
+        if isinstance(day, pd.Timestamp):
+            day = day.date()
+
+        record = self._days.get(day)
+        if record is None:
+            return {
+                'data': day,
+                'total_vendas': 0.0,
+                'ticket_medio': float('nan'),
+                'total_pedidos': 0,
+                'categorias_mais_vendidas': {}
+            }
+
+        total_pedidos = record['total_pedidos']
+        categorias = sorted(record['categorias'].items(), key=lambda item: item[1], reverse=True)
+        return {
+            'data': day,
+            'total_vendas': record['total_vendas'],
+            'ticket_medio': record['total_vendas'] / total_pedidos if total_pedidos else float('nan'),
+            'total_pedidos': total_pedidos,
+            'categorias_mais_vendidas': dict(categorias[:top_n])
+        }
@@ -6,35 +6,78 @@ Data: 2024
 
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from sklearn.linear_model import LinearRegression
 from loguru import logger
 from datetime import datetime, timedelta
 
+FEATURES = ['dia_semana', 'dia_mes', 'mes']
+
+def calendar_features(dates):
+    """
+    Calcula as features de calendário direto sobre datetime64 (sem loop em Python)
+    Retorna matriz (n, 3): dia da semana (segunda=0), dia do mês e mês
+    """
+    days = np.asarray(dates, dtype='datetime64[D]')
+    months = days.astype('datetime64[M]')
+    
+    # 1970-01-01 foi uma quinta-feira (dayofweek = 3)
+    dia_semana = (days.astype('int64') + 3) % 7
+    dia_mes = (days - months).astype('int64') + 1
+    mes = months.astype('int64') % 12 + 1
+    
+    return np.column_stack([dia_semana, dia_mes, mes]).astype('float64')
+
 class SalesForecast:
-    def __init__(self, df):
+    def __init__(self, df, by=None):
         """
         Inicializa o modelo de previsão
         df: DataFrame com dados históricos de vendas
+        by: coluna(s) que definem as séries (ex.: 'categoria' ou ['categoria', 'vendedor']);
+            None modela o total diário
         """
         self.df = df
+        self.by = [by] if isinstance(by, str) else list(by or [])
         self.model = LinearRegression()
+        self.series = None
         
+    @classmethod
+    def from_store(cls, store, start=None, end=None, by=None, filters=None):
+        """
+        Cria o modelo lendo do SalesStore só o período e as colunas necessárias
+        filters: {coluna: valores} aplicados na leitura (ex. {'categoria': 'Informática'})
+        """
+        by_columns = [by] if isinstance(by, str) else list(by or [])
+        df = store.query(
+            start=start, end=end,
+            columns=['data_venda', 'valor_venda'] + by_columns,
+            filters=filters
+        )
+        return cls(df, by=by)
+    
     def prepare_data(self):
         """Prepara dados para o modelo"""
         try:
-            # Agrupa vendas por dia
-            daily_sales = self.df.groupby('data_venda')['valor_venda'].sum().reset_index()
+            # Agrupa vendas por dia (e por série, se houver)
+            daily_sales = self.df.groupby(
+                ['data_venda'] + self.by, observed=True
+            )['valor_venda'].sum().reset_index()
             
             # Cria features numéricas
             daily_sales['dia_semana'] = daily_sales['data_venda'].dt.dayofweek
             daily_sales['dia_mes'] = daily_sales['data_venda'].dt.day
             daily_sales['mes'] = daily_sales['data_venda'].dt.month
             
-            # Cria target (vendas do próximo dia)
-            daily_sales['target'] = daily_sales['valor_venda'].shift(-1)
+            # Cria target (vendas do próximo dia da mesma série)
+            if self.by:
+                daily_sales = daily_sales.sort_values(self.by + ['data_venda'])
+                daily_sales['serie'] = daily_sales.groupby(self.by, observed=True).ngroup()
+                daily_sales['target'] = daily_sales.groupby('serie')['valor_venda'].shift(-1)
+            else:
+                daily_sales['target'] = daily_sales['valor_venda'].shift(-1)
             
-            # Remove última linha (sem target)
-            daily_sales = daily_sales.dropna()
+            # Remove última linha de cada série (sem target)
+            daily_sales = daily_sales.dropna(subset=['target'])
             
             return daily_sales
             
@@ -42,14 +85,43 @@ class SalesForecast:
             logger.error(f"Erro ao preparar dados: {e}")
             raise
     
+    def _design_matrix(self, calendar, series_codes=None):
+        """
+        Monta a matriz do modelo: com séries, cada uma tem seu intercepto (one-hot)
+        e suas próprias inclinações de calendário (one-hot x calendário), o que
+        equivale a um modelo por série ajustado de uma vez
+        A matriz é esparsa: milhares de séries não viram uma matriz densa enorme
+        """
+        if not self.by:
+            return calendar
+        n_rows, n_features = calendar.shape
+        rows = np.arange(n_rows)
+        one_hot = sparse.csr_matrix(
+            (np.ones(n_rows), (rows, series_codes)),
+            shape=(n_rows, len(self.series))
+        )
+        slopes = sparse.csr_matrix(
+            (
+                calendar.ravel(),
+                (np.repeat(rows, n_features), (series_codes[:, None] * n_features + np.arange(n_features)).ravel())
+            ),
+            shape=(n_rows, len(self.series) * n_features)
+        )
+        return sparse.hstack([one_hot, slopes], format='csr')
+    
     def train_model(self):
         """Treina o modelo de previsão"""
         try:
             data = self.prepare_data()
             
             # Features para treino
-            X = data[['dia_semana', 'dia_mes', 'mes']]
-            y = data['target']
+            X = data[FEATURES].to_numpy(dtype='float64')
+            y = data['target'].to_numpy()
+            
+            if self.by:
+                # Séries conhecidas, na mesma ordem dos códigos de ngroup()
+                self.series = self.df.groupby(self.by, observed=True).size().index
+                X = self._design_matrix(X, data['serie'].to_numpy())
             
             # Treina modelo
             self.model.fit(X, y)
@@ -59,35 +131,39 @@ class SalesForecast:
             logger.error(f"Erro ao treinar modelo: {e}")
             raise
     
-    def predict_next_days(self, days=7):
+    def predict_next_days(self, days=7, last_date=None):
         """
         Faz previsão para os próximos dias
         days: número de dias para prever
+        last_date: data base da previsão (padrão: última data do histórico)
+        Retorna DataFrame longo: colunas das séries (se houver), data e previsao
         """
         try:
-            last_date = self.df['data_venda'].max()
-            predictions = []
+            if last_date is None:
+                last_date = self.df['data_venda'].max()
+            last_date = np.datetime64(last_date, 'D')
+            n_series = len(self.series) if self.by else 1
+            
+            # Datas futuras de todas as séries de uma vez: (n_series * days,)
+            future = last_date + np.arange(1, days + 1, dtype='timedelta64[D]')
+            dates = np.tile(future, n_series)
+            series_codes = np.repeat(np.arange(n_series), days)
             
-            for i in range(days):
-                next_date = last_date + timedelta(days=i+1)
-                
-                # Prepara features para previsão
-                X_pred = pd.DataFrame({
-                    'dia_semana': [next_date.dayofweek],
-                    'dia_mes': [next_date.day],
-                    'mes': [next_date.month]
-                })
-                
-                # Faz previsão
-                pred = self.model.predict(X_pred)[0]
-                
-                predictions.append({
-                    'data': next_date,
-                    'previsao': pred
-                })
+            # Faz previsão em uma única chamada (vendas não são negativas)
+            X_pred = self._design_matrix(calendar_features(dates), series_codes)
+            predictions = np.clip(self.model.predict(X_pred), 0, None)
             
-            return pd.DataFrame(predictions)
+            result = pd.DataFrame({
+                'data': dates.astype('datetime64[ns]'),
+                'previsao': predictions
+            })
+            
+            if self.by:
+                keys = self.series.to_frame(index=False).iloc[series_codes].reset_index(drop=True)
+                result = pd.concat([keys, result], axis=1)
+            
+            return result
             
         except Exception as e:
             logger.error(f"Erro ao fazer previsões: {e}")
-            raise 
\ No newline at end of file
+            raise
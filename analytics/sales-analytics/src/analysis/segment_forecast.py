@@ -0,0 +1,152 @@
+"""
+Previsão de vendas por segmento (categoria, produto, vendedor) em paralelo
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import os
+import sys
+import math
+import time
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from src.analysis.sales_forecast import SalesForecast
+
+# Lotes por processo: equilibra a carga sem multiplicar o custo de envio
+BATCHES_PER_WORKER = 4
+
+def _init_worker():
+    """Silencia o log por série nos processos filhos"""
+    logger.disable('src.analysis.sales_forecast')
+
+def _forecast_batch(batch, days, last_date):
+    """
+    Treina e prevê cada segmento de um lote (executado no processo filho)
+    batch: lista de (chave, datas, valores) em arrays NumPy
+    """
+    results = []
+    skipped = 0
+    for key, dates, values in batch:
+        # Sem ao menos dois dias não há par (dia, próximo dia) para treinar
+        if len(np.unique(dates)) < 2:
+            skipped += 1
+            continue
+
+        forecast = SalesForecast(pd.DataFrame({'data_venda': dates, 'valor_venda': values}))
+        forecast.train_model()
+        prediction = forecast.predict_next_days(days=days, last_date=last_date)
+        prediction.insert(0, 'segmento', [key] * len(prediction))
+        results.append(prediction)
+
+    frame = pd.concat(results, ignore_index=True) if results else None
+    return frame, skipped
+
+class SegmentForecastEngine:
+    def __init__(self, df, by, max_workers=None, batch_size=None):
+        """
+        Modela cada segmento com seu próprio SalesForecast
+        df: DataFrame com dados históricos de vendas
+        by: coluna(s) que definem os segmentos (ex.: ['categoria', 'produto'])
+        max_workers: processos no pool (padrão: núcleos disponíveis)
+        batch_size: segmentos por tarefa (padrão: calculado pelo número de processos)
+        """
+        self.df = df
+        self.by = [by] if isinstance(by, str) else list(by)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+
+    def _segments(self):
+        """Agrupa uma única vez e extrai arrays leves (baratos de serializar)"""
+        grouped = self.df.groupby(self.by, observed=True, sort=False)
+        for key, segment in grouped:
+            yield (
+                key[0] if len(self.by) == 1 else key,
+                segment['data_venda'].to_numpy(),
+                segment['valor_venda'].to_numpy(dtype='float64')
+            )
+
+    def _batches(self, segments):
+        """Divide os segmentos em lotes de tamanho fixo"""
+        batch_size = self.batch_size or max(
+            1, math.ceil(len(segments) / (self.max_workers * BATCHES_PER_WORKER))
+        )
+        return [segments[i:i + batch_size] for i in range(0, len(segments), batch_size)]
+
+    def run(self, days=7):
+        """
+        Treina e prevê todos os segmentos
+        Retorna DataFrame longo: colunas dos segmentos, data e previsao
+        """
+        try:
+            start = time.perf_counter()
+            last_date = self.df['data_venda'].max()
+            segments = list(self._segments())
+            batches = self._batches(segments)
+
+            if self.max_workers == 1:
+                _init_worker()
+                outputs = [_forecast_batch(batch, days, last_date) for batch in batches]
+                logger.enable('src.analysis.sales_forecast')
+            else:
+                with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker) as executor:
+                    futures = [executor.submit(_forecast_batch, batch, days, last_date) for batch in batches]
+                    outputs = [future.result() for future in futures]
+
+            frames = [frame for frame, _ in outputs if frame is not None]
+            skipped = sum(count for _, count in outputs)
+            result = self._expand_keys(frames)
+
+            logger.info(
+                f"{len(segments) - skipped} segmentos previstos em {time.perf_counter() - start:.2f}s "
+                f"({len(batches)} lotes, {self.max_workers} processos, {skipped} sem histórico suficiente)"
+            )
+            return result
+
+        except Exception as e:
+            logger.error(f"Erro na previsão por segmento: {e}")
+            raise
+
+    def _expand_keys(self, frames):
+        """Converte a chave do segmento de volta em colunas"""
+        if not frames:
+            return pd.DataFrame(columns=self.by + ['data', 'previsao'])
+
+        result = pd.concat(frames, ignore_index=True)
+        if len(self.by) == 1:
+            return result.rename(columns={'segmento': self.by[0]})
+
+        keys = pd.DataFrame(result.pop('segmento').tolist(), columns=self.by)
+        return pd.concat([keys, result], axis=1)
+
+def benchmark(n_rows=1_000_000, n_segments=2000, days=90, workers=None):
+    """
+    Mede o tempo de run() para diferentes números de processos
+    Retorna DataFrame com tempo e speedup em relação a 1 processo
+    """
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        'data_venda': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), unit='D'),
+        'valor_venda': rng.gamma(2.0, 100.0, n_rows),
+        'produto': rng.integers(0, n_segments, n_rows).astype(str)
+    })
+
+    if workers is None:
+        cpus = os.cpu_count() or 1
+        workers = sorted({2 ** i for i in range(int(math.log2(cpus)) + 1)} | {cpus})
+
+    results = []
+    for n_workers in workers:
+        start = time.perf_counter()
+        SegmentForecastEngine(df, by='produto', max_workers=n_workers).run(days=days)
+        results.append({'processos': n_workers, 'tempo_s': time.perf_counter() - start})
+
+    results = pd.DataFrame(results)
+    results['speedup'] = results['tempo_s'].iloc[0] / results['tempo_s']
+    return results
+
+if __name__ == "__main__":
+    print(benchmark().to_string(index=False))
@@ -0,0 +1,140 @@
+"""
+Carga em massa de DataFrames no banco de dados
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import io
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, inspect, insert, text
+from loguru import logger
+
+# Linhas enviadas por lote (COPY ou executemany)
+DEFAULT_BATCH_SIZE = 50000
+
+def _create_table_if_missing(df, table_name, engine, unique_key=None):
+    """
+    Cria a tabela vazia a partir do DataFrame caso ela ainda não exista
+    unique_key: colunas do índice único criado junto com a tabela
+    """
+    if inspect(engine).has_table(table_name):
+        return
+
+    df.head(0).to_sql(table_name, engine, index=False)
+    if unique_key:
+        columns = ', '.join(f'"{col}"' for col in unique_key)
+        with engine.begin() as conn:
+            conn.execute(text(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS uq_{table_name}_{"_".join(unique_key)} '
+                f'ON {table_name} ({columns})'
+            ))
+
+def _inserted_mask(df, unique_key, keys):
+    """Máscara das linhas do DataFrame cujas chaves estão em `keys` (tuplas)"""
+    if not keys:
+        return np.zeros(len(df), dtype=bool)
+    return pd.MultiIndex.from_frame(df[unique_key]).isin([tuple(key) for key in keys])
+
+def _copy_postgres(df, table_name, engine, batch_size, unique_key=None):
+    """
+    Envia o DataFrame via COPY FROM STDIN (formato CSV), em lotes
+    unique_key: copia para uma tabela temporária e insere com
+    ON CONFLICT DO NOTHING (COPY não trata violações de chave única)
+    Retorna a máscara das linhas efetivamente inseridas
+    """
+    ignore_conflicts = bool(unique_key)
+    columns = ', '.join(f'"{col}"' for col in df.columns)
+    target = f'_stage_{table_name}' if ignore_conflicts else table_name
+    sql = f'COPY {target} ({columns}) FROM STDIN WITH (FORMAT csv)'
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            if ignore_conflicts:
+                cursor.execute(
+                    f'CREATE TEMP TABLE {target} '
+                    f'(LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP'
+                )
+
+            for start in range(0, len(df), batch_size):
+                buffer = io.StringIO()
+                df.iloc[start:start + batch_size].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+
+            inserted = np.ones(len(df), dtype=bool)
+            if ignore_conflicts:
+                key_columns = ', '.join(f'"{col}"' for col in unique_key)
+                cursor.execute(
+                    f'INSERT INTO {table_name} ({columns}) '
+                    f'SELECT {columns} FROM {target} ON CONFLICT DO NOTHING '
+                    f'RETURNING {key_columns}'
+                )
+                inserted = _inserted_mask(df, unique_key, cursor.fetchall())
+        # Uma única transação: ou todos os lotes entram, ou nenhum
+        conn.commit()
+        return inserted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _executemany(df, table_name, engine, batch_size, unique_key=None):
+    """
+    Fallback para bancos sem COPY (ex.: SQLite): INSERT com executemany
+    unique_key: linhas com chave já existente são ignoradas (INSERT OR IGNORE)
+    e as chaves inseridas são lidas com RETURNING
+    Retorna a máscara das linhas efetivamente inseridas
+    """
+    # Tabela refletida: os tipos das colunas cuidam da conversão dos valores
+    target = Table(table_name, MetaData(), autoload_with=engine)
+    statement = insert(target)
+    if unique_key:
+        statement = statement.prefix_with('OR IGNORE', dialect='sqlite')
+        statement = statement.returning(*[target.c[col] for col in unique_key])
+
+    keys = []
+    with engine.begin() as conn:
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start:start + batch_size]
+            # NaN/NaT viram NULL
+            records = batch.astype(object).where(batch.notna(), None).to_dict('records')
+            result = conn.execute(statement, records)
+            if unique_key:
+                keys.extend(result.fetchall())
+    if not unique_key:
+        return np.ones(len(df), dtype=bool)
+    return _inserted_mask(df, unique_key, keys)
+
+def bulk_insert(df, table_name, engine, batch_size=DEFAULT_BATCH_SIZE, unique_key=None,
+                return_inserted=False):
+    """
+    Insere o DataFrame na tabela usando o caminho mais rápido disponível
+    PostgreSQL: COPY FROM STDIN; demais bancos: executemany
+    unique_key: colunas da chave única; linhas já existentes são ignoradas,
+    tornando a carga idempotente
+    return_inserted: retorna a máscara booleana (por linha do DataFrame) das
+    linhas inseridas em vez da contagem
+    Retorna o número de linhas inseridas
+    """
+    if df.empty:
+        return np.zeros(0, dtype=bool) if return_inserted else 0
+
+    start = time.perf_counter()
+    _create_table_if_missing(df, table_name, engine, unique_key)
+
+    if engine.dialect.name == 'postgresql':
+        inserted = _copy_postgres(df, table_name, engine, batch_size, unique_key)
+    else:
+        inserted = _executemany(df, table_name, engine, batch_size, unique_key)
+    rows = int(inserted.sum())
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"{rows} de {len(df)} linhas inseridas em {table_name} em {elapsed:.2f}s "
+        f"({len(df) / elapsed if elapsed else len(df):.0f} linhas/s)"
+    )
+    return inserted if return_inserted else rows
@@ -0,0 +1,206 @@
+"""
+Leitura incremental do arquivo de vendas baseada em marca d'água
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import io
+import os
+import json
+import hashlib
+import pandas as pd
+from datetime import datetime
+from loguru import logger
+
+from src.utils.config import WATERMARK_FILE, SALES_DTYPES, SALES_DATE_COLUMNS
+
+# Bytes do início do arquivo usados na assinatura (detecta arquivo substituído)
+SIGNATURE_BYTES = 64 * 1024
+
+class _BoundedReader(io.RawIOBase):
+    """Expõe o arquivo apenas até `end` (tamanho no início da leitura)"""
+
+    def __init__(self, raw, end):
+        self.raw = raw
+        self.end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        remaining = self.end - self.raw.tell()
+        if remaining <= 0:
+            return 0
+        data = self.raw.read(min(len(buffer), remaining))
+        buffer[:len(data)] = data
+        return len(data)
+
+def _file_signature(file_path, length):
+    """Hash dos primeiros `length` bytes do arquivo"""
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+def _count_lines(file_path, start, end):
+    """Número de linhas entre os bytes `start` e `end` do arquivo"""
+    lines = 0
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            lines += block.count(b'\n')
+            remaining -= len(block)
+    return lines
+
+class IncrementalReader:
+    def __init__(self, file_path, state_file=WATERMARK_FILE):
+        """
+        Lê apenas as linhas novas de um CSV que cresce por append de linhas completas
+        file_path: arquivo de vendas
+        state_file: arquivo JSON onde a marca d'água é persistida
+        """
+        self.file_path = str(file_path)
+        self.state_file = state_file
+        self.state = self.load_state()
+        self._pending = None
+        self._source = None
+
+    def load_state(self):
+        """Carrega a última marca d'água salva"""
+        if not os.path.exists(self.state_file):
+            return {}
+        with open(self.state_file, encoding='utf-8') as f:
+            state = json.load(f)
+        return state if state.get('arquivo') == self.file_path else {}
+
+    def _continues(self):
+        """Se o arquivo é o da marca d'água, só com linhas acrescentadas no final"""
+        offset = self.state.get('offset', 0)
+        if not offset:
+            return False
+        size = os.path.getsize(self.file_path)
+        signature = _file_signature(self.file_path, min(offset, SIGNATURE_BYTES))
+        return size >= offset and signature == self.state.get('assinatura')
+
+    def _resume_point(self):
+        """
+        Define a partir de onde ler: o offset salvo, ou o início do arquivo
+        caso ele tenha sido substituído (tamanho menor ou assinatura diferente)
+        """
+        offset = self.state.get('offset', 0)
+        if not offset:
+            return 0, None
+
+        if not self._continues():
+            logger.warning("Arquivo de vendas substituído, relendo a partir da marca d'água de data")
+            return 0, self.state.get('max_data_venda')
+
+        return offset, None
+
+    def source_id(self):
+        """
+        Identificação do arquivo gravada em `origem` (com `linha_origem`, a chave das vendas)
+        Continua a mesma enquanto o arquivo só recebe linhas no final; um arquivo
+        substituído (nova exportação no mesmo caminho) recebe uma nova, com o hash
+        do seu início, para que suas linhas não colidam com as do anterior
+        """
+        if self._source is None:
+            if self._continues():
+                # Marcas d'água anteriores à identificação usavam o caminho
+                self._source = self.state.get('origem', self.file_path)
+            else:
+                size = os.path.getsize(self.file_path)
+                signature = _file_signature(self.file_path, min(size, SIGNATURE_BYTES))
+                self._source = f"{self.file_path}#{signature[:16]}"
+        return self._source
+
+    def _next_state(self, end, line, max_date, rows):
+        return {
+            'arquivo': self.file_path,
+            'origem': self.source_id(),
+            'offset': end,
+            'linha': line,
+            'assinatura': _file_signature(self.file_path, min(end, SIGNATURE_BYTES)),
+            'max_data_venda': max_date,
+            'linhas': rows,
+            'atualizado_em': datetime.now().isoformat()
+        }
+
+    def iter_chunks(self, chunksize=None):
+        """
+        Gera DataFrames tipados apenas com as linhas ainda não carregadas
+        O índice de cada DataFrame é a posição da linha de dados no arquivo
+        (0 = primeira linha após o cabeçalho), como em uma leitura completa
+        A nova marca d'água só é salva em commit(), após a carga no banco
+        """
+        offset, min_date = self._resume_point()
+        max_date = self.state.get('max_data_venda')
+        rows = 0
+
+        with open(self.file_path, 'rb') as raw:
+            header = raw.readline()
+            columns = header.decode('utf-8').strip().split(',')
+            # Linhas gravadas durante a leitura ficam para a próxima carga
+            end = os.path.getsize(self.file_path)
+
+            start = max(offset, len(header))
+            # Linhas de dados antes do ponto de retomada
+            line = self.state.get('linha') if offset else 0
+            if line is None:
+                # Marca d'água anterior à contagem de linhas
+                line = _count_lines(self.file_path, len(header), start)
+            if start < end:
+                raw.seek(start)
+                reader = pd.read_csv(
+                    io.BufferedReader(_BoundedReader(raw, end)),
+                    header=None,
+                    names=columns,
+                    dtype=SALES_DTYPES,
+                    parse_dates=SALES_DATE_COLUMNS,
+                    chunksize=chunksize or None,
+                    encoding='utf-8'
+                )
+                chunks = reader if chunksize else [reader]
+
+                for chunk in chunks:
+                    chunk.index = pd.RangeIndex(line, line + len(chunk))
+                    line += len(chunk)
+                    if min_date is not None:
+                        chunk = chunk[chunk['data_venda'] >= pd.Timestamp(min_date)]
+                    if chunk.empty:
+                        continue
+
+                    chunk_max = chunk['data_venda'].max().isoformat()
+                    max_date = chunk_max if max_date is None else max(max_date, chunk_max)
+                    rows += len(chunk)
+                    yield chunk
+
+        self._pending = self._next_state(end, line, max_date, self.state.get('linhas', 0) + rows)
+        logger.info(f"{rows} linhas novas desde a última carga")
+
+    def mark_loaded(self, end, max_date=None):
+        """
+        Marca d'água de uma carga completa do arquivo, lido até o byte `end`
+        (tamanho antes da leitura); salva em commit(), como em iter_chunks()
+        """
+        with open(self.file_path, 'rb') as f:
+            header = len(f.readline())
+        line = _count_lines(self.file_path, header, end) if end > header else 0
+        if max_date is not None:
+            max_date = pd.Timestamp(max_date).isoformat()
+        self._pending = self._next_state(end, line, max_date, line)
+
+    def commit(self):
+        """Persiste a nova marca d'água (escrita atômica)"""
+        if self._pending is None:
+            return
+
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._pending, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+        self.state = self._pending
+        self._pending = None
@@ -5,9 +5,9 @@ Data: 2024
 """
 
 import os
+import argparse
 import pandas as pd
-from datetime import datetime
-from sqlalchemy import create_engine
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from loguru import logger
 import schedule
@@ -18,6 +18,21 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from src.analysis.sales_forecast import SalesForecast
 from src.analysis.kpi_monitor import KPIMonitor
+from src.analysis.kpi_store import DailyKPIStore
+from src.etl.bulk_loader import bulk_insert
+from src.etl.incremental import IncrementalReader
+from src.etl.sales_store import SalesStore
+from src.utils.config import (
+    SALES_DATA_FILE, CHUNK_SIZE, SALES_DTYPES, SALES_DATE_COLUMNS,
+    DB_TABLES, VENDAS_COLUMNS, VENDAS_SOURCE_KEY, KPI_STORE_DAYS,
+    PROMETHEUS_TEXTFILE, PROFILE_RUN, PROFILES_DIR
+)
+from src.utils.helpers import get_peak_memory_mb
+from src.utils.profiling import (
+    profiled, profile_stage, stage_stats, log_stage_summary, write_prometheus_textfile, run_profiler
+)
+from src.utils.database import get_engine, dispose_engine
+from src.utils.scheduler import JobRunner
 
 # Carrega variáveis de ambiente
 load_dotenv()
@@ -30,60 +45,134 @@ logger.add(
     level=os.getenv('LOG_LEVEL', 'INFO')
 )
 
+# Store de KPIs mantido entre execuções do modo agendado
+_kpi_store = None
+
 def connect_to_db():
-    """Estabelece conexão com o banco de dados"""
+    """
+    Retorna a engine compartilhada do processo
+    O pool é criado na primeira chamada e reaproveitado nas execuções seguintes
+    """
     try:
-        # Pega credenciais do .env
-        db_url = os.getenv('DATABASE_URL')
-        engine = create_engine(db_url)
-        return engine
+        return get_engine()
     except Exception as e:
         logger.error(f"Erro ao conectar ao banco: {e}")
         raise
 
+@profiled()
 def load_sales_data(file_path):
     """
     Carrega dados de vendas do arquivo CSV
     Retorna DataFrame com dados limpos
     """
     try:
-        df = pd.read_csv(file_path)
-        
-        # Limpeza básica
-        df['data_venda'] = pd.to_datetime(df['data_venda'])
-        df['valor_venda'] = df['valor_venda'].astype(float)
+        # Tipos definidos na leitura evitam conversões (e cópias) posteriores
+        df = pd.read_csv(
+            file_path,
+            dtype=SALES_DTYPES,
+            parse_dates=SALES_DATE_COLUMNS
+        )
         
         return df
     except Exception as e:
         logger.error(f"Erro ao carregar dados: {e}")
         raise
 
+def iter_sales_data(file_path, chunksize=CHUNK_SIZE):
+    """
+    Lê o arquivo CSV em blocos de `chunksize` linhas
+    Gera DataFrames já tipados, mantendo a memória constante
+    """
+    try:
+        reader = pd.read_csv(
+            file_path,
+            dtype=SALES_DTYPES,
+            parse_dates=SALES_DATE_COLUMNS,
+            chunksize=chunksize
+        )
+        with reader:
+            while True:
+                # Leitura de cada bloco contabilizada na mesma etapa de load_sales_data
+                with profile_stage('load_sales_data') as info:
+                    chunk = next(reader, None)
+                    info['rows'] = 0 if chunk is None else len(chunk)
+                if chunk is None:
+                    break
+                yield chunk
+    except Exception as e:
+        logger.error(f"Erro ao carregar dados: {e}")
+        raise
+
+@profiled()
 def calculate_metrics(df):
     """
     Calcula métricas principais
     """
+    valores = df['valor_venda'].astype('float64')
     metrics = {
-        'total_vendas': df['valor_venda'].sum(),
-        'ticket_medio': df['valor_venda'].mean(),
+        'total_vendas': valores.sum(),
+        'ticket_medio': valores.mean(),
         'total_pedidos': len(df),
         'data_atualizacao': datetime.now()
     }
     return metrics
 
-def save_to_database(df, engine):
+def aggregate_daily(df, daily=None):
+    """
+    Reduz as vendas a totais diários por categoria
+    daily: agregado acumulado dos blocos anteriores (opcional)
+    """
+    keys = [df['data_venda'].dt.normalize(), df['categoria']]
+    valores = df['valor_venda'].astype('float64')
+    chunk_daily = valores.groupby(keys, observed=True, dropna=False).agg(
+        valor_venda='sum',
+        total_pedidos='count'
+    )
+    if daily is None:
+        return chunk_daily
+    
+    # Um mesmo dia pode aparecer em mais de um bloco
+    return pd.concat([daily, chunk_daily]).groupby(level=[0, 1], dropna=False).sum()
+
+@profiled()
+def save_to_database(df, engine, source):
     """
     Salva dados processados no banco
+    source: identificação do arquivo de origem (IncrementalReader.source_id());
+    o índice do DataFrame é a linha de dados no arquivo
+    Retorna as linhas inseridas (sem as já carregadas em execuções anteriores)
     """
     try:
-        df.to_sql('vendas', engine, if_exists='append', index=False)
+        # COPY em lotes no PostgreSQL (executemany nos demais bancos)
+        # Linhas já carregadas (mesmo arquivo e linha) são ignoradas
+        vendas = df[VENDAS_COLUMNS].assign(origem=source, linha_origem=df.index + 1)
+        inserted = bulk_insert(
+            vendas, DB_TABLES['vendas'], engine, unique_key=VENDAS_SOURCE_KEY, return_inserted=True
+        )
         logger.info("Dados salvos com sucesso!")
+        return df[inserted]
     except Exception as e:
         logger.error(f"Erro ao salvar dados: {e}")
         raise
 
-def run_analysis(df):
+def get_kpi_store(engine):
+    """
+    Retorna o store de KPIs do processo
+    Na primeira chamada carrega os últimos KPI_STORE_DAYS dias das views do banco
+    """
+    global _kpi_store
+    
+    if _kpi_store is None:
+        store = DailyKPIStore(max_days=KPI_STORE_DAYS)
+        store.backfill(engine, since=datetime.now().date() - timedelta(days=KPI_STORE_DAYS))
+        _kpi_store = store
+    return _kpi_store
+
+@profiled()
+def run_analysis(df, kpi_store=None):
     """
     Executa análises e previsões
+    kpi_store: DailyKPIStore já atualizado (opcional)
     """
     try:
         # Inicializa previsão
@@ -95,34 +184,203 @@ def run_analysis(df):
         logger.info("Previsões geradas com sucesso")
         
         # Inicializa monitor de KPIs
-        monitor = KPIMonitor(df)
+        monitor = KPIMonitor(df, store=kpi_store)
         monitor.generate_daily_report()
         
     except Exception as e:
         logger.error(f"Erro nas análises: {e}")
         raise
 
-def main():
+def load_daily_history(engine):
+    """
+    Lê do banco o histórico agregado por dia e categoria
+    Usado nas análises do modo incremental, em que o arquivo traz só o delta
+    """
+    try:
+        query = f"""
+        SELECT
+            DATE(data_venda) AS data_venda,
+            categoria,
+            SUM(valor_venda) AS valor_venda,
+            COUNT(*) AS total_pedidos
+        FROM {DB_TABLES['vendas']}
+        GROUP BY DATE(data_venda), categoria
+        """
+        return pd.read_sql(query, engine, parse_dates=['data_venda'])
+    except Exception as e:
+        logger.error(f"Erro ao carregar histórico: {e}")
+        raise
+
+def process_in_chunks(chunks, engine, source, store=None, new_only=False):
+    """
+    Processa os blocos um a um: cada bloco é salvo no banco (e no
+    SalesStore, se informado) e reduzido ao agregado diário, usado
+    depois nas análises
+    source: identificação do arquivo de origem (ver save_to_database)
+    new_only: métricas, store e agregado recebem só as linhas inseridas
+    (carga incremental: linhas já carregadas não são contadas de novo);
+    os dias das linhas ignoradas ficam em metrics['dias_ja_gravados']
+    """
+    total_vendas = 0.0
+    total_pedidos = 0
+    daily = None
+    loaded_days = set()
+    
+    for chunk in chunks:
+        inserted = save_to_database(chunk, engine, source)
+        if new_only:
+            if len(inserted) < len(chunk):
+                skipped = chunk['data_venda'].drop(inserted.index)
+                loaded_days.update(skipped.dt.date.unique())
+            chunk = inserted
+        if chunk.empty:
+            continue
+        
+        chunk_metrics = calculate_metrics(chunk)
+        total_vendas += float(chunk_metrics['total_vendas'])
+        total_pedidos += chunk_metrics['total_pedidos']
+        
+        if store is not None:
+            store.write(chunk)
+        daily = aggregate_daily(chunk, daily)
+        
+        logger.debug(f"Bloco processado: {len(chunk)} linhas ({total_pedidos} no total)")
+    
+    metrics = {
+        'total_vendas': total_vendas,
+        'ticket_medio': total_vendas / total_pedidos if total_pedidos else 0,
+        'total_pedidos': total_pedidos,
+        'data_atualizacao': datetime.now(),
+        'dias_ja_gravados': sorted(loaded_days)
+    }
+    
+    if daily is None:
+        daily = pd.DataFrame(columns=['data_venda', 'categoria', 'valor_venda', 'total_pedidos'])
+    else:
+        daily = daily.reset_index()
+        daily.columns = ['data_venda', 'categoria', 'valor_venda', 'total_pedidos']
+    
+    return daily, metrics
+
+def reload_days(engine, days, store=None, kpi_store=None):
+    """
+    Refaz os stores, a partir do banco, nos dias com vendas já gravadas
+    por uma carga anterior interrompida: essas linhas são ignoradas na nova
+    carga e não chegariam ao SalesStore nem ao store de KPIs
+    O SalesStore regrava os meses desses dias; o store de KPIs relê os dias
+    """
+    if kpi_store is not None:
+        kpi_store.reload(engine, min(days), max(days))
+    
+    if store is not None:
+        months = sorted({day.strftime('%Y-%m') for day in days})
+        first = pd.Timestamp(f"{months[0]}-01")
+        after = pd.Timestamp(f"{months[-1]}-01") + pd.offsets.MonthBegin(1)
+        vendas = pd.read_sql(
+            f"""
+            SELECT {', '.join(VENDAS_COLUMNS)}
+            FROM {DB_TABLES['vendas']}
+            WHERE data_venda >= :first AND data_venda < :after
+            """,
+            engine,
+            params={'first': first.date(), 'after': after.date()},
+            parse_dates=['data_venda']
+        )
+        vendas = vendas[vendas['data_venda'].dt.strftime('%Y-%m').isin(months)]
+        store.replace_months(vendas.astype(SALES_DTYPES), months)
+    
+    logger.info(f"{len(days)} dias com vendas já gravadas refeitos a partir do banco")
+
+def main(chunksize=CHUNK_SIZE, incremental=False, profile=PROFILE_RUN):
     """
     Função principal que orquestra o processo
+    chunksize: linhas por bloco de leitura; 0/None carrega o arquivo inteiro
+    incremental: processa apenas as linhas novas desde a última marca d'água
+    profile: 'cprofile' ou 'pyinstrument' grava o perfil da execução em PROFILES_DIR
     """
+    stage_stats.reset()
+    success = False
+    try:
+        with run_profiler(profile, PROFILES_DIR):
+            _run(chunksize, incremental)
+        success = True
+    finally:
+        # Tempo, CPU, linhas e memória de cada etapa, também nas execuções com falha
+        log_stage_summary()
+        if PROMETHEUS_TEXTFILE:
+            try:
+                write_prometheus_textfile(PROMETHEUS_TEXTFILE, success=success)
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar as métricas do Prometheus: {e}")
+
+def _run(chunksize, incremental):
+    """Etapas de main()"""
     try:
         logger.info("Iniciando processamento de dados")
         
         # Conecta ao banco
         engine = connect_to_db()
+        kpi_store = None
+        
+        # Cópia colunar consultada pelas análises (SalesForecast/KPIMonitor.from_store)
+        store = SalesStore()
+        if not incremental:
+            # Recarga completa: o arquivo inteiro será regravado
+            store.clear()
         
-        # Carrega dados
-        df = load_sales_data('data/vendas.csv')
+        # Identificação do arquivo nas chaves do banco; a marca d'água
+        # é atualizada também nas recargas completas
+        reader = IncrementalReader(SALES_DATA_FILE)
+        source = reader.source_id()
+        end = os.path.getsize(SALES_DATA_FILE)
         
-        # Calcula métricas
-        metrics = calculate_metrics(df)
+        if incremental:
+            # Carrega, calcula métricas e salva apenas o delta
+            kpi_store = get_kpi_store(engine)
+            delta, metrics = process_in_chunks(
+                reader.iter_chunks(chunksize), engine, source, store, new_only=True
+            )
+            
+            # Só o delta entra no store de KPIs
+            kpi_store.update(delta)
+            
+            # Linhas gravadas no banco por uma execução que falhou no meio:
+            # os dias delas são refeitos antes de avançar a marca d'água
+            if metrics['dias_ja_gravados']:
+                reload_days(engine, metrics['dias_ja_gravados'], store, kpi_store)
+            reader.commit()
+            
+            # Análises usam o histórico completo, já consolidado no banco
+            df = load_daily_history(engine)
+        elif chunksize:
+            # Carrega, calcula métricas e salva bloco a bloco
+            chunks = iter_sales_data(SALES_DATA_FILE, chunksize)
+            df, metrics = process_in_chunks(chunks, engine, source, store)
+            reader.mark_loaded(end, df['data_venda'].max() if not df.empty else None)
+            reader.commit()
+        else:
+            # Carrega dados
+            df = load_sales_data(SALES_DATA_FILE)
+            
+            # Calcula métricas
+            metrics = calculate_metrics(df)
+            
+            # Salva no banco
+            save_to_database(df, engine, source)
+            
+            # Atualiza a cópia colunar
+            store.write(df)
+            reader.mark_loaded(end, df['data_venda'].max() if not df.empty else None)
+            reader.commit()
         
-        # Salva no banco
-        save_to_database(df, engine)
+        logger.info(f"{metrics['total_pedidos']} pedidos processados")
         
         # Executa análises
-        run_analysis(df)
+        run_analysis(df, kpi_store=kpi_store)
+        
+        peak_memory = get_peak_memory_mb()
+        if peak_memory is not None:
+            logger.info(f"Pico de memória: {peak_memory:.1f} MB")
         
         logger.info("Processo finalizado com sucesso!")
         
@@ -130,19 +388,50 @@ def main():
         logger.error(f"Erro no processo: {e}")
         raise
 
-def schedule_jobs():
+def schedule_jobs(chunksize=CHUNK_SIZE):
     """
     Agenda tarefas automáticas
     """
-    # Agenda processamento diário às 8h
-    schedule.every().day.at("08:00").do(main)
+    runner = JobRunner()
     
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    # Agenda processamento diário às 8h, carregando só as vendas novas.
+    # A tarefa roda no pool do runner: o loop segue livre para os próximos disparos
+    schedule.every().day.at("08:00").do(runner.submit, main, chunksize=chunksize, incremental=True)
+    
+    try:
+        while True:
+            schedule.run_pending()
+            # Dorme até o próximo disparo (no máximo 60s)
+            idle = schedule.idle_seconds()
+            time.sleep(60 if idle is None else min(max(idle, 1), 60))
+    finally:
+        runner.shutdown()
+        logger.info(f"Durações das tarefas: {runner.get_job_durations()}")
+        dispose_engine()
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "--schedule":
-        schedule_jobs()
+    parser = argparse.ArgumentParser(description="Processamento de dados de vendas")
+    parser.add_argument("--schedule", action="store_true", help="executa no modo agendado")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="carrega apenas as linhas novas desde a última execução"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=CHUNK_SIZE,
+        help="linhas por bloco de leitura (0 carrega o arquivo inteiro)"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["cprofile", "pyinstrument"],
+        default=PROFILE_RUN or None,
+        help="grava um perfil da execução (cProfile ou pyinstrument)"
+    )
+    args = parser.parse_args()
+    
+    if args.schedule:
+        schedule_jobs(chunksize=args.chunksize)
     else:
-        main() 
\ No newline at end of file
+        main(chunksize=args.chunksize, incremental=args.incremental, profile=args.profile) 
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Armazenamento colunar das vendas (Parquet particionado por mês)
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import os
+import uuid
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.compute as pc
+from loguru import logger
+
+from src.utils.config import SALES_STORE_DIR
+
+# Coluna de partição (hive: mes=2024-01)
+PARTITION_COLUMN = 'mes'
+
+def _month(value):
+    return pd.Timestamp(value).strftime('%Y-%m')
+
+class SalesStore:
+    def __init__(self, root=SALES_STORE_DIR):
+        """
+        Vendas em Parquet, uma partição por mês de data_venda
+        As consultas leem só as partições e colunas necessárias
+        root: diretório do dataset
+        """
+        self.root = str(root)
+        self.partitioning = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor='hive')
+
+    def _dataset(self):
+        return ds.dataset(self.root, format='parquet', partitioning=self.partitioning)
+
+    def exists(self):
+        """Indica se já há dados gravados"""
+        try:
+            return bool(self._dataset().files)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return False
+
+    def write(self, df):
+        """Acrescenta as vendas ao dataset (novos arquivos nas partições do mês)"""
+        if df.empty:
+            return
+
+        table = pa.Table.from_pandas(
+            df.assign(**{PARTITION_COLUMN: df['data_venda'].dt.strftime('%Y-%m')}),
+            preserve_index=False
+        )
+        ds.write_dataset(
+            table,
+            self.root,
+            format='parquet',
+            partitioning=self.partitioning,
+            basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        logger.debug(f"{len(df)} linhas gravadas no store colunar")
+
+    def replace_months(self, df, months):
+        """
+        Substitui as partições dos meses informados ('2024-01', ...) pelas
+        vendas de df, que deve trazer esses meses por inteiro
+        """
+        for month in months:
+            shutil.rmtree(os.path.join(self.root, f'{PARTITION_COLUMN}={month}'), ignore_errors=True)
+        self.write(df)
+
+    def clear(self):
+        """Remove todos os dados (usado antes de uma recarga completa)"""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _filter(self, start=None, end=None, filters=None):
+        """
+        Monta o predicado: o filtro no mês descarta partições inteiras,
+        o filtro em data_venda e nas categorias é aplicado na leitura
+        """
+        expression = None
+
+        def combine(current, new):
+            return new if current is None else current & new
+
+        if start is not None:
+            expression = combine(expression, ds.field(PARTITION_COLUMN) >= _month(start))
+            expression = combine(expression, ds.field('data_venda') >= pd.Timestamp(start))
+        if end is not None:
+            expression = combine(expression, ds.field(PARTITION_COLUMN) <= _month(end))
+            expression = combine(expression, ds.field('data_venda') <= pd.Timestamp(end))
+
+        for column, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            expression = combine(expression, ds.field(column).isin(list(values)))
+
+        return expression
+
+    def query(self, start=None, end=None, columns=None, filters=None):
+        """
+        Lê as vendas de um período
+        start / end: limites (inclusivos) de data_venda
+        columns: colunas a ler (None lê todas, exceto a de partição)
+        filters: {coluna: valor ou lista de valores}, ex. {'categoria': ['Informática']}
+        """
+        try:
+            if not self.exists():
+                return pd.DataFrame(columns=columns or [])
+
+            dataset = self._dataset()
+            if columns is None:
+                columns = [name for name in dataset.schema.names if name != PARTITION_COLUMN]
+
+            table = dataset.to_table(columns=columns, filter=self._filter(start, end, filters))
+            return table.to_pandas()
+
+        except Exception as e:
+            logger.error(f"Erro ao consultar store colunar: {e}")
+            raise
+
+    def date_range(self):
+        """Menor e maior data_venda, lendo apenas essa coluna"""
+        if not self.exists():
+            return None, None
+        column = self._dataset().to_table(columns=['data_venda']).column('data_venda')
+        bounds = pc.min_max(column)
+        return pd.Timestamp(bounds['min'].as_py()), pd.Timestamp(bounds['max'].as_py())
@@ -6,6 +6,8 @@ CREATE TABLE IF NOT EXISTS vendas (
     produto VARCHAR(100),
     categoria VARCHAR(50),
     vendedor VARCHAR(100),
+    origem VARCHAR(255),
+    linha_origem BIGINT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -13,6 +15,16 @@ CREATE TABLE IF NOT EXISTS vendas (
 CREATE INDEX IF NOT EXISTS idx_data_venda ON vendas(data_venda);
 CREATE INDEX IF NOT EXISTS idx_categoria ON vendas(categoria);
 
+-- Identidade da linha na origem (arquivo e linha de dados): torna a carga idempotente
+-- sem descartar vendas iguais. origem identifica o conteúdo do arquivo (caminho e hash
+-- do início), então uma nova exportação no mesmo caminho não colide com a anterior.
+-- Linhas sem origem (NULL) nunca conflitam entre si
+ALTER TABLE vendas ADD COLUMN IF NOT EXISTS origem VARCHAR(255);
+ALTER TABLE vendas ADD COLUMN IF NOT EXISTS linha_origem BIGINT;
+DROP INDEX IF EXISTS uq_vendas_chave_natural;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_vendas_origem_linha_origem
+    ON vendas(origem, linha_origem);
+
 -- View para métricas diárias
 CREATE OR REPLACE VIEW vendas_diarias AS
 SELECT 
@@ -21,4 +33,14 @@ SELECT
     SUM(valor_venda) as total_vendas,
     AVG(valor_venda) as ticket_medio
 FROM vendas
-GROUP BY DATE(data_venda); 
\ No newline at end of file
+GROUP BY DATE(data_venda);
+
+-- View para métricas diárias por categoria (backfill do store de KPIs)
+CREATE OR REPLACE VIEW vendas_diarias_categoria AS
+SELECT 
+    DATE(data_venda) as data,
+    categoria,
+    COUNT(*) as total_pedidos,
+    SUM(valor_venda) as total_vendas
+FROM vendas
+GROUP BY DATE(data_venda), categoria;
\ No newline at end of file
@@ -6,6 +6,10 @@ Data: 2024
 
 import os
 from pathlib import Path
+from dotenv import load_dotenv
+
+# Carrega variáveis de ambiente antes de ler as configurações abaixo
+load_dotenv()
 
 # Diretórios do projeto
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -15,25 +19,77 @@ DASHBOARD_DIR = BASE_DIR / 'dashboard'
 
 # Configurações de arquivos
 SALES_DATA_FILE = DATA_DIR / 'vendas.csv'
+# Cópia colunar das vendas (Parquet particionado por mês, ver etl/sales_store.py)
+SALES_STORE_DIR = DATA_DIR / 'warehouse' / 'vendas'
 LOG_FILE = LOGS_DIR / 'sales_analytics.log'
+# Marca d'água da carga incremental (offset no arquivo e última data carregada)
+WATERMARK_FILE = DATA_DIR / '.vendas_watermark.json'
+
+# Configurações de carga (modo em blocos)
+# Tamanho do bloco lido por vez do CSV; 0 desativa o modo em blocos
+CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', 100000))
+# Tipos explícitos evitam a inferência (e as cópias) do pandas na leitura.
+# valor_venda fica em float64: em float32 um valor como 3.1 vira 3.0999999046
+# ao ser gravado no banco e as somas em SQL deixam de fechar em centavos
+SALES_DTYPES = {
+    'valor_venda': 'float64',
+    'produto': 'category',
+    'categoria': 'category',
+    'vendedor': 'category'
+}
+SALES_DATE_COLUMNS = ['data_venda']
+# Colunas de texto de baixa cardinalidade que clean_dataframe converte para category;
+# as demais colunas de texto (livres ou de alta cardinalidade) continuam como texto
+CLEAN_CATEGORY_COLUMNS = [col for col, dtype in SALES_DTYPES.items() if dtype == 'category']
 
 # Configurações de análise
 FORECAST_DAYS = 7
+# Dias mantidos no store de KPIs diários
+KPI_STORE_DAYS = int(os.getenv('KPI_STORE_DAYS', 90))
 ALERT_THRESHOLDS = {
     'vendas_minimas': 1000,
     'ticket_medio_minimo': 50
 }
 
+# Configurações de instrumentação (ver utils/profiling.py)
+# Arquivo .prom lido pelo textfile collector do node_exporter (vazio desativa)
+PROMETHEUS_TEXTFILE = os.getenv('PROMETHEUS_TEXTFILE')
+# Profiler da execução: '', 'cprofile' ou 'pyinstrument'
+PROFILE_RUN = os.getenv('PROFILE_RUN', '')
+PROFILES_DIR = LOGS_DIR / 'profiles'
+
 # Configurações de notificação
 NOTIFICATION_TIME = "08:00"
 NOTIFICATION_DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+# Fila do envio assíncrono (ver utils/notifier.py)
+NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', 1000))
+NOTIFY_BATCH_SIZE = int(os.getenv('NOTIFY_BATCH_SIZE', 20))
+NOTIFY_BATCH_WINDOW = float(os.getenv('NOTIFY_BATCH_WINDOW', 2.0))  # segundos
+NOTIFY_MIN_INTERVAL = float(os.getenv('NOTIFY_MIN_INTERVAL', 1.0))  # segundos entre envios
+NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', 5))
 
 # Configurações de banco de dados
+DATABASE_URL = os.getenv('DATABASE_URL')
+# Pool de conexões compartilhado pelo processo (ver utils/database.py)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # segundos
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
+
+# Configurações do agendador
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 2))
 DB_TABLES = {
     'vendas': 'vendas',
     'previsoes': 'previsoes_vendas',
     'kpis': 'kpis_diarios'
 }
+# Colunas de dados da tabela vendas (schema.sql); id e created_at são gerados pelo banco
+VENDAS_COLUMNS = ['data_venda', 'valor_venda', 'produto', 'categoria', 'vendedor']
+# Identidade de uma venda na origem: arquivo (IncrementalReader.source_id) e linha de dados
+# (índice único uq_vendas_origem_linha_origem em schema.sql). Vendas iguais em linhas
+# diferentes são mantidas
+VENDAS_SOURCE_KEY = ['origem', 'linha_origem']
 
 # Cria diretórios se não existirem
 for directory in [DATA_DIR, LOGS_DIR, DASHBOARD_DIR]:
@@ -0,0 +1,59 @@
+"""
+Engine e pool de conexões compartilhados pelo processo
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from loguru import logger
+
+from src.utils.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING
+)
+
+_engine = None
+_lock = threading.Lock()
+
+def _pool_options(db_url):
+    """Parâmetros do pool conforme o banco"""
+    options = {'pool_pre_ping': DB_POOL_PRE_PING}
+    
+    # SQLite usa pools próprios, sem tamanho/overflow configuráveis
+    if make_url(db_url).get_backend_name() != 'sqlite':
+        options.update({
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'pool_recycle': DB_POOL_RECYCLE
+        })
+    return options
+
+def get_engine(db_url=None):
+    """
+    Retorna a engine do processo, criando-a na primeira chamada
+    As execuções seguintes reaproveitam as conexões abertas do pool
+    """
+    global _engine
+    
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                db_url = db_url or DATABASE_URL
+                if not db_url:
+                    raise ValueError("DATABASE_URL não configurada")
+                _engine = create_engine(db_url, **_pool_options(db_url))
+                logger.info("Pool de conexões criado")
+    return _engine
+
+def dispose_engine():
+    """Fecha as conexões do pool e descarta a engine"""
+    global _engine
+    
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+            logger.info("Pool de conexões encerrado")
@@ -4,10 +4,20 @@ Autor: Bruno Ferreira de Abreu Arruda
 Data: 2024
 """
 
+import os
+import sys
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from loguru import logger
 
+from src.utils.config import CLEAN_CATEGORY_COLUMNS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 def format_currency(value):
     """Formata valor para moeda brasileira"""
     try:
@@ -27,29 +37,109 @@ def calculate_growth_rate(current, previous):
         return 0
 
 def get_date_range(df, date_column='data_venda'):
-    """Retorna período dos dados"""
+    """
+    Retorna período dos dados
+    df: DataFrame ou SalesStore (lê apenas a coluna de data)
+    """
     try:
-        min_date = df[date_column].min()
-        max_date = df[date_column].max()
+        if hasattr(df, 'date_range'):
+            min_date, max_date = df.date_range()
+        else:
+            min_date = df[date_column].min()
+            max_date = df[date_column].max()
         return f"{min_date.strftime('%d/%m/%Y')} até {max_date.strftime('%d/%m/%Y')}"
     except Exception as e:
         logger.error(f"Erro ao obter período: {e}")
         return "Período não disponível"
 
-def clean_dataframe(df):
-    """Realiza limpeza básica no DataFrame"""
+def _strip_categories(series):
+    """
+    Remove espaços das categorias (valores únicos), não de cada linha
+    Categorias que ficam iguais após o strip são unificadas
+    """
+    categories = series.cat.categories
+    if categories.inferred_type != 'string':
+        return series
+    stripped = categories.str.strip()
+    if stripped.equals(categories):
+        return series
+    
+    unique = stripped.unique()
+    mapping = unique.get_indexer(stripped)
+    codes = series.cat.codes.to_numpy()
+    new_codes = np.where(codes == -1, -1, mapping[codes])
+    return pd.Series(
+        pd.Categorical.from_codes(new_codes, categories=unique),
+        index=series.index,
+        name=series.name
+    )
+
+def _strip_values(series):
+    """Remove espaços de cada valor de texto; valores de outros tipos ficam como estão"""
     try:
-        # Remove linhas com valores nulos
-        df = df.dropna()
+        stripped = series.str.strip()
+    except AttributeError:
+        # Coluna sem nenhum texto
+        return series
+    return stripped.where(series.isna() | stripped.notna(), series)
+
+def clean_dataframe(df, inplace=False, category_columns=CLEAN_CATEGORY_COLUMNS):
+    """
+    Realiza limpeza básica no DataFrame em uma única passada:
+    colunas de texto têm os espaços removidos, linhas com nulos e
+    duplicadas são removidas com um único filtro
+    category_columns: colunas de baixa cardinalidade convertidas para category
+    (strip feito nas categorias); as demais seguem como texto
+    inplace: altera o próprio DataFrame em vez de criar outro
+    As colunas são limpas antes de qualquer alteração: se algo falhar,
+    o DataFrame original fica intacto
+    """
+    try:
+        cleaned = {}
+        for col in df.select_dtypes(include=['object', 'string', 'category']).columns:
+            column = df[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                cleaned[col] = _strip_categories(column)
+            elif col in category_columns:
+                # Texto -> category uma única vez; o strip roda só nos valores únicos
+                cleaned[col] = _strip_categories(column.astype('category'))
+            else:
+                cleaned[col] = _strip_values(column)
         
-        # Remove duplicatas
-        df = df.drop_duplicates()
+        result = df.copy(deep=False)
+        for col, column in cleaned.items():
+            result[col] = column
         
-        # Remove espaços em branco
-        for col in df.select_dtypes(include=['object']).columns:
-            df[col] = df[col].str.strip()
-            
-        return df
+        # Linhas válidas: sem nulos e primeira ocorrência do hash da linha
+        not_null = result.notna().all(axis=1).to_numpy()
+        row_hash = pd.util.hash_pandas_object(result, index=False)
+        keep = not_null & ~row_hash.duplicated().to_numpy()
+        
+        if inplace:
+            for col, column in cleaned.items():
+                df[col] = column
+            if not keep.all():
+                df.drop(index=df.index[~keep], inplace=True)
+            return df
+        return result if keep.all() else result[keep]
     except Exception as e:
         logger.error(f"Erro ao limpar DataFrame: {e}")
-        return df 
\ No newline at end of file
+        return df
+
+def get_peak_memory_mb():
+    """Retorna o pico de memória (RSS) do processo em MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def get_rss_bytes():
+    """Retorna o RSS atual do processo em bytes (None se indisponível)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
\ No newline at end of file
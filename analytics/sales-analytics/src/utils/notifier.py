@@ -0,0 +1,223 @@
+"""
+Envio assíncrono de notificações (Telegram) fora do fluxo do ETL
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import os
+import atexit
+import random
+import asyncio
+import threading
+from loguru import logger
+
+from src.utils.config import (
+    NOTIFY_QUEUE_SIZE, NOTIFY_BATCH_SIZE, NOTIFY_BATCH_WINDOW,
+    NOTIFY_MIN_INTERVAL, NOTIFY_MAX_RETRIES
+)
+
+# Limite de caracteres de uma mensagem do Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+_STOP = object()
+
+class TelegramTransport:
+    def __init__(self, token, chat_id):
+        """Transporte real: envia as mensagens pelo bot do Telegram"""
+        from telegram import Bot
+        self.bot = Bot(token=token)
+        self.chat_id = chat_id
+        self._initialized = False
+
+    async def send(self, text):
+        if not self._initialized:
+            await self.bot.initialize()
+            self._initialized = True
+        await self.bot.send_message(chat_id=self.chat_id, text=text)
+
+class StubTransport:
+    def __init__(self, failures=0, delay=0.0):
+        """
+        Transporte local, sem rede (testes e desenvolvimento)
+        failures: número de envios que falham antes do primeiro sucesso
+        delay: latência simulada por envio, em segundos
+        """
+        self.failures = failures
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("falha simulada")
+        self.sent.append(text)
+
+def coalesce(messages, max_length=MAX_MESSAGE_LENGTH):
+    """
+    Junta um lote de mensagens em textos para envio
+    Mensagens repetidas viram uma só, com a contagem; o resultado respeita max_length
+    """
+    counts = {}
+    for message in messages:
+        counts[message] = counts.get(message, 0) + 1
+
+    parts = [message if count == 1 else f"{message} (x{count})" for message, count in counts.items()]
+
+    texts, current = [], ''
+    for part in parts:
+        # Partes maiores que o limite são quebradas em pedaços
+        for start in range(0, len(part), max_length):
+            piece = part[start:start + max_length]
+            candidate = f"{current}\n\n{piece}" if current else piece
+            if len(candidate) > max_length:
+                texts.append(current)
+                current = piece
+            else:
+                current = candidate
+    if current:
+        texts.append(current)
+    return texts
+
+class NotificationDispatcher:
+    def __init__(self, transport, max_queue=NOTIFY_QUEUE_SIZE, batch_size=NOTIFY_BATCH_SIZE,
+                 batch_window=NOTIFY_BATCH_WINDOW, min_interval=NOTIFY_MIN_INTERVAL,
+                 max_retries=NOTIFY_MAX_RETRIES, backoff_base=1.0):
+        """
+        Fila de notificações consumida por um event loop em thread própria
+        transport: objeto com `async send(text)` (TelegramTransport, StubTransport)
+        max_queue: mensagens aguardando envio; acima disso novas mensagens são descartadas
+        batch_size / batch_window: agrupa até N mensagens chegando dentro da janela (s)
+        min_interval: intervalo mínimo entre envios (limite de taxa), em segundos
+        max_retries / backoff_base: novas tentativas com espera exponencial
+        """
+        self.transport = transport
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.stats = {'enviadas': 0, 'falhas': 0, 'descartadas': 0}
+
+        self._loop = asyncio.new_event_loop()
+        self._queue = None
+        self._worker = None
+        self._last_send = None
+        self._closed = False
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name='notificacoes', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = self._loop.create_task(self._consume())
+        self._ready.set()
+        self._loop.run_forever()
+
+    def submit(self, message):
+        """Entrega a mensagem à fila e retorna imediatamente (thread-safe)"""
+        if self._closed:
+            logger.warning("Dispatcher encerrado, notificação descartada")
+            return
+        self._loop.call_soon_threadsafe(self._enqueue, message)
+
+    def _enqueue(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.stats['descartadas'] += 1
+            logger.warning("Fila de notificações cheia, mensagem descartada")
+
+    async def _next_batch(self):
+        """Espera a primeira mensagem e agrupa as que chegarem dentro da janela"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.batch_window
+
+        while batch[-1] is not _STOP and len(batch) < self.batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _consume(self):
+        while True:
+            batch = await self._next_batch()
+            stop = batch[-1] is _STOP
+            messages = [message for message in batch if message is not _STOP]
+
+            for text in coalesce(messages):
+                await self._send_with_retry(text)
+
+            if stop:
+                return
+
+    async def _send_with_retry(self, text):
+        for attempt in range(self.max_retries + 1):
+            # Limite de taxa: respeita o intervalo mínimo entre envios
+            if self._last_send is not None:
+                wait = self._last_send + self.min_interval - self._loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            self._last_send = self._loop.time()
+
+            try:
+                await self.transport.send(text)
+                self.stats['enviadas'] += 1
+                logger.info("Notificação enviada com sucesso")
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.stats['falhas'] += 1
+                    logger.error(f"Erro ao enviar notificação após {attempt + 1} tentativas: {e}")
+                    return False
+
+                # Respeita o retry_after do Telegram quando informado
+                delay = getattr(e, 'retry_after', None) or self.backoff_base * 2 ** attempt * (0.5 + random.random())
+                logger.warning(f"Falha ao enviar notificação ({e}), nova tentativa em {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def close(self, timeout=30):
+        """Envia o que estiver na fila e encerra o event loop"""
+        if self._closed:
+            return
+        self._closed = True
+
+        asyncio.run_coroutine_threadsafe(self._queue.put(_STOP), self._loop)
+        done = asyncio.run_coroutine_threadsafe(asyncio.wait_for(asyncio.shield(self._worker), timeout), self._loop)
+        try:
+            done.result(timeout + 1)
+        except Exception:
+            logger.warning("Tempo esgotado ao esvaziar a fila de notificações")
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+_dispatcher = None
+_lock = threading.Lock()
+
+def get_dispatcher():
+    """
+    Dispatcher do processo, usando o Telegram configurado no .env
+    Retorna None se o Telegram não estiver configurado
+    """
+    global _dispatcher
+
+    token = os.getenv('TELEGRAM_TOKEN')
+    chat_id = os.getenv('TELEGRAM_CHAT_ID')
+    if not (token and chat_id):
+        return None
+
+    with _lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher(TelegramTransport(token, chat_id))
+            # Garante o envio das mensagens pendentes ao final do processo
+            atexit.register(_dispatcher.close)
+    return _dispatcher
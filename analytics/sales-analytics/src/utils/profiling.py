@@ -0,0 +1,174 @@
+"""
+Instrumentação das etapas do pipeline (tempo, CPU, linhas e memória)
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import os
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+from loguru import logger
+
+from src.utils.helpers import get_rss_bytes
+
+class StageStats:
+    def __init__(self):
+        """Acumula as medições de cada etapa durante uma execução"""
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def record(self, stage, wall, cpu, rows, rss_delta):
+        with self._lock:
+            stats = self._stages.setdefault(stage, {
+                'chamadas': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'linhas': 0, 'rss_delta_bytes': 0
+            })
+            stats['chamadas'] += 1
+            stats['wall_s'] += wall
+            stats['cpu_s'] += cpu
+            stats['linhas'] += rows or 0
+            stats['rss_delta_bytes'] += rss_delta or 0
+
+    def summary(self):
+        with self._lock:
+            return {stage: dict(stats) for stage, stats in self._stages.items()}
+
+# Medições da execução corrente (zeradas no início de cada main())
+stage_stats = StageStats()
+
+def _count_rows(result, args):
+    """Linhas processadas: do DataFrame retornado ou do primeiro argumento"""
+    for value in (result, args[0] if args else None):
+        if isinstance(value, pd.DataFrame):
+            return len(value)
+    return None
+
+@contextmanager
+def profile_stage(stage, rows=None):
+    """
+    Mede uma etapa: tempo de relógio, tempo de CPU e variação do RSS
+    Uso: with profile_stage('etapa') as info: ...; info['rows'] = n
+    """
+    info = {'rows': rows}
+    rss_before = get_rss_bytes()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield info
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        rss_after = get_rss_bytes()
+        rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+
+        stage_stats.record(stage, wall, cpu, info['rows'], rss_delta)
+        logger.bind(
+            stage=stage, wall_s=round(wall, 4), cpu_s=round(cpu, 4),
+            rows=info['rows'], rss_delta_bytes=rss_delta
+        ).debug(f"Etapa {stage}: {wall:.3f}s (CPU {cpu:.3f}s), {info['rows']} linhas")
+
+def profiled(stage=None):
+    """Decorador de profile_stage; as linhas vêm do retorno ou do primeiro argumento"""
+    def decorator(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_stage(name) as info:
+                result = func(*args, **kwargs)
+                info['rows'] = _count_rows(result, args)
+            return result
+        return wrapper
+    return decorator
+
+def log_stage_summary():
+    """Emite um registro estruturado por etapa com os totais da execução"""
+    for stage, stats in stage_stats.summary().items():
+        logger.bind(stage=stage, **stats).info(
+            f"Etapa {stage}: {stats['chamadas']} chamada(s), {stats['wall_s']:.3f}s, "
+            f"CPU {stats['cpu_s']:.3f}s, {stats['linhas']} linhas, "
+            f"RSS {stats['rss_delta_bytes'] / (1024 * 1024):+.1f} MB"
+        )
+
+def write_prometheus_textfile(path, success=True):
+    """
+    Grava as métricas da execução no formato texto do Prometheus
+    (para o textfile collector do node_exporter); escrita atômica
+    success: se a execução terminou sem erro
+    """
+    metrics = [
+        ('wall_seconds', 'wall_s', 'Tempo de relógio da etapa na última execução'),
+        ('cpu_seconds', 'cpu_s', 'Tempo de CPU da etapa na última execução'),
+        ('rows', 'linhas', 'Linhas processadas pela etapa na última execução'),
+        ('rss_delta_bytes', 'rss_delta_bytes', 'Variação do RSS durante a etapa'),
+        ('calls', 'chamadas', 'Chamadas da etapa na última execução')
+    ]
+    summary = stage_stats.summary()
+
+    lines = []
+    for suffix, key, help_text in metrics:
+        name = f"sales_etl_stage_{suffix}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for stage, stats in summary.items():
+            lines.append(f'{name}{{stage="{stage}"}} {stats[key]}')
+    lines.append("# HELP sales_etl_last_run_timestamp_seconds Fim da última execução")
+    lines.append("# TYPE sales_etl_last_run_timestamp_seconds gauge")
+    lines.append(f"sales_etl_last_run_timestamp_seconds {time.time():.0f}")
+    lines.append("# HELP sales_etl_last_run_success 1 se a última execução terminou sem erro")
+    lines.append("# TYPE sales_etl_last_run_success gauge")
+    lines.append(f"sales_etl_last_run_success {int(success)}")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+@contextmanager
+def run_profiler(mode, output_dir):
+    """
+    Profiler opcional da execução inteira
+    mode: None, 'cprofile' (gera .prof) ou 'pyinstrument' (gera .html)
+    """
+    if not mode:
+        yield
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    if mode == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(output_dir, f"run_{stamp}.prof")
+            profiler.dump_stats(path)
+            logger.info(f"Perfil cProfile salvo em {path}")
+
+    elif mode == 'pyinstrument':
+        # Dependência opcional
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = os.path.join(output_dir, f"run_{stamp}.html")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+            logger.info(f"Perfil pyinstrument salvo em {path}")
+
+    else:
+        raise ValueError(f"Profiler desconhecido: {mode}")
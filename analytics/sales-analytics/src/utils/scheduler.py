@@ -0,0 +1,79 @@
+"""
+Execução de tarefas agendadas em um pool de threads
+Autor: Bruno Ferreira de Abreu Arruda
+Data: 2024
+"""
+
+import time
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from loguru import logger
+
+from src.utils.config import SCHEDULER_WORKERS
+
+class JobRunner:
+    def __init__(self, max_workers=SCHEDULER_WORKERS, history_size=100):
+        """
+        Executa as tarefas do `schedule` fora do loop principal
+        max_workers: tarefas executadas em paralelo
+        history_size: execuções mantidas no histórico de cada tarefa
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.history = defaultdict(lambda: deque(maxlen=history_size))
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def _run(self, name, job_func, args, kwargs):
+        """Executa a tarefa registrando duração e status"""
+        started_at = datetime.now()
+        start = time.perf_counter()
+        status = 'sucesso'
+        try:
+            job_func(*args, **kwargs)
+        except Exception as e:
+            status = 'erro'
+            logger.error(f"Tarefa {name} falhou: {e}")
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self._running.discard(name)
+                self.history[name].append({
+                    'inicio': started_at,
+                    'duracao': duration,
+                    'status': status
+                })
+            logger.info(f"Tarefa {name} finalizada em {duration:.2f}s ({status})")
+
+    def submit(self, job_func, *args, **kwargs):
+        """
+        Envia a tarefa ao pool e retorna imediatamente
+        Uma nova execução é ignorada enquanto a anterior da mesma tarefa não terminar
+        """
+        name = getattr(job_func, '__name__', repr(job_func))
+        with self._lock:
+            if name in self._running:
+                logger.warning(f"Tarefa {name} ainda em execução, disparo ignorado")
+                return None
+            self._running.add(name)
+        return self.executor.submit(self._run, name, job_func, args, kwargs)
+
+    def get_job_durations(self):
+        """Resumo das durações (em segundos) por tarefa"""
+        with self._lock:
+            summary = {}
+            for name, runs in self.history.items():
+                durations = [run['duracao'] for run in runs]
+                summary[name] = {
+                    'execucoes': len(durations),
+                    'ultima': durations[-1],
+                    'media': sum(durations) / len(durations),
+                    'maxima': max(durations),
+                    'em_execucao': name in self._running
+                }
+            return summary
+
+    def shutdown(self, wait=True):
+        """Aguarda as tarefas em andamento e encerra o pool"""
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,71 @@
+import io
+import time
+import logging
+import pandas as pd
+from sqlalchemy import MetaData, Table, inspect, insert
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Rows sent per COPY / executemany batch
+DEFAULT_BATCH_SIZE = 50000
+
+def _create_table_if_missing(df: pd.DataFrame, table_name: str, engine: Engine) -> None:
+    """Create an empty table from the frame's columns if it does not exist yet"""
+    if not inspect(engine).has_table(table_name):
+        df.head(0).to_sql(table_name, engine, index=False)
+
+def _copy_postgres(df: pd.DataFrame, table_name: str, engine: Engine, batch_size: int) -> None:
+    """Stream the frame through COPY FROM STDIN (CSV format) in batches"""
+    columns = ', '.join(f'"{col}"' for col in df.columns)
+    sql = f'COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)'
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            for start in range(0, len(df), batch_size):
+                buffer = io.StringIO()
+                df.iloc[start:start + batch_size].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+        # Single transaction: either every batch lands or none does
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _executemany(df: pd.DataFrame, table_name: str, engine: Engine, batch_size: int) -> None:
+    """Fallback for databases without COPY (e.g. SQLite)"""
+    # Reflected table so column types handle value conversion
+    target = Table(table_name, MetaData(), autoload_with=engine)
+
+    with engine.begin() as conn:
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start:start + batch_size]
+            # NaN/NaT become NULL
+            records = batch.astype(object).where(batch.notna(), None).to_dict('records')
+            conn.execute(insert(target), records)
+
+def bulk_insert(df: pd.DataFrame, table_name: str, engine: Engine,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Append a frame to a table using COPY on PostgreSQL and executemany elsewhere"""
+    if df.empty:
+        return 0
+
+    start = time.perf_counter()
+    _create_table_if_missing(df, table_name, engine)
+
+    if engine.dialect.name == 'postgresql':
+        _copy_postgres(df, table_name, engine, batch_size)
+    else:
+        _executemany(df, table_name, engine, batch_size)
+
+    elapsed = time.perf_counter() - start
+    rows = len(df)
+    logger.info(
+        "Loaded %d rows into %s in %.2fs (%.0f rows/s)",
+        rows, table_name, elapsed, rows / elapsed if elapsed else rows
+    )
+    return rows
@@ -10,6 +10,7 @@ import requests
 from prefect import task, flow
 from prefect.tasks import task_input_hash
 from datetime import timedelta
+from etl.bulk_loader import bulk_insert
 
 class LogisticsETL:
     def __init__(self):
@@ -142,29 +143,10 @@ class LogisticsETL:
                             inventory_df: pd.DataFrame,
                             transportation_df: pd.DataFrame) -> None:
         """Load transformed data into data warehouse"""
-        # Load orders
-        orders_df.to_sql(
-            'fact_orders',
-            self.engine,
-            if_exists='append',
-            index=False
-        )
-        
-        # Load inventory
-        inventory_df.to_sql(
-            'fact_inventory',
-            self.engine,
-            if_exists='append',
-            index=False
-        )
-        
-        # Load transportation
-        transportation_df.to_sql(
-            'fact_transportation',
-            self.engine,
-            if_exists='append',
-            index=False
-        )
+        # COPY-based bulk load instead of row-by-row INSERTs
+        bulk_insert(orders_df, 'fact_orders', self.engine)
+        bulk_insert(inventory_df, 'fact_inventory', self.engine)
+        bulk_insert(transportation_df, 'fact_transportation', self.engine)
 
     @flow
     def run_etl_pipeline(self, start_date: datetime, end_date: datetime):
@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any, Tuple
@@ -12,6 +14,11 @@ import xgboost as xgb
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 import cvxopt
 
+# LSTM training sequences come from the retail-analytics forecasting models
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..',
+                             'analytics', 'retail-analytics'))
+from models.forecasting.sequences import sliding_windows, window_dataset
+
 class LogisticsOptimizer:
     def __init__(self):
         self.models = {
@@ -118,16 +125,12 @@ class LogisticsOptimizer:
     def train_demand_forecast(self, 
                             data: pd.DataFrame,
                             target_col: str,
-                            sequence_length: int = 10) -> None:
-        """Train LSTM model for demand forecasting"""
-        # Prepare sequences
-        X, y = [], []
-        for i in range(len(data) - sequence_length):
-            X.append(data[target_col].values[i:(i + sequence_length)])
-            y.append(data[target_col].values[i + sequence_length])
-        
-        X = np.array(X)
-        y = np.array(y)
+                            sequence_length: int = 10,
+                            streaming: bool = False) -> None:
+        """Train LSTM model for demand forecasting; with streaming, batches are built on the fly (no validation split)"""
+        # Prepare sequences: the target is copied once into a contiguous float32
+        # array and the windows are views over that copy
+        target = data[target_col].to_numpy(dtype=np.float32)
         
         # Build model
         model = Sequential([
@@ -145,13 +148,17 @@ class LogisticsOptimizer:
         )
         
         # Train model
-        model.fit(
-            X, y,
-            epochs=50,
-            batch_size=32,
-            validation_split=0.2,
-            verbose=0
-        )
+        if streaming:
+            model.fit(window_dataset(target, sequence_length, batch_size=32), epochs=50, verbose=0)
+        else:
+            X, y = sliding_windows(target, sequence_length)
+            model.fit(
+                X, y,
+                epochs=50,
+                batch_size=32,
+                validation_split=0.2,
+                verbose=0
+            )
         
         self.models['demand_forecast'] = model
     